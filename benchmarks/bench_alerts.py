@@ -0,0 +1,55 @@
+"""
+Expiry alerts (expiry_alerts.ExpiryScheduler) vs polling /list_items_urgent:
+the cost of keeping the schedule current per write, of rebuilding it from
+the expiry index, and of one poll of the urgent listing at the same size.
+"""
+import asyncio
+import datetime as dt
+import itertools
+import random
+
+from bench_db import seed
+from common import measure, size_label, temp_db
+
+SIZES = (1_000, 100_000)
+QUICK_SIZES = (1_000,)
+
+
+def run(ctx):
+    import db_manager
+    import expiry_alerts
+    from storage import SQLiteStorage, ThreadedStorage
+
+    results = {}
+    for n_rows in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n_rows)
+        with temp_db() as path:
+            seed(path, n_rows)
+
+            async def scheduled():
+                s = expiry_alerts.ExpiryScheduler(ThreadedStorage(SQLiteStorage()))
+                await s.start()
+                return s
+
+            loop = asyncio.new_event_loop()
+            scheduler = loop.run_until_complete(scheduled())
+            try:
+                print(f"  {label} rows: {len(scheduler.items)} items tracked, {len(scheduler.heap)} heap entries")
+                results[f"alerts.resync[{label}]"] = measure(
+                    lambda: loop.run_until_complete(scheduler.resync()), n=5 if n_rows >= 100_000 else 50, warmup=1)
+
+                rng = random.Random(3)
+                today = dt.date.today()
+                writes = (("update", rng.randint(1, n_rows),
+                           {"name": "x", "qty": 1.0, "location": "Fridge",
+                            "expiry_on": (today + dt.timedelta(days=rng.randint(1, 60))).isoformat()})
+                          for _ in itertools.count())
+                results[f"alerts.apply_update[{label}]"] = measure(scheduler._apply, n=5000, args_iter=writes)
+            finally:
+                loop.run_until_complete(scheduler.stop())
+                loop.close()
+
+            scan_n = 20 if n_rows >= 100_000 else 200
+            results[f"alerts.poll_urgent[{label}]"] = measure(
+                lambda: db_manager.list_items_with_days(within_days=3, by_expiry=True), n=scan_n, warmup=2)
+    return results
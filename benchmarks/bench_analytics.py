@@ -0,0 +1,57 @@
+"""
+/analytics/waste from daily_rollups vs aggregating the raw item_events
+history, at growing history lengths. Rollup reports are bounded by
+days x groups in the window; the event scan grows with the history.
+"""
+import datetime as dt
+import random
+import sqlite3
+
+from common import measure, size_label, temp_db
+
+SIZES = (10_000, 1_000_000)
+QUICK_SIZES = (10_000,)
+HISTORY_DAYS = 730
+
+
+def seed_events(path, n_events):
+    """Insert events directly; the rollup trigger fills daily_rollups as it would in production."""
+    rng = random.Random(5)
+    today = dt.date.today().toordinal()
+    rows = [(i, "2024-01-01T00:00:00", today - rng.randrange(HISTORY_DAYS), rng.choice(("consumed", "wasted")),
+             rng.random() * 3, "pcs", f"item {i}", rng.choice(["fruit", "meat", "dairy", "grain", "snack"]),
+             rng.choice(["Fridge", "Freezer", "Pantry"]), rng.choice(["CLI", "WebApp", "Barcode"]))
+            for i in range(n_events)]
+    con = sqlite3.connect(path)
+    with con:
+        con.executemany("""INSERT INTO item_events(item_id, ts, day, kind, qty, unit, name, category, location, source)
+                           VALUES (?,?,?,?,?,?,?,?,?,?)""", rows)
+    con.close()
+
+
+def run(ctx):
+    import analytics
+    import db_manager
+
+    results = {}
+    for n in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n)
+        with temp_db() as path:
+            seed_events(path, n)
+
+            def from_rollups(weeks=8, by="category"):
+                from_day, to_day = analytics.report_range(weeks)
+                return analytics.waste_report(db_manager.rollups(from_day, to_day), weeks, by)
+
+            def from_events():
+                con = db_manager.get_con()
+                rows = con.execute("""SELECT category, kind, SUM(qty), COUNT(*) FROM item_events
+                                      GROUP BY category, kind""").fetchall()
+                con.close()
+                return rows
+
+            results[f"analytics.waste_8w_rollups[{label}]"] = measure(from_rollups, n=50, warmup=3)
+            results[f"analytics.waste_all_time_rollups[{label}]"] = measure(
+                lambda: from_rollups(weeks=HISTORY_DAYS // 7 + 1), n=20, warmup=2)
+            results[f"analytics.scan_events_all_time[{label}]"] = measure(from_events, n=5 if n >= 1_000_000 else 50, warmup=1)
+    return results
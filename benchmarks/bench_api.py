@@ -0,0 +1,66 @@
+"""/predict and /predict-image latency (sequential) and throughput (concurrent, in-process ASGI)."""
+import asyncio
+import io
+import time
+
+from common import measure, summarize, temp_db
+
+PREDICT_PAYLOAD = {"category": "dairy", "location": "fridge", "packaging": "sealed", "state": "raw",
+                   "temperature": 4}
+
+
+def make_jpeg(size=(1024, 768)) -> bytes:
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    arr = (rng.random((size[1], size[0], 3)) * 255).astype("uint8")
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+async def _throughput(app, method, url, n, concurrency, **kwargs):
+    import httpx
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.request(method, url, **kwargs)
+                latencies.append(time.perf_counter() - t0)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        total = time.perf_counter() - start
+    return summarize(latencies, total)
+
+
+def run(ctx):
+    from fastapi.testclient import TestClient
+    import api_server
+    import shelf_life
+    from stubs import StubShelfLifeModel
+
+    if not ctx.real_models or shelf_life.get_model() is None:
+        shelf_life.set_model(StubShelfLifeModel())
+    image = make_jpeg()
+    n = 100 if ctx.quick else 500
+
+    results = {}
+    with temp_db(), TestClient(api_server.app) as client:
+        results["api.predict.latency"] = measure(
+            lambda: client.post("/predict", json=PREDICT_PAYLOAD).raise_for_status(), n=n)
+        results["api.predict_image.latency"] = measure(
+            lambda: client.post("/predict-image", files={"file": ("x.jpg", image, "image/jpeg")}).raise_for_status(),
+            n=max(20, n // 5), warmup=3)
+
+    results["api.predict.throughput"] = asyncio.run(
+        _throughput(api_server.app, "POST", "/predict", n, 16, json=PREDICT_PAYLOAD))
+    results["api.predict_image.throughput"] = asyncio.run(
+        _throughput(api_server.app, "POST", "/predict-image", max(20, n // 5), 8,
+                    files={"file": ("x.jpg", image, "image/jpeg")}))
+    return results
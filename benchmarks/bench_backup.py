@@ -0,0 +1,66 @@
+"""
+Online snapshots (backup.snapshot) of a live database, and what a writer
+sees while one runs: add_item latency from a concurrent thread during
+back-to-back snapshots, against the same writer with no snapshot running.
+"""
+import tempfile
+import threading
+import time
+
+from bench_db import seed
+from common import measure, size_label, summarize, temp_db
+
+SIZES = (100_000, 1_000_000)
+QUICK_SIZES = (10_000,)
+WRITE_PAUSE = 0.002
+
+
+def _writer_latencies(db_manager, busy):
+    """add_item latencies from a background thread for as long as busy() runs."""
+    latencies = []
+    stop = threading.Event()
+
+    def write():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db_manager.add_item("bench", "fruit", 1, "pcs", "Fridge", None, "2030-01-01")
+            latencies.append(time.perf_counter() - t0)
+            time.sleep(WRITE_PAUSE)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        busy()
+    finally:
+        stop.set()
+        thread.join()
+    stats = summarize(latencies)
+    stats["max_us"] = round(max(latencies) * 1e6, 3)
+    return stats
+
+
+def run(ctx):
+    import backup
+    import db_manager
+
+    results = {}
+    for n_rows in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n_rows)
+        runs = 3 if n_rows >= 1_000_000 else 5
+        with temp_db() as path, tempfile.TemporaryDirectory() as out:
+            seed(path, n_rows)
+            for compress in (False, True):
+                name = "snapshot_gzip" if compress else "snapshot"
+                last = {}
+                stats = measure(lambda: last.update(backup.snapshot(out, compress=compress, keep=1)), n=runs, warmup=0)
+                stats["db_mb"] = round(last["db_bytes"] / 2**20, 1)
+                stats["file_mb"] = round(last["bytes"] / 2**20, 1)
+                stats["max_step_ms"] = last["max_step_ms"]
+                results[f"backup.{name}[{label}]"] = stats
+
+            results[f"backup.writer_idle[{label}]"] = _writer_latencies(db_manager, lambda: time.sleep(1.0))
+            during = []
+            results[f"backup.writer_during_snapshot[{label}]"] = _writer_latencies(
+                db_manager, lambda: [during.append(backup.snapshot(out, compress=False, keep=1)) for _ in range(runs)])
+            results[f"backup.writer_during_snapshot[{label}]"]["restarts"] = sum(r["restarts"] for r in during)
+    return results
@@ -0,0 +1,29 @@
+"""barcode_scanner.scan_barcode_local decode (stub reader unless --real-models)."""
+import contextlib
+import io
+import os
+import tempfile
+
+from common import measure
+
+
+def make_image(path, size=(800, 600)):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    for i in range(0, size[0] - 100, 7):
+        if (i // 7) % 3:
+            draw.rectangle([50 + i, 100, 52 + i, size[1] - 100], fill="black")
+    img.save(path, "PNG")
+
+
+def run(ctx):
+    import barcode_scanner
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "barcode.png")
+        make_image(path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = measure(barcode_scanner.scan_barcode_local, n=20 if ctx.real_models else 200,
+                            warmup=2, args_iter=iter(lambda: (path,), None))
+    return {"barcode_scanner.scan_barcode_local": stats}
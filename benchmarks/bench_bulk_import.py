@@ -0,0 +1,98 @@
+"""
+CSV import (bulk_import.py) of a synthetic receipt export with mixed
+purchase-date spellings and 60% missing expiries, half of which the
+shelf-life table knows; the rest are predicted by the stub model. The
+per-row path (parse_date_input, shelf_life_days, one predict and one
+add_item per line, as the interactive add does) runs on a sample for
+comparison. rows_per_sec is file lines over the median run.
+"""
+import csv
+import datetime as dt
+import os
+import random
+import tempfile
+
+from bench_utils import write_shelf_csv
+from common import measure, size_label, temp_db
+
+SIZES = (100_000,)
+QUICK_SIZES = (10_000,)
+PER_ROW_SAMPLE = 2_000
+
+PURCHASED = ("", "yesterday", "3d", "5 days ago", "12", "10/02", "2025-06-01")
+CATEGORIES = ("dairy", "fruit", "meat", "grain", "vegetable", "")
+LOCATIONS = ("Fridge", "Freezer", "Pantry")
+
+
+def write_receipt_csv(path, n, known_names):
+    rng = random.Random(n)
+    today = dt.date.today()
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Product", "Quantity", "Category", "Storage", "Date", "Best Before"])
+        for i in range(n):
+            name = rng.choice(known_names) if rng.random() < 0.5 else f"receipt item {i % 5000}"
+            expiry = (today + dt.timedelta(days=rng.randint(1, 60))).isoformat() if rng.random() < 0.4 else ""
+            w.writerow([name, rng.randint(1, 4), rng.choice(CATEGORIES), rng.choice(LOCATIONS),
+                        rng.choice(PURCHASED), expiry])
+
+
+def per_row_import(path, limit):
+    """The one-value-at-a-time path: each line parsed, looked up, predicted and inserted on its own."""
+    import db_manager
+    import shelf_life
+    from utils import parse_date_input, shelf_life_days
+
+    with open(path, newline="", encoding="utf-8") as f:
+        for i, r in enumerate(csv.DictReader(f)):
+            if i == limit:
+                break
+            purchased = parse_date_input(r["Date"]) or dt.date.today().isoformat()
+            expiry = r["Best Before"] or None
+            if expiry is None:
+                days = shelf_life_days(r["Product"])
+                if days is None:
+                    loc = r["Storage"].lower()
+                    days = shelf_life.predict_shelf_life(
+                        r["Category"].lower() or "unknown", loc, "sealed", "raw",
+                        {"fridge": 4, "freezer": -18, "pantry": 20}[loc]).get("predicted_shelf_life_days")
+                if days is not None:
+                    expiry = (dt.date.fromisoformat(purchased) + dt.timedelta(days=int(days))).isoformat()
+            db_manager.add_item(r["Product"], r["Category"] or None, float(r["Quantity"]), "", r["Storage"],
+                                purchased, expiry, "CSV")
+
+
+def run(ctx):
+    import bulk_import
+    import db_manager
+    import shelf_life
+    import utils
+    from stubs import StubShelfLifeModel
+
+    shelf_life.set_model(StubShelfLifeModel())
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        table = os.path.join(tmp, "shelf.csv")
+        known = write_shelf_csv(table, 2_000)
+        old = utils.DATA_PATH, utils._SHELF
+        utils.DATA_PATH, utils._SHELF = table, None
+        try:
+            for n in (QUICK_SIZES if ctx.quick else SIZES):
+                label = size_label(n)
+                path = os.path.join(tmp, f"receipt_{n}.csv")
+                write_receipt_csv(path, n, known)
+                with temp_db():
+                    stats = measure(lambda: bulk_import.import_csv(path, db_manager.add_item_rows,
+                                                                   shelf_life.predict_shelf_life_batch),
+                                    n=3, warmup=1)
+                stats["rows_per_sec"] = round(n * 1e6 / stats["median_us"])
+                results[f"bulk_import.csv[{label}]"] = stats
+
+                sample = min(n, PER_ROW_SAMPLE)
+                with temp_db():
+                    stats = measure(lambda: per_row_import(path, sample), n=1, warmup=0)
+                stats["rows_per_sec"] = round(sample * 1e6 / stats["median_us"])
+                results[f"bulk_import.per_row[{size_label(sample)} of {label}]"] = stats
+        finally:
+            utils.DATA_PATH, utils._SHELF = old
+    return results
@@ -0,0 +1,72 @@
+"""
+Read paths served by the in-process item cache (inventory_cache.py) vs the
+same db_manager calls answered by SQLite, on seeded tables. *_after_write
+reads follow a write from another connection, so they include the
+data_version check and the change-log catch-up; `load` is the first read
+of a cold cache.
+"""
+import itertools
+import random
+import sqlite3
+import time
+import tracemalloc
+
+from bench_db import seed
+from common import measure, size_label, summarize, temp_db
+
+SIZES = (1_000, 100_000)
+QUICK_SIZES = (1_000,)
+
+
+def run(ctx):
+    import db_manager
+    import inventory_cache
+
+    results = {}
+    for n_rows in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n_rows)
+        with temp_db() as path:
+            seed(path, n_rows)
+            scan_n = 20 if n_rows >= 100_000 else 200
+            reads = {
+                "list_items": (db_manager.list_items, scan_n, None),
+                "list_items_urgent": (lambda: db_manager.list_items_with_days(within_days=3, by_expiry=True),
+                                      scan_n * 5, None),
+                "iter_items_fridge_by_expiry": (
+                    lambda: sum(1 for _ in db_manager.iter_items(sort="expiry", location="fridge")), scan_n, None),
+                "get_item": (db_manager.get_item, 2000,
+                             ((i,) for i in (random.Random(7).randint(1, n_rows) for _ in itertools.count()))),
+            }
+            for mode, enabled in (("sqlite", False), ("cached", True)):
+                inventory_cache.ENABLED = enabled
+                try:
+                    for name, (fn, n, args) in reads.items():
+                        results[f"cache.{name}.{mode}[{label}]"] = measure(fn, n=n, warmup=2, args_iter=args)
+                finally:
+                    inventory_cache.ENABLED = True
+
+            # a write from another connection, then the timed read that has to catch up with it
+            other = sqlite3.connect(path)
+            ids = itertools.cycle(range(1, n_rows + 1))
+            latencies = []
+            for _ in range(500):
+                iid = next(ids)
+                with other:
+                    other.execute("UPDATE items SET qty = qty + 1 WHERE id = ?", (iid,))
+                start = time.perf_counter()
+                db_manager.get_item(iid)
+                latencies.append(time.perf_counter() - start)
+            other.close()
+            results[f"cache.get_item_after_write[{label}]"] = summarize(latencies)
+
+            db_manager.item_cache().close()
+            start = time.perf_counter()
+            db_manager.get_item(1)  # cold: the whole table is loaded
+            load = summarize([time.perf_counter() - start])
+            db_manager.item_cache().close()
+            tracemalloc.start()
+            db_manager.get_item(1)
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[f"cache.load[{label}]"] = {**load, "bytes_per_item": round(size / n_rows)}
+    return results
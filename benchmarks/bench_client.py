@@ -0,0 +1,68 @@
+"""
+Per-item add latency through the CLI client: predict shelf life, then add_item.
+
+  client.local          in-process model call (SMARTFOOD_CLIENT_MODE=local)
+  client.remote         pooled keep-alive session against a live uvicorn server
+  client.remote_fresh   one-off requests.post per call (the old CLI behaviour)
+"""
+import socket
+import threading
+import time
+
+from common import measure, temp_db
+
+PAYLOAD = {"category": "fruit", "location": "fridge", "packaging": "sealed", "state": "raw", "temperature": 4}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(app):
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def run(ctx):
+    import requests
+    import api_server
+    import db_manager
+    import shelf_life
+    from client import LocalClient, RemoteClient
+    from stubs import StubShelfLifeModel
+
+    if not ctx.real_models or shelf_life.get_model() is None:
+        shelf_life.set_model(StubShelfLifeModel())
+    n = 100 if ctx.quick else 500
+
+    def add_with(predict):
+        def add():
+            days = predict()["predicted_shelf_life_days"]
+            db_manager.add_item("apple", "fruit", 1, "pcs", "Fridge", None, None, "Bench", f"{days}")
+        return add
+
+    results = {}
+    with temp_db():
+        local = LocalClient()
+        results["client.local.add_item"] = measure(add_with(lambda: local.predict_shelf_life(PAYLOAD)), n=n)
+
+        server, thread, url = _start_server(api_server.app)
+        try:
+            remote = RemoteClient(url)
+            results["client.remote.add_item"] = measure(add_with(lambda: remote.predict_shelf_life(PAYLOAD)), n=n)
+            remote.close()
+            results["client.remote_fresh.add_item"] = measure(
+                add_with(lambda: requests.post(f"{url}/predict", json=PAYLOAD).json()), n=n)
+        finally:
+            server.should_exit = True
+            thread.join(timeout=5)
+    return results
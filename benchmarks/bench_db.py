@@ -0,0 +1,59 @@
+"""db_manager CRUD latency against pre-seeded tables (1k and 100k rows)."""
+import datetime as dt
+import itertools
+import random
+import sqlite3
+
+from common import measure, size_label, temp_db
+
+SIZES = (1_000, 100_000)
+QUICK_SIZES = (1_000,)
+
+
+def seed(path, n_rows):
+    """Bulk-insert synthetic rows directly (seeding is not what we measure)."""
+    rng = random.Random(42)
+    today = dt.date.today()
+    rows = []
+    for i in range(n_rows):
+        pur = today - dt.timedelta(days=rng.randint(0, 30))
+        exp = pur + dt.timedelta(days=rng.randint(1, 60))
+        rows.append((f"item {i}", rng.choice(["fruit", "meat", "dairy", "grain"]), 1.0 + rng.random() * 5, "pcs",
+                     rng.choice(["Fridge", "Freezer", "Pantry"]), pur.isoformat(), exp.isoformat(), "Bench", None))
+    con = sqlite3.connect(path)
+    con.executemany("""INSERT INTO items(name, category, qty, unit, location, purchased_on, expiry_on, source, notes)
+                       VALUES (?,?,?,?,?,?,?,?,?)""", rows)
+    con.commit()
+    con.close()
+
+
+def run(ctx):
+    import db_manager
+
+    results = {}
+    for n_rows in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n_rows)
+        with temp_db() as path:
+            seed(path, n_rows)
+            rng = random.Random(7)
+            ids = (rng.randint(1, n_rows) for _ in itertools.count())
+            scan_n = 20 if n_rows >= 100_000 else 200
+
+            results[f"db.add_item[{label}]"] = measure(
+                lambda: db_manager.add_item("bench", "fruit", 1, "pcs", "Fridge", None, "2030-01-01"), n=500)
+            batch = [{"name": f"bulk {i}", "category": "fruit", "qty": 1, "unit": "pcs", "location": "Fridge",
+                      "expiry_on": "2030-01-01"} for i in range(12)]
+            results[f"db.add_items_x12[{label}]"] = measure(lambda: db_manager.add_items(batch), n=100)
+            results[f"db.get_item[{label}]"] = measure(db_manager.get_item, n=2000, args_iter=((i,) for i in ids))
+            results[f"db.update_item[{label}]"] = measure(
+                lambda i: db_manager.update_item(i, "upd", "fruit", 2, "pcs", "Fridge", "2025-01-01", "2030-01-01"),
+                n=500, args_iter=((i,) for i in ids))
+            results[f"db.consume_item[{label}]"] = measure(
+                db_manager.consume_item, n=500, args_iter=((i, 0.01) for i in ids))
+            results[f"db.list_items[{label}]"] = measure(db_manager.list_items, n=scan_n, warmup=2)
+            results[f"db.list_items_urgent[{label}]"] = measure(
+                lambda: db_manager.list_items_with_days(within_days=3, by_expiry=True), n=scan_n, warmup=2)
+            deletable = iter(range(1, n_rows + 1))
+            results[f"db.delete_item[{label}]"] = measure(
+                db_manager.delete_item, n=500, args_iter=((next(deletable),) for _ in itertools.count()))
+    return results
@@ -0,0 +1,122 @@
+"""
+semantic_mapper embedding backends (embedders.py): load time, RSS, per-name
+latency and category agreement with the default sentence-transformers model.
+
+Each backend runs in a fresh interpreter so RSS reflects only what that
+backend loads. Backends whose runtime or artifact is missing are skipped:
+  onnx    needs onnxruntime + tokenizers and models/minilm-onnx-int8/
+  static  uses models/food_static_embeddings.npz, or is distilled from the
+          reference model into a temp file for the run
+
+With stub models (the default) agreement numbers are meaningless; run with
+--real-models for the comparison.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, SRC, summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (food name, expected category)
+LABELLED = [
+    ("green apple", "fruit"), ("banana", "fruit"), ("strawberries", "fruit"), ("mango", "fruit"),
+    ("blueberries", "fruit"), ("pineapple chunks", "fruit"), ("red grapes", "fruit"), ("kiwi", "fruit"),
+    ("carrots", "vegetable"), ("broccoli", "vegetable"), ("baby spinach", "vegetable"), ("red onion", "vegetable"),
+    ("courgette", "vegetable"), ("cherry tomatoes", "vegetable"), ("cauliflower", "vegetable"),
+    ("sweet potato", "vegetable"), ("chicken breast", "meat"), ("beef mince", "meat"), ("pork chops", "meat"),
+    ("bacon", "meat"), ("lamb shoulder", "meat"), ("turkey slices", "meat"), ("sausages", "meat"),
+    ("salmon fillet", "fish"), ("cod", "fish"), ("tuna steak", "fish"), ("prawns", "fish"),
+    ("smoked mackerel", "fish"), ("sardines", "fish"), ("cheddar", "dairy"), ("greek yoghurt", "dairy"),
+    ("whole milk", "dairy"), ("butter", "dairy"), ("mozzarella", "dairy"), ("double cream", "dairy"),
+    ("crisps", "snack"), ("chocolate bar", "snack"), ("salted peanuts", "snack"), ("popcorn", "snack"),
+    ("biscuits", "snack"), ("granola bar", "snack"), ("basmati rice", "grain"), ("penne pasta", "grain"),
+    ("rolled oats", "grain"), ("sourdough bread", "grain"), ("quinoa", "grain"), ("plain flour", "grain"),
+    ("lasagne", "prepared food"), ("chicken curry ready meal", "prepared food"), ("pizza", "prepared food"),
+    ("vegetable soup", "prepared food"), ("sushi", "prepared food"), ("shepherd's pie", "prepared food"),
+]
+
+
+def _worker(kind, path, use_stubs):
+    """Runs in the child: load one backend, classify LABELLED, time single-name encodes."""
+    sys.path.insert(0, SRC)
+    sys.path.insert(0, HERE)
+    if use_stubs:
+        import stubs
+        stubs.install()
+    if kind:
+        os.environ["SMARTFOOD_EMBEDDER"] = kind
+    if path:
+        os.environ["SMARTFOOD_EMBEDDER_PATH"] = path
+
+    t0 = time.perf_counter()
+    import semantic_mapper
+    semantic_mapper.get_closest_category("warm-up")
+    load_s = time.perf_counter() - t0
+
+    predictions = [semantic_mapper.get_closest_category(name)[0] for name, _ in LABELLED]
+    latencies = []
+    for _ in range(5):
+        for name, _ in LABELLED:
+            t = time.perf_counter()
+            semantic_mapper.get_closest_category(name)
+            latencies.append(time.perf_counter() - t)
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    print(json.dumps({"load_s": load_s, "rss_mb": rss_kb / 1024, "predictions": predictions,
+                      "latencies": latencies}))
+
+
+def _run_backend(kind, path, use_stubs):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), kind, path or "", "1" if use_stubs else "0"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else f"exit {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _static_table(tmp):
+    sys.path.insert(0, SRC)
+    import embedders
+    if os.path.exists(embedders.DEFAULT_STATIC_PATH):
+        return os.path.join(ROOT, embedders.DEFAULT_STATIC_PATH)
+    teacher = embedders.get_embedder("sentence-transformers")  # stubbed by run.py unless --real-models
+    vocab = [name for name, _ in LABELLED]
+    from semantic_mapper import CATEGORIES
+    return embedders.distill_static(os.path.join(tmp, "static.npz"), vocab + CATEGORIES, teacher=teacher)
+
+
+def run(ctx):
+    use_stubs = not ctx.real_models
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [("sentence-transformers", None), ("onnx", None), ("static", _static_table(tmp))]
+        reference = None
+        for kind, path in backends:
+            try:
+                out = _run_backend(kind, path, use_stubs)
+            except RuntimeError as e:
+                print(f"  skipping {kind}: {e}")
+                continue
+            preds = out["predictions"]
+            if reference is None:
+                reference = preds
+            stats = summarize(out["latencies"])
+            stats.update({
+                "load_s": round(out["load_s"], 3),
+                "rss_mb": round(out["rss_mb"], 1),
+                "agreement": round(sum(a == b for a, b in zip(preds, reference)) / len(preds), 3),
+                "accuracy": round(sum(p == gold for p, (_, gold) in zip(preds, LABELLED)) / len(preds), 3),
+            })
+            print(f"  embedders.{kind}: load {stats['load_s']} s, rss {stats['rss_mb']} MB, "
+                  f"agreement {stats['agreement']:.0%}, accuracy {stats['accuracy']:.0%}")
+            results[f"embedders.{kind}"] = stats
+    return results
+
+
+if __name__ == "__main__":
+    _worker(sys.argv[1], sys.argv[2] or None, sys.argv[3] == "1")
@@ -0,0 +1,492 @@
+"""
+Synthetic load and soak tests for the API.
+
+Households, each with its own slice of a generated product catalog and a
+bounded pantry, replay a mix of the frontend's calls (MIX): adding what they
+bought, listing everything, checking what is about to expire, consuming
+(and clearing out emptied items), asking /predict for a shelf life and
+classifying a photo with /predict-image. Requests arrive as a Poisson
+process at --rate per second with at most --concurrency in flight (open
+loop: latency counts from the scheduled arrival, so a slow server shows up
+as queueing rather than as fewer requests), or back-to-back from
+--concurrency clients with --rate 0.
+
+Without --url the API runs in a child process on a temporary database with
+the stub models of stubs.py (--real-models: the installed weights, with the
+stub shelf-life model if its weights don't load), and its RSS is sampled
+each window. Against --url, --server-pid names the process (and its
+workers) to sample.
+
+  python benchmarks/bench_load.py --duration 60 --rate 50
+  python benchmarks/bench_load.py --duration 4h --rate 30 --report-every 5m --out soak.json
+  python benchmarks/bench_load.py --url http://127.0.0.1:8000 --server-pid 1234 --mix predict=5,list_items=1
+
+Each window prints throughput, error rate and p50/p95/p99 latency; the JSON
+report has the same per endpoint and overall, the timeline, and memory
+growth (first window to last, and a least-squares slope in MB/hour).
+
+As a benchmark group (opt-in, Linux only: python benchmarks/run.py --only load)
+it runs a short fixed-rate replay and records the per-endpoint latencies.
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+
+from common import ROOT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MIX = {
+    "add_item": 20,
+    "list_items": 8,
+    "list_items_urgent": 15,
+    "consume_item": 17,
+    "predict": 30,
+    "predict_image": 10,
+}
+HOUSEHOLDS = 50
+PANTRY_MAX = 60  # items a household keeps; beyond that it only consumes, so the table stops growing
+IMAGE_SIZES = ((640, 480), (1024, 768), (1600, 1200))
+BACKLOG_PER_SLOT = 10  # open loop: arrivals beyond concurrency * this are dropped (and counted)
+
+# category -> (products, unit, locations, typical shelf life in days)
+CATALOG = {
+    "dairy": (("milk", "yogurt", "cheddar", "butter", "cream", "feta"), "pcs", ("Fridge",), (5, 30)),
+    "meat": (("chicken breast", "mince", "sausages", "bacon", "pork chops"), "g", ("Fridge", "Freezer"), (2, 90)),
+    "fish": (("salmon", "cod", "prawns", "tuna steak"), "g", ("Fridge", "Freezer"), (1, 90)),
+    "fruit": (("apple", "banana", "berries", "grapes", "pear", "orange"), "pcs", ("Fridge", "Pantry"), (3, 21)),
+    "vegetable": (("spinach", "carrot", "broccoli", "pepper", "lettuce", "onion"), "pcs", ("Fridge", "Pantry"),
+                  (3, 30)),
+    "grain": (("bread", "rice", "pasta", "oats", "tortillas"), "pcs", ("Pantry",), (4, 365)),
+    "snack": (("crisps", "crackers", "granola bar", "nuts"), "pcs", ("Pantry",), (30, 180)),
+    "prepared food": (("soup", "lasagne", "curry", "stew"), "pcs", ("Fridge", "Freezer"), (2, 90)),
+}
+BRANDS = ("", "organic ", "value ", "fresh ", "family ")
+TEMPERATURES = {"Fridge": 4, "Freezer": -18, "Pantry": 20}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds from "90", "30s", "5m" or "4h"."""
+    text = str(text).strip().lower()
+    scale = {"s": 1, "m": 60, "h": 3600}.get(text[-1:])
+    return float(text[:-1]) * scale if scale else float(text)
+
+
+def parse_mix(text: str) -> dict:
+    """"predict=5,add_item=1" -> weights; endpoints not named get 0."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in MIX:
+            raise ValueError(f"unknown endpoint {name!r} (one of {', '.join(MIX)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# ==============================================================
+# SYNTHETIC HOUSEHOLDS
+# ==============================================================
+def make_catalog() -> list:
+    """Every (name, category, unit, locations, shelf-life range) product a household can buy."""
+    return [(brand + product, category, unit, locations, days)
+            for category, (products, unit, locations, days) in CATALOG.items()
+            for product in products for brand in BRANDS]
+
+
+class Household:
+    """A shopper with favourite products and the ids of the items it has added and not yet cleared."""
+
+    def __init__(self, hid: int, catalog: list, seed: int):
+        self.id = hid
+        self.rng = random.Random(seed * 100_003 + hid)
+        self.products = self.rng.sample(catalog, k=min(len(catalog), self.rng.randint(15, 40)))
+        self.items = []  # ids free to consume; checked out while a request uses them
+        self.pending_adds = 0
+
+    def full(self) -> bool:
+        return len(self.items) + self.pending_adds >= PANTRY_MAX
+
+    def new_item(self) -> dict:
+        name, category, unit, locations, (lo, hi) = self.rng.choice(self.products)
+        today = dt.date.today()
+        purchased = today - dt.timedelta(days=self.rng.choice((0, 0, 0, 1, 2, 5)))
+        item = {"name": name, "category": category, "qty": self.rng.choice((1, 1, 2, 3, 500)),
+                "unit": unit, "location": self.rng.choice(locations),
+                "purchased_on": purchased.isoformat(), "source": "loadgen", "notes": f"household {self.id}"}
+        if self.rng.random() < 0.8:  # the rest are saved without an expiry, as when the prediction is skipped
+            item["expiry_on"] = (purchased + dt.timedelta(days=self.rng.randint(lo, hi))).isoformat()
+        return item
+
+    def predict_payload(self) -> dict:
+        _, category, _, locations, _ = self.rng.choice(self.products)
+        location = self.rng.choice(locations)
+        return {"category": category, "location": location.lower(),
+                "packaging": self.rng.choice(("sealed", "sealed", "open")),
+                "state": "cooked" if category == "prepared food" else "raw",
+                "temperature": TEMPERATURES[location]}
+
+
+def make_jpeg(size, seed: int) -> bytes:
+    import io
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    arr = (rng.random((size[1], size[0], 3)) * 255).astype("uint8")
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+# ==============================================================
+# REQUESTS
+# ==============================================================
+def _failed(r) -> bool:
+    """HTTP errors, and the 200 {"error": ...} bodies several endpoints return."""
+    if r.status_code >= 400:
+        return True
+    if r.headers.get("content-type", "").startswith("application/json"):
+        body = r.json()
+        return isinstance(body, dict) and "error" in body
+    return False
+
+
+async def _call(client, op: str, home: Household, images: list) -> bool:
+    """One request of type op for household home; False if it failed."""
+    if op == "add_item" or (op == "consume_item" and not home.items):
+        if home.full():
+            op = "consume_item"
+        else:
+            home.pending_adds += 1
+            try:
+                r = await client.post("/add_item", json=home.new_item())
+            finally:
+                home.pending_adds -= 1
+            if _failed(r):
+                return False
+            home.items.append(r.json()["id"])
+            return True
+    if op == "consume_item":
+        if not home.items:
+            return True  # everything checked out by requests in flight
+        iid = home.items.pop(home.rng.randrange(len(home.items)))
+        r = await client.post(f"/consume_item/{iid}", json={"amount": home.rng.choice((1, 1, 2, 100))})
+        if _failed(r):
+            return False
+        if r.json().get("new_qty", 1) <= 0:
+            # emptied: cleared out (nothing left to log as waste)
+            r = await client.delete(f"/delete_item/{iid}", params={"reason": "none"})
+            return not _failed(r)
+        home.items.append(iid)
+        return True
+    if op == "list_items":
+        r = await client.get("/list_items")
+    elif op == "list_items_urgent":
+        r = await client.get("/list_items_urgent")
+    elif op == "predict":
+        r = await client.post("/predict", json=home.predict_payload())
+    else:
+        r = await client.post("/predict-image", files={"file": ("photo.jpg", home.rng.choice(images), "image/jpeg")})
+    return not _failed(r)
+
+
+# ==============================================================
+# STATISTICS
+# ==============================================================
+def _percentiles(latencies) -> dict:
+    if not len(latencies):
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    s = sorted(latencies)
+    n = len(s)
+    return {"p50_ms": round(s[n // 2] * 1e3, 2), "p95_ms": round(s[min(n - 1, int(n * 0.95))] * 1e3, 2),
+            "p99_ms": round(s[min(n - 1, int(n * 0.99))] * 1e3, 2), "max_ms": round(s[-1] * 1e3, 2)}
+
+
+class Recorder:
+    """Latencies and failures per endpoint, for the whole run and for the current window."""
+
+    def __init__(self, ops):
+        self.ops = list(ops)
+        self.latencies = {op: array("d") for op in self.ops}
+        self.errors = dict.fromkeys(self.ops, 0)
+        self.dropped = 0
+        self.window = []  # (op, latency, ok) since the last report
+
+    def record(self, op: str, latency: float, ok: bool):
+        self.latencies[op].append(latency)
+        if not ok:
+            self.errors[op] += 1
+        self.window.append((op, latency, ok))
+
+    def take_window(self, seconds: float) -> dict:
+        window, self.window = self.window, []
+        lat = [w[1] for w in window]
+        errors = sum(1 for w in window if not w[2])
+        return {"requests": len(window), "rps": round(len(window) / seconds, 1),
+                "error_rate": round(errors / len(window), 4) if window else 0.0, **_percentiles(lat)}
+
+    def summary(self, seconds: float) -> dict:
+        endpoints = {}
+        for op in self.ops:
+            n = len(self.latencies[op])
+            if n:
+                endpoints[op] = {"requests": n, "rps": round(n / seconds, 1), "errors": self.errors[op],
+                                 "error_rate": round(self.errors[op] / n, 4), **_percentiles(self.latencies[op])}
+        total = sum(e["requests"] for e in endpoints.values())
+        errors = sum(e["errors"] for e in endpoints.values())
+        everything = [x for op in self.ops for x in self.latencies[op]]
+        return {"requests": total, "rps": round(total / seconds, 1), "errors": errors,
+                "error_rate": round(errors / total, 4) if total else 0.0, "dropped": self.dropped,
+                **_percentiles(everything), "endpoints": endpoints}
+
+
+def rss_mb(pid: int) -> float:
+    """RSS of pid plus its child processes (API workers), from /proc."""
+    total = 0
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+
+def memory_growth(timeline: list) -> dict:
+    """First/last/peak RSS and the least-squares slope over the windows after the first (warm-up)."""
+    points = [(w["t_s"], w["rss_mb"]) for w in timeline if w.get("rss_mb")]
+    if not points:
+        return {}
+    out = {"rss_start_mb": points[0][1], "rss_end_mb": points[-1][1], "rss_peak_mb": max(p[1] for p in points),
+           "rss_growth_mb": round(points[-1][1] - points[0][1], 1)}
+    steady = points[1:]
+    if len(steady) >= 2:
+        n = len(steady)
+        mt = sum(t for t, _ in steady) / n
+        mr = sum(r for _, r in steady) / n
+        var = sum((t - mt) ** 2 for t, _ in steady)
+        if var:
+            out["rss_slope_mb_per_h"] = round(sum((t - mt) * (r - mr) for t, r in steady) / var * 3600, 2)
+    return out
+
+
+# ==============================================================
+# LOAD GENERATION
+# ==============================================================
+async def replay(url: str, duration: float, rate: float, concurrency: int, mix: dict, households: int = HOUSEHOLDS,
+                 report_every: float = 10.0, seed: int = 0, server_pid: int = None, quiet: bool = False) -> dict:
+    """Run the mix against url for duration seconds; returns the report (see module docstring)."""
+    import httpx
+
+    rng = random.Random(seed)
+    catalog = make_catalog()
+    homes = [Household(h, catalog, seed) for h in range(households)]
+    ops = [op for op, w in mix.items() if w > 0]
+    weights = [mix[op] for op in ops]
+    images = [make_jpeg(size, i) for i, size in enumerate(IMAGE_SIZES)] if "predict_image" in ops else []
+    rec = Recorder(ops)
+    slots = asyncio.Semaphore(concurrency)
+    timeline = []
+    perf = time.perf_counter
+
+    async with httpx.AsyncClient(base_url=url, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(op, home, arrived):
+            async with slots:
+                try:
+                    ok = await _call(client, op, home, images)
+                except httpx.HTTPError:
+                    ok = False
+            rec.record(op, perf() - arrived, ok)
+
+        async def open_loop(deadline):
+            tasks = set()
+            next_at = perf()
+            while next_at < deadline:
+                delay = next_at - perf()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if len(tasks) >= concurrency * BACKLOG_PER_SLOT:
+                    rec.dropped += 1
+                else:
+                    task = asyncio.create_task(one(rng.choices(ops, weights)[0], rng.choice(homes), next_at))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                next_at += rng.expovariate(rate)
+            if tasks:
+                await asyncio.gather(*tasks)
+
+        async def closed_loop(deadline):
+            async def client_loop(i):
+                crng = random.Random(seed * 7919 + i)
+                while perf() < deadline:
+                    await one(crng.choices(ops, weights)[0], crng.choice(homes), perf())
+            await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+
+        async def reporter(start, stop):
+            last = start
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), report_every)
+                except asyncio.TimeoutError:
+                    pass
+                now = perf()
+                window = {"t_s": round(now - start, 1), **rec.take_window(now - last)}
+                if server_pid:
+                    window["rss_mb"] = rss_mb(server_pid)
+                timeline.append(window)
+                last = now
+                if not quiet:
+                    print(f"  [{window['t_s']:>8.0f}s] {window['rps']:>7.1f} req/s  err {window['error_rate']:.2%}  "
+                          f"p50 {window['p50_ms']} ms  p95 {window['p95_ms']} ms  p99 {window['p99_ms']} ms"
+                          + (f"  rss {window['rss_mb']} MB" if server_pid else ""), file=sys.stderr)
+
+        start = perf()
+        stop = asyncio.Event()
+        report = asyncio.create_task(reporter(start, stop))
+        deadline = start + duration
+        await (open_loop(deadline) if rate > 0 else closed_loop(deadline))
+        elapsed = perf() - start
+        stop.set()
+        await report
+
+    return {
+        "config": {"url": url, "duration_s": duration, "rate": rate, "concurrency": concurrency, "mix": mix,
+                   "households": households, "seed": seed},
+        "elapsed_s": round(elapsed, 1),
+        **rec.summary(elapsed),
+        "memory": memory_growth(timeline),
+        "timeline": timeline,
+    }
+
+
+# ==============================================================
+# SERVER (child process: python bench_load.py --serve PORT)
+# ==============================================================
+def serve(port: int, real_models: bool):
+    import uvicorn
+    import stubs
+    if not real_models:
+        stubs.install()
+    import shelf_life
+    if not real_models or shelf_life.get_model() is None:
+        shelf_life.set_model(stubs.StubShelfLifeModel())
+    import api_server
+    uvicorn.run(api_server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: str, real_models: bool = False):
+    """Spawn the API on a free port; returns (process, base url) once it answers."""
+    import httpx
+    env = dict(os.environ, SMARTFOOD_DB=db_path, SMARTFOOD_LOG_LEVEL="WARNING")
+    port = _free_port()
+    args = [sys.executable, os.path.abspath(__file__), "--serve", str(port)] + (["--real-models"] * real_models)
+    proc = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API server exited with status {proc.returncode}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            proc.kill()
+            raise TimeoutError("timed out waiting for the API server")
+        time.sleep(0.1)
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def run_against_own_server(real_models: bool = False, **kwargs) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, url = start_server(os.path.join(tmp, "load.db"), real_models)
+        try:
+            return asyncio.run(replay(url, server_pid=proc.pid, **kwargs))
+        finally:
+            stop_server(proc)
+
+
+def run(ctx):
+    if not os.path.exists("/proc/self/status"):
+        raise RuntimeError("bench_load needs Linux /proc")
+    report = run_against_own_server(real_models=ctx.real_models, duration=10 if ctx.quick else 60, rate=40,
+                                    concurrency=16, mix=MIX, report_every=5 if ctx.quick else 15, quiet=True)
+    results = {f"load.{op}": _as_result(stats) for op, stats in report["endpoints"].items()}
+    results["load.all"] = {**_as_result(report), "dropped": report["dropped"], **report["memory"]}
+    return results
+
+
+def _as_result(stats: dict) -> dict:
+    """A report entry in the suite's result format (latencies in us, compared against the baseline)."""
+    return {"n": stats["requests"], "median_us": stats["p50_ms"] * 1e3, "p95_us": stats["p95_ms"] * 1e3,
+            "p99_us": stats["p99_ms"] * 1e3, "ops_per_sec": stats["rps"], "error_rate": stats["error_rate"]}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="an API that is already running (default: start one on a temporary database)")
+    ap.add_argument("--server-pid", type=int, help="with --url: process whose RSS (plus its workers') to sample")
+    ap.add_argument("--duration", default="60", help="seconds, or e.g. 30m, 4h")
+    ap.add_argument("--rate", type=float, default=30, help="mean arrivals per second (0: closed loop)")
+    ap.add_argument("--concurrency", type=int, default=16, help="requests in flight at most")
+    ap.add_argument("--mix", help=f"endpoint weights, e.g. predict=5,add_item=1 (default {MIX})")
+    ap.add_argument("--households", type=int, default=HOUSEHOLDS)
+    ap.add_argument("--report-every", default="10", help="window length for the periodic report")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--real-models", action="store_true", help="serve with the installed weights, not stubs")
+    ap.add_argument("--out", help="write the JSON report here")
+    ap.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.serve:
+        return serve(args.serve, args.real_models)
+    kwargs = dict(duration=parse_duration(args.duration), rate=args.rate, concurrency=args.concurrency,
+                  mix=parse_mix(args.mix) if args.mix else MIX, households=args.households,
+                  report_every=parse_duration(args.report_every), seed=args.seed)
+    if args.url:
+        report = asyncio.run(replay(args.url.rstrip("/"), server_pid=args.server_pid, **kwargs))
+    else:
+        report = run_against_own_server(real_models=args.real_models, **kwargs)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    summary = {k: v for k, v in report.items() if k != "timeline"}
+    print(json.dumps(summary, indent=2))
+    return 1 if report["error_rate"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, HERE)
+    os.chdir(ROOT)
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Recipe suggestions (recipes.py) on synthetic recipe sets: building the
+index, opening it, and a suggest() for ten urgent items, against scoring
+every recipe's ingredient set in Python (what a query without the inverted
+index would do, with the tokenising already done).
+"""
+import os
+import random
+import tempfile
+import time
+
+from common import measure, size_label, summarize
+
+SIZES = (1_000, 100_000)
+QUICK_SIZES = (10_000,)
+
+COMMON = ("salt", "onion", "garlic", "olive oil", "butter", "black pepper", "sugar", "flour", "eggs", "milk")
+PRODUCE = ("spinach", "tomatoes", "chicken breasts", "smoked salmon", "berries", "carrots", "broccoli", "yogurt",
+           "cheddar", "bell peppers", "mushrooms", "lemons", "potatoes", "rice", "pasta", "beef mince", "cream",
+           "courgettes", "peaches", "bananas", "cod", "prawns", "feta", "lentils", "chickpeas", "kale")
+UNITS = ("1 cup", "2 tbsp", "200 g", "1/2 tsp", "3", "1 lb", "1 can", "a handful of")
+PREP = ("", "chopped", "fresh", "sliced", "diced", "grated", "")
+URGENT = [("Baby Spinach", 0), ("Chicken Breast", 1), ("Greek Yogurt", 2), ("Tomatoes", 1), ("Milk", 3),
+          ("Smoked Salmon", 0), ("Cheddar", 2), ("Mushrooms", 1), ("Kale", 3), ("Lemons", 2)]
+
+
+def synthetic_recipes(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    rare = [f"spice{i}" for i in range(3000)]  # the long tail of a real ingredient vocabulary
+    for i in range(n):
+        lines = rng.sample(COMMON, rng.randint(1, 4)) + rng.sample(PRODUCE, rng.randint(2, 6))
+        lines += [rng.choice(rare) for _ in range(rng.randint(0, 4))]
+        yield {"title": f"recipe {i}",
+               "ingredients": [f"{rng.choice(UNITS)} {rng.choice(PREP)} {name}".replace("  ", " ") for name in lines]}
+
+
+def scan_suggest(recipe_tokens, items, k=10):
+    """RecipeIndex.suggest's scoring (without the head-noun fallback), visiting every recipe."""
+    import recipes
+    keys = {}
+    for name, days in items:
+        key = frozenset(recipes.ingredient_tokens(name))
+        keys[key] = max(keys.get(key, 0.0), recipes.urgency(days))
+    scored = []
+    for rid, tokens in enumerate(recipe_tokens):
+        score = sum(w for key, w in keys.items() if key <= tokens)
+        if score:
+            scored.append((-score, rid))
+    return sorted(scored)[:k]
+
+
+def run(ctx):
+    import recipes
+
+    results = {}
+    for n in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "recipes")
+            start = time.perf_counter()
+            index = recipes.build(path, synthetic_recipes(n))
+            build = summarize([time.perf_counter() - start])
+            build["recipes_per_sec"] = round(n / (build["median_us"] / 1e6))
+            build["index_mb"] = round(sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2**20, 1)
+            results[f"recipes.build[{label}]"] = build
+            index.close()
+
+            results[f"recipes.open[{label}]"] = measure(lambda: recipes.RecipeIndex(path).close(), n=5, warmup=1)
+            index = recipes.RecipeIndex(path)
+            results[f"recipes.suggest[{label}]"] = measure(lambda: index.suggest(URGENT, k=10), n=200)
+            results[f"recipes.suggest_require[{label}]"] = measure(
+                lambda: index.suggest(URGENT, k=10, require=["garlic"]), n=200)
+
+            recipe_tokens = [frozenset(t for line in r["ingredients"] for t in recipes.ingredient_tokens(line))
+                             for r in synthetic_recipes(n)]
+            results[f"recipes.scan[{label}]"] = measure(lambda: scan_suggest(recipe_tokens, URGENT), n=5, warmup=1)
+            index.close()
+    return results
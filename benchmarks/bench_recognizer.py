@@ -0,0 +1,65 @@
+"""
+Image recognition: single view, top-k, test-time augmentation with the
+8 views in one batch vs 8 separate forward calls, tiled multi-item
+detection on a 12 MP photo, and decoding that photo at full size vs with
+early (draft-mode) downscaling.
+
+With stub models the forward pass is nearly free, so the batch/separate gap
+here is decode, preprocessing and per-call glue; run with --real-models to
+include Keras' per-predict() overhead.
+"""
+import numpy as np
+
+from bench_api import make_jpeg
+from common import measure
+
+
+def make_photo(size=(4000, 3000)) -> bytes:
+    """Smooth gradients plus mild noise: compresses and decodes like a camera photo, unlike make_jpeg's noise."""
+    import io
+    from PIL import Image
+    w, h = size
+    rng = np.random.default_rng(0)
+    arr = np.empty((h, w, 3), dtype=np.float32)
+    arr[..., 0] = np.linspace(30, 220, w)[None, :]
+    arr[..., 1] = np.linspace(200, 40, h)[:, None]
+    arr[..., 2] = 128
+    arr += rng.normal(0, 6, (h, w, 1))
+    buf = io.BytesIO()
+    Image.fromarray(arr.clip(0, 255).astype("uint8")).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def run(ctx):
+    import imaging
+    import recognizer
+    from PIL import Image
+    import io
+
+    image = make_jpeg()
+    n = 20 if ctx.quick else 100
+    cnn = recognizer.MODEL.get()
+
+    views = recognizer._views(Image.open(io.BytesIO(image)).convert("RGB"), tta=True)
+    batch = recognizer.preprocess_input(np.stack([np.asarray(v) for v in views]))
+
+    def separate_calls():
+        preds = np.concatenate([np.asarray(cnn.predict(batch[i:i + 1], verbose=0)) for i in range(len(batch))])
+        return np.log(np.clip(preds, 1e-7, 1.0)).mean(axis=0)
+
+    photo = make_photo()
+
+    k = len(views)
+    return {
+        "recognizer.decode[12mp].full": measure(
+            lambda: Image.open(io.BytesIO(photo)).convert("RGB"), n=max(5, n // 4), warmup=1),
+        "recognizer.decode[12mp].downscaled": measure(
+            lambda: imaging.open_image(photo, imaging.INPUT_SIZE), n=max(5, n // 4), warmup=1),
+        "recognizer.single[12mp]": measure(lambda: recognizer.recognize(photo), n=max(5, n // 4), warmup=1),
+        "recognizer.detect[12mp].end_to_end": measure(lambda: recognizer.detect(photo), n=max(5, n // 4), warmup=1),
+        "recognizer.single": measure(lambda: recognizer.recognize(image), n=n, warmup=3),
+        "recognizer.top5": measure(lambda: recognizer.recognize(image, top_k=5), n=n, warmup=3),
+        f"recognizer.tta{k}.end_to_end": measure(lambda: recognizer.recognize(image, tta=True), n=n, warmup=3),
+        f"recognizer.tta{k}.forward.one_batch": measure(lambda: cnn.predict(batch, verbose=0), n=n * 5, warmup=3),
+        f"recognizer.tta{k}.forward.separate_calls": measure(separate_calls, n=n * 5, warmup=3),
+    }
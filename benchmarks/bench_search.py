@@ -0,0 +1,73 @@
+"""
+Inventory search (db_manager.search_items) over seeded items with realistic
+names, categories and notes: a word, a prefix, a two-word query, a typo
+(the fuzzy pass) and a miss, against the LIKE '%...%' scan over the same
+three columns that search without the items_fts index would be.
+"""
+import datetime as dt
+import random
+import sqlite3
+
+from common import measure, size_label, temp_db
+
+SIZES = (1_000, 100_000)
+QUICK_SIZES = (10_000,)
+
+FOODS = ("milk", "greek yogurt", "cheddar", "butter", "eggs", "chicken breast", "beef mince", "pork chops",
+         "smoked salmon", "cod fillets", "prawns", "spinach", "kale", "broccoli", "carrots", "tomatoes",
+         "mushrooms", "bell peppers", "courgettes", "potatoes", "bananas", "apples", "berries", "peaches",
+         "lemons", "bread", "tortillas", "rice", "pasta", "lentils", "chickpeas", "hummus", "tofu", "cream")
+BRANDS = ("", "organic", "tesco", "free range", "value", "finest", "homemade", "frozen")
+CATEGORIES = ("dairy", "meat", "fish", "vegetable", "fruit", "bakery", "grain", "legume")
+NOTES = (None, None, None, "opened", "for sunday roast", "kids lunches", "half used", "bought on offer")
+
+QUERIES = {"word": "salmon", "prefix": "chick", "two_words": "greek yog", "typo": "brocolli",
+           "miss": "xylophone"}
+
+
+def seed(path, n_rows):
+    rng = random.Random(n_rows)
+    today = dt.date.today()
+    rows = []
+    for i in range(n_rows):
+        # a unique suffix keeps most names distinct, as in a real household's history
+        name = f"{rng.choice(BRANDS)} {rng.choice(FOODS)} {i % 997}".strip()
+        exp = today + dt.timedelta(days=rng.randint(-5, 60))
+        rows.append((name, rng.choice(CATEGORIES), 1.0, "pcs", rng.choice(["Fridge", "Freezer", "Pantry"]),
+                     today.isoformat(), exp.isoformat(), "Bench", rng.choice(NOTES)))
+    con = sqlite3.connect(path)
+    con.executemany("""INSERT INTO items(name, category, qty, unit, location, purchased_on, expiry_on, source, notes)
+                       VALUES (?,?,?,?,?,?,?,?,?)""", rows)
+    con.commit()
+    con.close()
+
+
+def like_scan(q, limit=20):
+    """Every word as a LIKE '%word%' over name, category and notes: a full scan of items."""
+    import db_manager
+    terms = q.lower().split()
+    where = " AND ".join("(name LIKE ? OR category LIKE ? OR notes LIKE ?)" for _ in terms)
+    con = db_manager.get_con()
+    rows = con.execute(f"SELECT id, name FROM items WHERE {where} ORDER BY name LIMIT ?",
+                       [f"%{t}%" for t in terms for _ in range(3)] + [limit]).fetchall()
+    con.close()
+    return rows
+
+
+def run(ctx):
+    import db_manager
+
+    results = {}
+    for n in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n)
+        with temp_db() as path:
+            seed(path, n)
+            for kind, q in QUERIES.items():
+                results[f"search.fts_{kind}[{label}]"] = measure(lambda: db_manager.search_items(q), n=200)
+            for kind in ("word", "two_words"):
+                q = QUERIES[kind]
+                results[f"search.like_{kind}[{label}]"] = measure(lambda: like_scan(q), n=50)
+            results[f"search.add_item[{label}]"] = measure(
+                lambda: db_manager.add_item("organic spinach", "vegetable", 1, "pcs", "Fridge", None, "2030-01-01",
+                                            notes="for sunday roast"), n=300)
+    return results
@@ -0,0 +1,90 @@
+"""
+semantic_mapper.get_closest_category (stub SentenceTransformer unless --real-models)
+and the fine-grained taxonomy index (taxonomy.py) on a synthetic label set.
+"""
+import itertools
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import measure, size_label, summarize
+
+NAMES = ["green apple", "chicken breast", "cheddar", "sourdough bread", "salmon fillet", "crisps", "lasagne"]
+
+
+class ClusteredEmbedder:
+    """Labels "g<group> <n>" embed near a per-group direction, like product names near their category."""
+
+    name = "clustered_stub"
+
+    def __init__(self, dim=384, groups=500, spread=1.0):
+        rng = np.random.default_rng(0)
+        self.centers = rng.standard_normal((groups, dim)).astype(np.float32)
+        self.dim, self.spread = dim, spread
+
+    def encode(self, texts):
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            group, n = text.split()
+            noise = np.random.default_rng(hash(text) & 0xFFFFFFFF).standard_normal(self.dim)
+            out[row] = self.centers[int(group[1:]) % len(self.centers)] + self.spread * noise
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+def _taxonomy(ctx):
+    import taxonomy
+
+    n = 20_000 if ctx.quick else 100_000
+    label = size_label(n)
+    embedder = ClusteredEmbedder()
+    rng = np.random.default_rng(1)
+    labels = [f"g{rng.integers(500)} {i}" for i in range(n)]
+    queries = [f"g{rng.integers(500)} q{i}" for i in range(200)]
+    q_embs = embedder.encode(queries)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        index = taxonomy.build(os.path.join(tmp, "tax"), labels, embedder)
+        print(f"  built {label} labels in {time.perf_counter() - t0:.1f} s "
+              f"({'hnsw' if index.hnsw is not None else 'ivf'}, "
+              f"{os.path.getsize(os.path.join(tmp, 'tax', 'embeddings.f16')) / 2**20:.1f} MB matrix)")
+
+        matrix = np.asarray(index.embeddings, dtype=np.float32)
+
+        def exact(q, k=5):
+            scores = matrix @ q
+            top = np.argpartition(-scores, k)[:k]
+            return [index.labels[i] for i in top[np.argsort(-scores[top])]]
+
+        truth = [set(exact(q)) for q in q_embs]
+        found = [{l for l, _ in index.search(q, k=5)} for q in q_embs]
+        recall = sum(len(t & f) for t, f in zip(truth, found)) / (5 * len(truth))
+        print(f"  taxonomy recall@5 vs exact: {recall:.1%}")
+
+        cycle = itertools.cycle(q_embs)
+        results[f"taxonomy.exact_top5[{label}]"] = measure(exact, n=200, args_iter=((next(cycle),) for _ in iter(int, 1)))
+        results[f"taxonomy.search_top5[{label}]"] = measure(index.search, n=500, args_iter=((next(cycle),) for _ in iter(int, 1)))
+        results[f"taxonomy.search_top5[{label}]"]["recall_at_5"] = round(recall, 3)
+
+        batches = [[f"g{rng.integers(500)} new{b}-{i}" for i in range(100)] for b in range(10)]
+        latencies = []
+        for batch in batches:
+            t = time.perf_counter()
+            index.add(batch, embedder)
+            latencies.append(time.perf_counter() - t)
+        results["taxonomy.add_100_labels"] = summarize(latencies)
+    return results
+
+
+def run(ctx):
+    import semantic_mapper
+
+    names = itertools.cycle(NAMES)
+    results = {
+        "semantic_mapper.get_closest_category": measure(
+            semantic_mapper.get_closest_category, n=500, args_iter=((n,) for n in names)),
+    }
+    results.update(_taxonomy(ctx))
+    return results
@@ -0,0 +1,46 @@
+"""
+CLI startup regression check, measured with `python -X importtime`.
+
+Importing src/app.py must not pull in the heavy dependencies that only some
+commands need; the group fails if any of HEAVY_MODULES shows up.
+"""
+import os
+import re
+import subprocess
+import sys
+
+from common import SRC, summarize
+
+HEAVY_MODULES = ("tkinter", "torch", "sentence_transformers", "tensorflow", "requests", "pandas", "pyzxing",
+                 "recognizer", "semantic_mapper")
+RUNS = 5
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(module="app"):
+    """Return ({top-level module: cumulative us}, total us for `module`) from one fresh interpreter."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=SRC, env=env, capture_output=True, text=True, check=True)
+    loaded, total = {}, None
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, name = int(m.group(2)), m.group(4)
+        loaded[name.split(".")[0]] = cumulative
+        if name == module:
+            total = cumulative
+    return loaded, total
+
+
+def run(ctx):
+    totals = []
+    for _ in range(RUNS):
+        loaded, total = import_profile("app")
+        heavy = sorted(set(loaded) & set(HEAVY_MODULES))
+        if heavy:
+            raise AssertionError(f"`import app` loads heavy modules at startup: {', '.join(heavy)}")
+        totals.append(total / 1e6)
+    return {"startup.import_app": summarize(totals)}
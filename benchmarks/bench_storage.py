@@ -0,0 +1,141 @@
+"""
+Storage backend conformance check and throughput benchmark.
+
+Runs the same scenario against every selected backend, checking that they
+return identical shapes/values, then measures concurrent CRUD throughput.
+
+  python benchmarks/bench_storage.py                      # SQLite (threaded stand-in)
+  python benchmarks/bench_storage.py --postgres DSN       # also run asyncpg backend
+"""
+import argparse
+import asyncio
+import datetime as dt
+import os
+import tempfile
+import time
+
+from common import summarize
+import db_manager
+from storage import PostgresStorage, SQLiteStorage, ThreadedStorage
+
+
+def expect(what: str, got, want):
+    """Raise AssertionError unless got == want (unlike assert, this survives python -O)."""
+    if got != want:
+        raise AssertionError(f"{what}: got {got!r}, expected {want!r}")
+
+
+async def check_conformance(store, typos: bool = True):
+    """Exercise every operation once and check the shared contract (typos: the backend has a typo pass)."""
+    iid = await store.add_item("milk", "dairy", 2, "L", "Fridge", "2025-01-01", "2025-01-08", "Test", "n")
+    expect("add_item id type", type(iid), int)
+
+    expect("get_item", await store.get_item(iid),
+           (iid, "milk", "dairy", 2, "L", "Fridge", "2025-01-01", "2025-01-08", "Test", "n"))
+
+    expect("list_items", [r for r in await store.list_items() if r[0] == iid],
+           [(iid, "milk", 2, "L", "dairy", "Fridge", "2025-01-01", "2025-01-08")])
+
+    await store.update_item(iid, "oat milk", "dairy", 1, "L", "Pantry", "2025-01-01", "2025-02-01", "Test", None)
+    expect("get_item after update_item", (await store.get_item(iid))[1:8],
+           ("oat milk", "dairy", 1, "L", "Pantry", "2025-01-01", "2025-02-01"))
+
+    expect("consume_item part", await store.consume_item(iid, 0.25), (True, 0.75))
+    expect("consume_item more than left", await store.consume_item(iid, 5), (True, 0))
+    expect("consume_item missing id", await store.consume_item(-1, 1), (False, None))
+
+    # purchased_on defaults to today
+    iid2 = await store.add_item("bread")
+    expect("default purchased_on", (await store.get_item(iid2))[6], dt.date.today().isoformat())
+
+    iid3 = await store.add_item("broccoli", "vegetable", 1, "pcs", "Fridge", "2025-01-01", "2025-01-05")
+    rows, fuzzy = await store.search_items("oat mil")
+    expect("search_items('oat mil')", ([r[0] for r in rows], fuzzy), ([iid], False))
+    if typos:
+        rows, fuzzy = await store.search_items("brocolli")
+        expect("search_items('brocolli')", ([r[0] for r in rows], fuzzy), ([iid3], True))
+    await store.delete_item(iid3)
+
+    alert_id, new = await store.record_alert(iid, 1, 739000, '{"name": "oat milk"}')
+    expect("record_alert", new, True)
+    expect("record_alert again", await store.record_alert(iid, 1, 739000, "{}"), (alert_id, False))
+    expect("recent_alerts", await store.recent_alerts(alert_id - 1), [(alert_id, '{"name": "oat milk"}')])
+
+    expect("delete_item", await store.delete_item(iid), True)
+    expect("delete_item twice", await store.delete_item(iid), False)
+    expect("get_item after delete_item", await store.get_item(iid), None)
+    await store.delete_item(iid2)
+
+
+async def throughput(store, n_ops: int, concurrency: int) -> dict:
+    """Concurrent add -> get -> consume cycles; latency is per cycle (3 operations)."""
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def cycle(i):
+        async with sem:
+            t0 = time.perf_counter()
+            iid = await store.add_item(f"item-{i}", "fruit", 3, "pcs", "Fridge", None, "2030-01-01", "Bench", None)
+            await store.get_item(iid)
+            await store.consume_item(iid, 1)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(cycle(i) for i in range(n_ops)))
+    result = summarize(latencies, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    rows = await store.list_items()
+    result["list_rows"] = len(rows)
+    result["list_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return result
+
+
+async def run_backend(name, store, n_ops, concurrency):
+    await store.init()
+    try:
+        # Postgres only has a typo pass when the pg_trgm extension could be installed
+        await check_conformance(store, typos=not isinstance(store, PostgresStorage) or store.trgm)
+        print(f"[{name}] conformance OK")
+        result = await throughput(store, n_ops, concurrency)
+        print(f"[{name}] {result['ops_per_sec']} cycles/s over {result['n']} add+get+consume cycles "
+              f"(concurrency={concurrency}); list_items {result['list_rows']} rows in {result['list_ms']} ms")
+        return result
+    finally:
+        await store.close()
+
+
+def run(ctx):
+    """Suite entry point (benchmarks/run.py): SQLite stand-in, plus Postgres if SMARTFOOD_PG_DSN is set."""
+    results = {}
+    n_ops = 300 if ctx.quick else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        old, db_manager.DB_PATH = db_manager.DB_PATH, os.path.join(tmp, "bench.db")
+        try:
+            results["storage.sqlite.cycle"] = asyncio.run(
+                run_backend("sqlite", ThreadedStorage(SQLiteStorage()), n_ops, 16))
+        finally:
+            db_manager.DB_PATH = old
+    dsn = os.environ.get("SMARTFOOD_PG_DSN")
+    if dsn:
+        results["storage.postgres.cycle"] = asyncio.run(run_backend("postgres", PostgresStorage(dsn), n_ops, 16))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ops", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--postgres", metavar="DSN", help="also benchmark PostgresStorage against DSN")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager.DB_PATH = os.path.join(tmp, "bench.db")
+        asyncio.run(run_backend("sqlite", ThreadedStorage(SQLiteStorage()), args.ops, args.concurrency))
+
+    if args.postgres:
+        asyncio.run(run_backend("postgres", PostgresStorage(args.postgres), args.ops, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Streaming export/import of the items table (transfer.py) in each format:
+a full export to a file and a full import of that file into an empty
+database. rows_per_sec is table rows over the median run.
+"""
+import os
+import tempfile
+
+from bench_db import seed
+from common import measure, size_label, temp_db
+
+SIZES = (100_000, 1_000_000)
+QUICK_SIZES = (10_000,)
+
+
+def run(ctx):
+    import db_manager
+    import transfer
+
+    formats = [f for f in transfer.FORMATS if f == "ndjson" or transfer.pa is not None]
+    if len(formats) < len(transfer.FORMATS):
+        print("  pyarrow not installed: ndjson only")
+
+    results = {}
+    for n_rows in (QUICK_SIZES if ctx.quick else SIZES):
+        label = size_label(n_rows)
+        runs = 3 if n_rows >= 1_000_000 else 5
+        with tempfile.TemporaryDirectory() as tmp:
+            files = {fmt: os.path.join(tmp, f"items.{fmt}") for fmt in formats}
+            with temp_db() as path:
+                seed(path, n_rows)
+                for fmt in formats:
+                    stats = measure(lambda: transfer.export_to(files[fmt], db_manager.iter_item_batches()),
+                                    n=runs, warmup=0)
+                    stats["rows_per_sec"] = round(n_rows * 1e6 / stats["median_us"])
+                    stats["file_mb"] = round(os.path.getsize(files[fmt]) / 2**20, 1)
+                    results[f"transfer.export_{fmt}[{label}]"] = stats
+
+            for fmt in formats:
+                with temp_db():
+                    # each run appends another copy; ids keep growing as in a real import
+                    stats = measure(lambda: transfer.import_from(files[fmt], db_manager.add_items),
+                                    n=1 if n_rows >= 1_000_000 else 3, warmup=0)
+                stats["rows_per_sec"] = round(n_rows * 1e6 / stats["median_us"])
+                results[f"transfer.import_{fmt}[{label}]"] = stats
+    return results
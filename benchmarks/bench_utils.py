@@ -0,0 +1,49 @@
+"""utils.shelf_life_days over shelf-life CSVs of various sizes, and utils.parse_date_input."""
+import csv
+import itertools
+import os
+import random
+import tempfile
+
+from common import measure, size_label
+
+CSV_SIZES = (100, 1_000, 10_000)
+QUICK_CSV_SIZES = (100, 1_000)
+
+DATE_INPUTS = ["", "today", "y", "3", "3d", "5 days ago", "2025-11-21", "11/21", "11-21", "21", "garbage"]
+
+
+def write_shelf_csv(path, n):
+    """Write a synthetic shelf-life table; returns the food names."""
+    rng = random.Random(n)
+    names = [f"food{i} {rng.choice(['apple', 'cheese', 'bread', 'ham'])}" for i in range(n)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["name", "days"])
+        for name in names:
+            w.writerow([name, rng.randint(1, 365)])
+    return names
+
+
+def run(ctx):
+    import utils
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (QUICK_CSV_SIZES if ctx.quick else CSV_SIZES):
+            path = os.path.join(tmp, f"shelf_{n}.csv")
+            names = write_shelf_csv(path, n)
+            utils.DATA_PATH, utils._SHELF = path, None
+            label = size_label(n)
+            results[f"utils.shelf_life_days.exact[{label}]"] = measure(
+                utils.shelf_life_days, n=2000, args_iter=((names[i % n].upper(),) for i in itertools.count()))
+            # misses fall through to the substring scan (and fuzzy match when available)
+            results[f"utils.shelf_life_days.miss[{label}]"] = measure(
+                utils.shelf_life_days, n=50 if n >= 10_000 else 200, warmup=2,
+                args_iter=((f"unknown thing {i}",) for i in itertools.count()))
+        utils._SHELF = None
+
+    inputs = itertools.cycle(DATE_INPUTS)
+    results["utils.parse_date_input"] = measure(utils.parse_date_input, n=20_000,
+                                                args_iter=((s,) for s in inputs))
+    return results
@@ -0,0 +1,230 @@
+"""
+Multi-process serving: memory per worker and throughput for 1-8 API workers.
+
+Three layouts, all serving POST /predict from one shared listening socket:
+
+  workers.separate   each worker imports the app and loads its own models
+                     (what `uvicorn --workers N` does)
+  workers.preload    the app is imported once, then workers fork and share
+                     the model pages copy-on-write (gunicorn_conf.py)
+  workers.shared     workers load no models; inference runs in one
+                     src/inference_worker.py process over local IPC
+
+For each layout and worker count the result records client-side latency and
+throughput plus average RSS and PSS per worker (PSS splits shared pages
+between the processes that map them, so it's the fair per-worker figure) and
+total PSS including the inference process. The stub CNN carries
+SMARTFOOD_STUB_MODEL_MB of weights (default 64 here) to stand in for the model.
+
+Linux only (/proc). Not part of the default run:
+
+  python benchmarks/run.py --only workers
+"""
+import concurrent.futures
+import gc
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PAYLOAD = {"category": "fruit", "location": "fridge", "packaging": "sealed", "state": "raw", "temperature": 4}
+LAYOUTS = ("separate", "preload", "shared")
+
+
+def _proc_kb(pid: int, path: str, field: str) -> int:
+    with open(f"/proc/{pid}/{path}") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def memory_mb(pid: int) -> dict:
+    return {
+        "rss_mb": round(_proc_kb(pid, "status", "VmRSS") / 1024, 1),
+        "pss_mb": round(_proc_kb(pid, "smaps_rollup", "Pss") / 1024, 1),
+    }
+
+
+def _wait_for(predicate, timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"timed out waiting for {what}")
+        time.sleep(0.05)
+
+
+# ==============================================================
+# CHILD PROCESSES (python bench_workers.py <role> ...)
+# ==============================================================
+def _load_app():
+    import stubs
+    stubs.install()
+    import shelf_life
+    shelf_life.set_model(stubs.StubShelfLifeModel())
+    import api_server
+    return api_server.app
+
+
+def _serve_worker(app_loader, sock, ready_dir):
+    import uvicorn
+    app = app_loader()
+    open(os.path.join(ready_dir, str(os.getpid())), "w").close()
+    uvicorn.Server(uvicorn.Config(app, log_level="warning")).run(sockets=[sock])
+
+
+def serve_api(layout: str, workers: int, port: int, ready_dir: str):
+    """Bind once, then fork `workers` uvicorn servers on the same socket."""
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    sock.listen(512)
+    sock.set_inheritable(True)
+
+    if layout == "separate":
+        loader = _load_app
+    else:
+        app = _load_app()
+        gc.freeze()
+        loader = lambda: app  # noqa: E731
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _serve_worker(loader, sock, ready_dir)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    signal.signal(signal.SIGTERM, lambda *a: [os.kill(p, signal.SIGTERM) for p in children])
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def serve_inference(addr: str):
+    import stubs
+    stubs.install()
+    import shelf_life
+    shelf_life.set_model(stubs.StubShelfLifeModel())
+    import inference_worker
+    inference_worker.serve(addr)
+
+
+# ==============================================================
+# LOAD GENERATION
+# ==============================================================
+def _client_loop(url: str, duration: float):
+    import requests
+    latencies = []
+    perf = time.perf_counter
+    with requests.Session() as s:
+        s.post(url, json=PAYLOAD).raise_for_status()  # warm the connection
+        deadline = perf() + duration
+        while perf() < deadline:
+            t0 = perf()
+            s.post(url, json=PAYLOAD).raise_for_status()
+            latencies.append(perf() - t0)
+    return latencies
+
+
+def generate_load(url: str, clients: int, duration: float) -> dict:
+    with concurrent.futures.ProcessPoolExecutor(clients) as pool:
+        start = time.perf_counter()
+        futures = [pool.submit(_client_loop, url, duration) for _ in range(clients)]
+        latencies = [lat for f in futures for lat in f.result()]
+        total = time.perf_counter() - start
+    return summarize(latencies, total)
+
+
+def _spawn(*args, env):
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), *args], cwd=ROOT, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_layout(layout: str, workers: int, duration: float) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SMARTFOOD_STUB_MODEL_MB", "64")
+    env["SMARTFOOD_LOG_LEVEL"] = "WARNING"
+    env.pop("SMARTFOOD_INFERENCE_ADDR", None)
+    procs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env["SMARTFOOD_DB"] = os.path.join(tmp, "bench.db")
+        inference = None
+        try:
+            if layout == "shared":
+                addr = os.path.join(tmp, "inference.sock")
+                inference = _spawn("inference", addr, env=env)
+                procs.append(inference)
+                if not inference.stdout.readline().startswith("READY"):
+                    raise RuntimeError("inference worker failed to start")
+                env["SMARTFOOD_INFERENCE_ADDR"] = addr
+
+            port, ready = _free_port(), os.path.join(tmp, "ready")
+            os.mkdir(ready)
+            procs.append(_spawn("api", layout, str(workers), str(port), ready, env=env))
+            _wait_for(lambda: len(os.listdir(ready)) >= workers, 120, f"{workers} {layout} workers")
+            time.sleep(0.2)  # let the servers enter accept()
+
+            stats = generate_load(f"http://127.0.0.1:{port}/predict", clients=max(2, workers * 2),
+                                  duration=duration)
+            mem = [memory_mb(int(pid)) for pid in os.listdir(ready)]
+            stats["workers"] = workers
+            stats["rss_mb_per_worker"] = round(sum(m["rss_mb"] for m in mem) / len(mem), 1)
+            stats["pss_mb_per_worker"] = round(sum(m["pss_mb"] for m in mem) / len(mem), 1)
+            total_pss = sum(m["pss_mb"] for m in mem)
+            if inference is not None:
+                stats["inference_pss_mb"] = memory_mb(inference.pid)["pss_mb"]
+                total_pss += stats["inference_pss_mb"]
+            stats["total_pss_mb"] = round(total_pss, 1)
+            return stats
+        finally:
+            for p in reversed(procs):
+                p.terminate()
+                try:
+                    p.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    p.kill()
+
+
+def run(ctx):
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise RuntimeError("bench_workers needs Linux /proc/<pid>/smaps_rollup")
+    counts = (1, 2, 4) if ctx.quick else (1, 2, 4, 8)
+    duration = 1.0 if ctx.quick else 3.0
+    results = {}
+    for layout in LAYOUTS:
+        for n in counts:
+            stats = run_layout(layout, n, duration)
+            print(f"  workers.{layout}.{n}: rss/worker {stats['rss_mb_per_worker']} MB, "
+                  f"pss/worker {stats['pss_mb_per_worker']} MB, total pss {stats['total_pss_mb']} MB")
+            results[f"workers.{layout}.{n}"] = stats
+    return results
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, HERE)
+    os.chdir(ROOT)
+    role, args = sys.argv[1], sys.argv[2:]
+    if role == "api":
+        serve_api(args[0], int(args[1]), int(args[2]), args[3])
+    elif role == "inference":
+        serve_inference(args[0])
+    else:
+        raise SystemExit(f"unknown role {role}")
@@ -0,0 +1,68 @@
+"""
+Shared helpers for the benchmark suite: import paths, temporary databases
+and timing/statistics.
+"""
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+
+@contextlib.contextmanager
+def temp_db():
+    """Point db_manager at a fresh SQLite file for the duration of the block."""
+    import db_manager
+    old = db_manager.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager.DB_PATH = os.path.join(tmp, "bench.db")
+        db_manager.init_db()
+        try:
+            yield db_manager.DB_PATH
+        finally:
+            db_manager.DB_PATH = old
+
+
+def summarize(latencies, total=None) -> dict:
+    """Latency stats in microseconds (lower is better) plus throughput."""
+    latencies = sorted(latencies)
+    n = len(latencies)
+    total = total if total is not None else sum(latencies)
+    return {
+        "n": n,
+        "median_us": round(statistics.median(latencies) * 1e6, 3),
+        "p95_us": round(latencies[min(n - 1, int(n * 0.95))] * 1e6, 3),
+        "p99_us": round(latencies[min(n - 1, int(n * 0.99))] * 1e6, 3),
+        "ops_per_sec": round(n / total, 1) if total else None,
+    }
+
+
+def measure(fn, n: int = 1000, warmup: int = 10, args_iter=None) -> dict:
+    """
+    Call fn n times and summarize per-call latency.
+    args_iter: optional iterator yielding a tuple of args per call.
+    """
+    for _ in range(warmup):
+        fn(*next(args_iter)) if args_iter is not None else fn()
+    latencies = []
+    perf = time.perf_counter
+    start = perf()
+    for _ in range(n):
+        t0 = perf()
+        fn(*next(args_iter)) if args_iter is not None else fn()
+        latencies.append(perf() - t0)
+    return summarize(latencies, perf() - start)
+
+
+def size_label(n: int) -> str:
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}m"
+    if n >= 1000 and n % 1000 == 0:
+        return f"{n // 1000}k"
+    return str(n)
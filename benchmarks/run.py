@@ -0,0 +1,137 @@
+"""
+SmartFoodAI benchmark suite.
+
+Runs offline on synthetic data with stub models (see stubs.py), writes
+machine-readable JSON and compares median latencies against a stored baseline.
+
+  python benchmarks/run.py                         # full run, compare with baseline.json
+  python benchmarks/run.py --quick --only db,utils # smaller sizes, selected groups
+  python benchmarks/run.py --save-baseline         # record a new baseline
+  python benchmarks/run.py --real-models           # use installed models instead of stubs
+  python benchmarks/run.py --only workers          # multi-process memory/throughput (opt-in)
+  python benchmarks/run.py --only load             # mixed-endpoint replay against a live server (opt-in)
+
+Exit status is 1 when any benchmark's median is slower than the baseline by
+more than --tolerance (default 25%).
+"""
+import argparse
+import datetime as dt
+import importlib
+import json
+import os
+import platform
+import sys
+import traceback
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+os.environ.setdefault("SMARTFOOD_LOG_LEVEL", "WARNING")
+
+import common  # noqa: E402  (sets up sys.path for src/)
+
+GROUPS = {
+    "db": "bench_db",
+    "utils": "bench_utils",
+    "semantic": "bench_semantic",
+    "embedders": "bench_embedders",
+    "barcode": "bench_barcode",
+    "api": "bench_api",
+    "recognizer": "bench_recognizer",
+    "storage": "bench_storage",
+    "alerts": "bench_alerts",
+    "analytics": "bench_analytics",
+    "transfer": "bench_transfer",
+    "backup": "bench_backup",
+    "cache": "bench_cache",
+    "bulk_import": "bench_bulk_import",
+    "recipes": "bench_recipes",
+    "search": "bench_search",
+    "client": "bench_client",
+    "startup": "bench_startup",
+    "workers": "bench_workers",
+    "load": "bench_load",
+}
+OPT_IN = {"workers", "load"}  # slow / multi-process; run with --only
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return [(name, baseline_us, current_us, ratio)] for regressions beyond tolerance."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("median_us") or not stats.get("median_us"):
+            continue
+        ratio = stats["median_us"] / base["median_us"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, base["median_us"], stats["median_us"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--only", help=f"comma-separated groups ({','.join(GROUPS)})")
+    ap.add_argument("--quick", action="store_true", help="smaller sizes/iterations (skips 100k-row tables)")
+    ap.add_argument("--real-models", action="store_true", help="don't install stub models")
+    ap.add_argument("--out", default=os.path.join(HERE, "results.json"), help="where to write JSON results")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    ctx = ap.parse_args(argv)
+
+    if not ctx.real_models:
+        import stubs
+        stubs.install()
+
+    groups = ctx.only.split(",") if ctx.only else [g for g in GROUPS if g not in OPT_IN]
+    results, errors = {}, {}
+    for group in groups:
+        print(f"== {group}")
+        try:
+            module = importlib.import_module(GROUPS[group])
+            group_results = module.run(ctx)
+        except Exception as e:
+            traceback.print_exc()
+            errors[group] = f"{type(e).__name__}: {e}"
+            continue
+        for name, stats in group_results.items():
+            print(f"  {name:<48} median {stats['median_us']:>12.1f} us   p95 {stats['p95_us']:>12.1f} us"
+                  f"   {stats['ops_per_sec'] or 0:>10.1f} ops/s")
+        results.update(group_results)
+
+    report = {
+        "meta": {
+            "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": ctx.quick,
+            "stub_models": not ctx.real_models,
+        },
+        "results": results,
+        "errors": errors,
+    }
+    with open(ctx.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nWrote {ctx.out}")
+
+    if ctx.save_baseline:
+        with open(ctx.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {ctx.baseline}")
+        return 1 if errors else 0
+
+    if not os.path.exists(ctx.baseline):
+        print("No baseline found; run with --save-baseline to create one.")
+        return 1 if errors else 0
+    with open(ctx.baseline, encoding="utf-8") as f:
+        baseline = json.load(f).get("results", {})
+    regressions = compare(results, baseline, ctx.tolerance)
+    for name, base_us, cur_us, ratio in regressions:
+        print(f"REGRESSION {name}: {base_us:.1f} us -> {cur_us:.1f} us ({ratio:.2f}x)")
+    if not regressions:
+        print(f"No regressions beyond {ctx.tolerance:.0%} against {ctx.baseline}")
+    return 1 if (regressions or errors) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
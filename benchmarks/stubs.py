@@ -0,0 +1,98 @@
+"""
+Stub models so benchmarks run offline without TensorFlow, sentence-transformers,
+pyzxing (Java) or the trained weights. The stubs keep the call shapes of the real
+libraries and do a small, deterministic amount of NumPy work, so the numbers
+measure SmartFoodAI's own code paths (decoding, preprocessing, SQL, glue).
+
+install() must run before importing recognizer / semantic_mapper / api_server.
+"""
+import hashlib
+import os
+import sys
+import types
+
+import numpy as np
+
+N_CLASSES = 14
+EMBED_DIM = 384
+
+
+class StubCNN:
+    def __init__(self):
+        # optional dead weight so multi-process memory benchmarks have something to share
+        mb = float(os.environ.get("SMARTFOOD_STUB_MODEL_MB", "0"))
+        self.weights = np.ones(int(mb * (1 << 20)) // 4, dtype=np.float32)
+
+    def predict(self, x, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        feats = x.reshape(len(x), -1)[:, ::97].mean(axis=1, keepdims=True)
+        logits = np.sin(feats * np.arange(1, N_CLASSES + 1, dtype=np.float32))
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+
+class StubSentenceTransformer:
+    def __init__(self, name=None, *args, **kwargs):
+        self.name = name
+
+    def encode(self, sentences, convert_to_tensor=False, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        out = np.empty((len(sentences), EMBED_DIM), dtype=np.float32)
+        for i, s in enumerate(sentences):
+            seed = int.from_bytes(hashlib.blake2b(s.lower().encode(), digest_size=8).digest(), "little")
+            v = np.random.default_rng(seed).standard_normal(EMBED_DIM).astype(np.float32)
+            out[i] = v / np.linalg.norm(v)
+        return out[0] if single else out
+
+
+def _cos_sim(a, b):
+    a = np.atleast_2d(np.asarray(a, dtype=np.float32))
+    b = np.atleast_2d(np.asarray(b, dtype=np.float32))
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return a @ b.T
+
+
+class StubBarCodeReader:
+    def decode(self, path):
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        return [{"raw": str(int(digest[:12], 16))[:13].encode(), "format": b"EAN_13"}]
+
+
+class StubShelfLifeModel:
+    """Stand-in for the joblib regressor: returns a log-ratio per row."""
+
+    def predict(self, df):
+        temp = np.asarray(df["temperature"], dtype=np.float64)
+        return np.clip(-0.02 * temp, -1.0, 1.0)
+
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    sys.modules[name] = mod
+    return mod
+
+
+def install():
+    """Register stub tensorflow, sentence_transformers and pyzxing modules."""
+    tf = _module("tensorflow")
+    keras = _module("tensorflow.keras")
+    models = _module("tensorflow.keras.models", load_model=lambda path, *a, **k: StubCNN())
+    preprocessing = _module("tensorflow.keras.preprocessing")
+    image = _module("tensorflow.keras.preprocessing.image")
+    applications = _module("tensorflow.keras.applications")
+    efficientnet = _module("tensorflow.keras.applications.efficientnet",
+                           preprocess_input=lambda x: np.asarray(x, dtype=np.float32))
+    tf.keras = keras
+    keras.models, keras.preprocessing, keras.applications = models, preprocessing, applications
+    preprocessing.image = image
+    applications.efficientnet = efficientnet
+
+    util = _module("sentence_transformers.util", cos_sim=_cos_sim)
+    _module("sentence_transformers", SentenceTransformer=StubSentenceTransformer, util=util)
+
+    _module("pyzxing", BarCodeReader=StubBarCodeReader)
@@ -82,6 +82,9 @@ export default function AddItemInteractive() {
       expiry_on: expiryDate.toISOString().split("T")[0],
       source: "WebApp",
       notes: `Predicted shelf life: ${prediction?.predicted_shelf_life_days} days`,
+      // the uncorrected prediction the expiry came from, for shelf-life calibration
+      model_shelf_life_days:
+        prediction?.model_shelf_life_days ?? prediction?.predicted_shelf_life_days,
     };
 
     try {
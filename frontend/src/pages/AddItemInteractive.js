@@ -92,6 +92,10 @@ export default function AddItemInteractive() {
       notes: useCustom
         ? "Custom expiry date selected by user."
         : `Predicted shelf life: ${prediction?.predicted_shelf_life_days} days`,
+      // the uncorrected prediction, only when the expiry came from it (shelf-life calibration)
+      model_shelf_life_days: useCustom
+        ? undefined
+        : prediction?.model_shelf_life_days ?? prediction?.predicted_shelf_life_days,
     };
 
     try {
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import {
   Card,
   CardContent,
@@ -22,27 +22,43 @@ export default function ItemsList() {
   const [loading, setLoading] = useState(true);
   const [editItem, setEditItem] = useState(null);
   const [sortUrgent, setSortUrgent] = useState(false); // toggle for sorting
+  const [query, setQuery] = useState("");
+  const [fuzzy, setFuzzy] = useState(false); // search found typo matches only
+  const latestFetch = useRef(0); // responses from older fetches are dropped
+  const loadedOnce = useRef(false);
 
-  // Fetch all items from FastAPI
-  const fetchItems = async () => {
+  // Fetch all items, or the search results for the query, from FastAPI
+  const fetchItems = async (q = query) => {
+    const seq = ++latestFetch.current;
     setLoading(true);
     try {
-      const res = await fetch(`${API_BASE}/list_items`);
+      const url = q.trim()
+        ? `${API_BASE}/search?q=${encodeURIComponent(q.trim())}&limit=50`
+        : `${API_BASE}/list_items`;
+      const res = await fetch(url);
       const data = await res.json();
+      if (seq !== latestFetch.current) return;
 
       const itemsArray = Array.isArray(data) ? data : data.items || [];
       setItems(itemsArray);
+      setFuzzy(!!data.fuzzy);
     } catch (err) {
+      if (seq !== latestFetch.current) return;
       console.error("Error fetching items:", err);
       setItems([]);
     } finally {
-      setLoading(false);
+      if (seq === latestFetch.current) {
+        loadedOnce.current = true;
+        setLoading(false);
+      }
     }
   };
 
+  // Search as you type, once typing pauses
   useEffect(() => {
-    fetchItems();
-  }, []);
+    const timer = setTimeout(() => fetchItems(query), 200);
+    return () => clearTimeout(timer);
+  }, [query]); // eslint-disable-line react-hooks/exhaustive-deps
 
   // --- Handle delete item
   const handleDelete = async (id) => {
@@ -106,7 +122,8 @@ export default function ItemsList() {
     return getPriority(a.days_left) - getPriority(b.days_left);
   });
 
-  if (loading)
+  // Full-page spinner on the first load only, so the search box keeps focus
+  if (loading && !loadedOnce.current)
     return (
       <Box sx={{ display: "flex", justifyContent: "center", mt: 5 }}>
         <CircularProgress />
@@ -125,6 +142,24 @@ export default function ItemsList() {
         </Button>
       </Box>
 
+      <TextField
+        fullWidth
+        label="Search by name, category or notes"
+        sx={{ mb: 3 }}
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+        InputProps={{
+          endAdornment: loading ? <CircularProgress size={20} /> : null,
+        }}
+        helperText={
+          fuzzy
+            ? `No exact match for "${query.trim()}"; showing the closest items`
+            : query.trim() && !items.length
+            ? "No matching items"
+            : " "
+        }
+      />
+
       <Grid container spacing={3}>
         {sortedItems.map((item) => (
           <Grid item xs={12} sm={6} md={4} key={item.id}>
@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for multi-worker serving.
+
+    gunicorn -c gunicorn_conf.py src.api_server:app
+
+Two supported layouts:
+
+1. Preload (default): the app, and with it the joblib shelf-life model, is
+   imported once in the master and shared copy-on-write by forked workers.
+   gc.freeze() before forking keeps the GC from touching (and so copying)
+   the pages of objects created at import time. TensorFlow's runtime threads
+   don't survive fork(), so SMARTFOOD_CNN_AFTER_FORK makes each worker load
+   the CNN itself after forking: one copy per worker.
+
+2. Dedicated inference process: start `python src/inference_worker.py` and
+   set SMARTFOOD_INFERENCE_ADDR (e.g. /tmp/smartfood.sock) for gunicorn.
+   Workers then load no models and forward inference over local IPC.
+"""
+import gc
+import os
+
+# read by api_server at import, i.e. in the master with preload_app
+os.environ.setdefault("SMARTFOOD_CNN_AFTER_FORK", "1")
+
+bind = os.environ.get("SMARTFOOD_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("SMARTFOOD_WORKERS", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 60
+
+
+def pre_fork(server, worker):
+    gc.freeze()
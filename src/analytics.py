@@ -0,0 +1,99 @@
+"""
+Consumption and waste reports from the daily_rollups table (db_manager).
+
+Rollups hold one row per (day, category, location, source), so a report
+over N weeks reads at most 7 * N * groups rows however long the event
+history is; aggregation is vectorised with NumPy.
+
+Quantities are summed as stored, whatever their unit; *_events counts are
+unit-free.
+"""
+import datetime as dt
+from typing import Optional
+
+import numpy as np
+
+from db_manager import ROLLUP_COLUMNS
+
+GROUPINGS = ("category", "location", "source")
+_SUMS = ["consumed_qty", "wasted_qty", "consumed_events", "wasted_events"]
+
+
+def week_start(day_ordinals):
+    """Monday of each day's week, as day ordinals (ordinal 1 is a Monday)."""
+    days = np.asarray(day_ordinals, dtype=np.int64)
+    return days - (days - 1) % 7
+
+
+def report_range(weeks: int, today: Optional[dt.date] = None) -> tuple:
+    """(from_day, to_day): the current week plus the `weeks - 1` full weeks before it."""
+    to_day = (today or dt.date.today()).toordinal()
+    return int(week_start([to_day])[0]) - 7 * (weeks - 1), to_day
+
+
+def _ratio(wasted, consumed):
+    total = wasted + consumed
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, np.round(wasted / total, 4), np.nan)
+
+
+def _table(labels, sums):
+    """Rows of {label columns..., sums..., waste_ratio} as JSON-friendly dicts."""
+    ratio = _ratio(sums["wasted_qty"], sums["consumed_qty"])
+    out = []
+    for i in range(len(ratio)):
+        row = {name: values[i] for name, values in labels.items()}
+        row.update({k: (int(v[i]) if k.endswith("_events") else round(float(v[i]), 4)) for k, v in sums.items()})
+        row["waste_ratio"] = None if np.isnan(ratio[i]) else float(ratio[i])
+        out.append(row)
+    return out
+
+
+def waste_report(rows, weeks: int, by: Optional[str] = None, today: Optional[dt.date] = None) -> dict:
+    """
+    Weekly consumed vs wasted totals from rollup rows.
+      by: None for one series, or "category" / "location" / "source" for one per group
+    Aggregation is np.bincount over (week, group) keys, so cost is linear in
+    the rollup rows read and independent of how many events produced them.
+    """
+    if by is not None and by not in GROUPINGS:
+        raise ValueError(f"by must be one of {GROUPINGS}")
+    from_day, to_day = report_range(weeks, today)
+    cols = dict(zip(ROLLUP_COLUMNS, zip(*rows))) if rows else {c: () for c in ROLLUP_COLUMNS}
+    days = np.asarray(cols["day"], dtype=np.int64)
+    keep = (days >= from_day) & (days <= to_day)
+    week_idx = (week_start(days[keep]) - from_day) // 7
+    values = {k: np.asarray(cols[k], dtype=np.float64)[keep] for k in _SUMS}
+
+    if by:
+        names, group_idx = np.unique(np.asarray(cols[by], dtype=object)[keep].astype(str), return_inverse=True)
+    else:
+        names, group_idx = np.array([""]), np.zeros(len(week_idx), dtype=np.int64)
+    n_groups = len(names)
+    key = week_idx * n_groups + group_idx
+    size = weeks * n_groups
+    cells = {k: np.bincount(key, weights=v, minlength=size) for k, v in values.items()}
+
+    week_labels = [dt.date.fromordinal(from_day + 7 * w).isoformat() for w in range(weeks)]
+    if by:
+        # sparse per-group series: only (week, group) cells with any events
+        present = np.flatnonzero(np.bincount(key, minlength=size))
+        labels = {"week": [week_labels[i // n_groups] for i in present],
+                  by: [str(names[i % n_groups]) for i in present]}
+        series = _table(labels, {k: v[present] for k, v in cells.items()})
+    else:
+        series = _table({"week": week_labels}, cells)
+
+    result = {
+        "weeks": weeks,
+        "from": dt.date.fromordinal(from_day).isoformat(),
+        "to": dt.date.fromordinal(to_day).isoformat(),
+        "by": by,
+        "totals": _table({}, {k: np.array([v.sum()]) for k, v in values.items()})[0],
+        "series": series,
+    }
+    if by:
+        per_group = {k: np.bincount(group_idx, weights=v, minlength=n_groups) for k, v in values.items()}
+        order = np.argsort(-per_group["wasted_qty"], kind="stable")
+        result["groups"] = _table({by: [str(names[i]) for i in order]}, {k: v[order] for k, v in per_group.items()})
+    return result
@@ -7,13 +7,39 @@ SRC_PATH = os.path.abspath(os.path.dirname(__file__))
 sys.path.insert(0, PROJECT_ROOT)
 sys.path.insert(0, SRC_PATH)
 
-print("\n[FIXED PATHS]")
-print("Added to sys.path:", PROJECT_ROOT)
-print("Added to sys.path:", SRC_PATH)
-print()
+import logging
+from metrics import setup_logging, log_sampled
 
-import recognizer
-print(">>> RECOGNIZER MODULE LOADED FROM:", recognizer.__file__)
+setup_logging()
+logger = logging.getLogger("smartfood.api")
+logger.debug("Added to sys.path: %s, %s", PROJECT_ROOT, SRC_PATH)
+
+# ==============================================================
+# MODEL BACKEND
+# ==============================================================
+# In-process by default. With SMARTFOOD_INFERENCE_ADDR set, models live in a
+# single shared inference process (src/inference_worker.py) and this worker
+# loads none of them.
+import asyncio
+from inference_worker import InferenceError
+INFERENCE_ADDR = os.environ.get("SMARTFOOD_INFERENCE_ADDR")
+# gunicorn_conf.py sets this: TensorFlow's runtime threads don't survive
+# fork(), so each worker imports the CNN itself (see load_recognizer)
+CNN_AFTER_FORK = os.environ.get("SMARTFOOD_CNN_AFTER_FORK", "0") == "1"
+if INFERENCE_ADDR:
+    from inference_worker import InferenceClient
+    inference = InferenceClient(INFERENCE_ADDR)
+    logger.info("Forwarding model inference to %s", INFERENCE_ADDR)
+else:
+    inference = None
+    if not CNN_AFTER_FORK:
+        import recognizer
+        logger.debug("Recognizer module loaded from: %s", recognizer.__file__)
+
+def _recognizer():
+    """The recognizer module; concurrent first imports wait on Python's import lock."""
+    import recognizer
+    return recognizer
 
 
 # ==============================================================
@@ -21,19 +47,14 @@ print(">>> RECOGNIZER MODULE LOADED FROM:", recognizer.__file__)
 # ==============================================================
 from fastapi import FastAPI
 from pydantic import BaseModel
-import pandas as pd
-import numpy as np
-import joblib
-import traceback
 import os
-import datetime as dt
 
 
 # ==============================================================
 # SMARTFOOD AI - IMAGE RECOGNITION MODULE (EfficientNetB0)
 # ==============================================================
-from fastapi import UploadFile, File
-from recognizer import recognize
+from fastapi import UploadFile, File, Query
+from utils import detections_to_items
 import shutil, uuid
 
 
@@ -58,6 +79,42 @@ from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(title="SmartFoodAI Shelf-Life Prediction API")
 
+# Middleware added first runs innermost: the upload limit goes inside CORS and
+# the request metrics, so its 413/429 answers carry CORS headers and are counted.
+import uploads
+
+UPLOAD_PATHS = ("/predict-image", "/detect-items")
+app.add_middleware(uploads.UploadLimitMiddleware, paths=UPLOAD_PATHS)
+
+# --- Request metrics (count + latency per route template) ---
+import time
+from fastapi.responses import PlainTextResponse
+from metrics import REGISTRY, HTTP_REQUESTS, HTTP_LATENCY
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by route template (/delete_item/{item_id}), not the raw path
+        route = request.scope.get("route")
+        if route is not None:
+            path = route.path
+        else:
+            # uploads rejected before routing; these paths are literal routes
+            path = request.url.path if request.url.path in UPLOAD_PATHS else "unmatched"
+        HTTP_REQUESTS.inc(route=path, method=request.method, status=str(status))
+        HTTP_LATENCY.observe(time.perf_counter() - start, route=path, method=request.method)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of the in-process metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # --- Enable CORS ---
 app.add_middleware(
     CORSMiddleware,
@@ -67,20 +124,159 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==============================================================
+# ADMIN: SAMPLING PROFILER (opt-in, SMARTFOOD_PROFILING=1)
+# ==============================================================
+from fastapi import Depends, Header, HTTPException, Response
+import hmac
+import profiler
+
+ADMIN_TOKEN = os.environ.get("SMARTFOOD_ADMIN_TOKEN")
+# Without a token admin endpoints are closed, unless explicitly opened (local development)
+ADMIN_OPEN = os.environ.get("SMARTFOOD_ADMIN_OPEN", "0") == "1"
+
+def require_admin(x_admin_token: str = Header(None)):
+    """
+    Admin endpoints (export/import, backups, model swaps, profiling) require
+    an X-Admin-Token matching SMARTFOOD_ADMIN_TOKEN. With no token configured
+    they answer 503, unless SMARTFOOD_ADMIN_OPEN=1.
+    """
+    if not ADMIN_TOKEN:
+        if ADMIN_OPEN:
+            return
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled: set SMARTFOOD_ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+def require_profiling(x_admin_token: str = Header(None)):
+    if not profiler.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    require_admin(x_admin_token)
+
+if profiler.ENABLED:
+    @app.middleware("http")
+    async def profile_requests(request, call_next):
+        if not profiler.selector.wants(request.url.path):
+            return await call_next(request)
+        profiler.sampler.enter()
+        try:
+            return await call_next(request)
+        finally:
+            profiler.sampler.exit()
+
+    @app.on_event("startup")
+    def start_profiler():
+        # request-triggered sampling; the sampler thread sleeps until a profiled request arrives
+        if profiler.selector.sample_rate > 0 or profiler.selector.route:
+            profiler.sampler.start()
+
+@app.post("/admin/profile/start", dependencies=[Depends(require_profiling)])
+def profile_start(route: str = None, sample_rate: float = None, interval_ms: float = None, reset: bool = True):
+    """
+    Start profiling. With neither `route` nor `sample_rate`, every request
+    (and background work) is sampled until /admin/profile/stop.
+    """
+    if reset:
+        profiler.sampler.reset()
+    if interval_ms:
+        profiler.sampler.interval = interval_ms / 1000
+    capture_all = route is None and sample_rate is None
+    if not capture_all:
+        profiler.selector = profiler.RequestSelector(sample_rate or 0.0, route)
+    profiler.sampler.start(capture_all=capture_all)
+    return {"status": "started", "capture_all": capture_all, "route": route, "sample_rate": sample_rate,
+            "interval_ms": profiler.sampler.interval * 1000}
+
+@app.post("/admin/profile/stop", dependencies=[Depends(require_profiling)])
+def profile_stop():
+    profiler.sampler.stop()
+    # back to the configured request sampling, which start_profiler set up
+    profiler.selector = profiler.default_selector()
+    if profiler.selector.sample_rate > 0 or profiler.selector.route:
+        profiler.sampler.start()
+    return {"status": "stopped", "ticks": profiler.sampler.sample_count,
+            "unique_stacks": len(profiler.sampler.samples)}
+
+@app.get("/admin/profile/download", dependencies=[Depends(require_profiling)])
+def profile_download(format: str = "collapsed"):
+    """Download samples as collapsed stacks (flamegraph.pl) or speedscope JSON."""
+    if format == "speedscope":
+        return profiler.sampler.speedscope()
+    if format == "collapsed":
+        return Response(profiler.sampler.collapsed(), media_type="text/plain",
+                        headers={"Content-Disposition": "attachment; filename=smartfood.collapsed.txt"})
+    raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'speedscope'")
+
 # ==============================================================
 # LOAD MODEL ON STARTUP
 # ==============================================================
-MODEL_PATH = os.path.join("models", "SmartFoodAI_Shelflife_Model.pkl")
-model = None
+import shelf_life
 
-print(f"Looking for model at: {MODEL_PATH}")
-try:
-    model = joblib.load(MODEL_PATH)
-    print(f"Model loaded successfully from {MODEL_PATH}")
-except Exception as e:
-    print("ERROR while loading model:")
-    traceback.print_exc()
-    model = None
+import math
+import calibration
+
+# per-household correction of /predict output, learned from consume/delete events
+corrections = calibration.Corrections()
+
+# load eagerly so the first /predict doesn't pay the cold start
+# (and, under a preloading server, before workers fork)
+if inference is None:
+    shelf_life.get_model()
+
+def _warm_recognizer():
+    try:
+        _recognizer()
+    except Exception:
+        logger.exception("Loading the recognizer failed; /predict-image retries on first use")
+
+@app.on_event("startup")
+async def load_recognizer():
+    # in the background, so a slow TensorFlow import doesn't hold up worker boot
+    if inference is None and CNN_AFTER_FORK:
+        app.state.recognizer_load = asyncio.create_task(asyncio.to_thread(_warm_recognizer))
+
+# ==============================================================
+# ADMIN: MODEL REGISTRY (versioned reloads, shadow mode)
+# ==============================================================
+import model_registry
+
+async def _model_admin(action: str, **kwargs):
+    try:
+        if inference is not None:
+            # models live in the inference process; manage them there
+            return await asyncio.to_thread(inference.call, "models", action=action, **kwargs)
+        return model_registry.admin(action, **kwargs)
+    except InferenceError as e:
+        raise HTTPException(status_code=404 if e.kind == "LookupError" else 409, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+async def models_status():
+    """Active, shadow and previous version of each model, plus versions found on disk."""
+    return await _model_admin("status")
+
+@app.post("/admin/models/{name}/reload", status_code=202, dependencies=[Depends(require_admin)])
+async def models_reload(name: str, version: int = None, shadow: bool = False):
+    """
+    Warm `version` (default: newest on disk) in the background. It replaces the
+    active model once validated, or with `shadow=true` receives mirrored traffic.
+    """
+    return await _model_admin("reload", name=name, version=version, shadow=shadow)
+
+@app.post("/admin/models/{name}/promote", dependencies=[Depends(require_admin)])
+async def models_promote(name: str):
+    return await _model_admin("promote", name=name)
+
+@app.post("/admin/models/{name}/rollback", dependencies=[Depends(require_admin)])
+async def models_rollback(name: str):
+    return await _model_admin("rollback", name=name)
+
+@app.delete("/admin/models/{name}/shadow", dependencies=[Depends(require_admin)])
+async def models_drop_shadow(name: str):
+    return await _model_admin("drop_shadow", name=name)
 
 
 # ==============================================================
@@ -97,58 +293,76 @@ def root():
 @app.post("/predict")
 async def predict(input_data: InputData):
     try:
-        if model is None:
-            return {"error": "Model not loaded"}
-
-        # Prepare input for prediction
-        data = {
-            "category": [input_data.category.lower()],
-            "location": [input_data.location.lower()],
-            "packaging": [input_data.packaging.lower()],
-            "state": [input_data.state.lower()],
-            "temperature": [input_data.temperature],
-        }
-
-        df = pd.DataFrame(data)
-        print("\nIncoming data:\n", df)
-
-        # Predict log ratio (as trained)
-        ratio_log_pred = model.predict(df)[0]
-
-        # Reverse the log transform and calibrate
-        ratio = max(0.3, min(3.0, float(np.exp(ratio_log_pred) + 0.7)))
-
-        # Use baseline realistic reference values
-        baseline_rules = {
-            "fruit": {"fridge": 7, "freezer": 180, "pantry": 3},
-            "meat": {"fridge": 5, "freezer": 270, "pantry": 0.5},
-            "snack": {"fridge": 60, "freezer": 120, "pantry": 180},
-            "vegetable": {"fridge": 10, "freezer": 180, "pantry": 4},
-            "dairy": {"fridge": 14, "freezer": 90, "pantry": 2},
-            "grain": {"fridge": 60, "freezer": 180, "pantry": 365},
-            "beverage": {"fridge": 120, "freezer": 180, "pantry": 180},
-            "unknown": {"fridge": 10, "freezer": 60, "pantry": 30},
-        }
-
-        baseline = baseline_rules.get(input_data.category.lower(), baseline_rules["unknown"]).get(
-            input_data.location.lower(), 7
-        )
+        log_sampled(logger, logging.DEBUG, "Incoming /predict data: %s", input_data)
+        if inference is not None:
+            result = await asyncio.to_thread(
+                inference.predict_shelf_life,
+                category=input_data.category, location=input_data.location, packaging=input_data.packaging,
+                state=input_data.state, temperature=input_data.temperature,
+            )
+        else:
+            result = await asyncio.to_thread(
+                shelf_life.predict_shelf_life,
+                input_data.category, input_data.location, input_data.packaging,
+                input_data.state, input_data.temperature,
+            )
+        if calibration.ENABLED:
+            if corrections.stale():
+                corrections.load(await store.calibration_table(corrections.household))
+            result = corrections.apply(result, input_data.category, input_data.location)
+        return result
 
-        predicted_days = round(baseline * ratio, 1)
-        predicted_days = max(predicted_days, 0.1)  # Avoid negative or zero days
+    except Exception as e:
+        logger.exception("ERROR in /predict")
+        return {"error": str(e)}
 
-        return {
-            "predicted_shelf_life_days": predicted_days,
-            "baseline_days": baseline,
-            "calibrated_ratio": ratio,
-            "input_data": data,
-            "status": "success"
-        }
+PREDICT_BATCH_MAX = 1000
 
+@app.post("/predict_batch")
+async def predict_batch(inputs: list[InputData]):
+    """/predict for up to PREDICT_BATCH_MAX items in one model call; results in input order."""
+    if len(inputs) > PREDICT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {PREDICT_BATCH_MAX} items per request")
+    payloads = [i.model_dump() for i in inputs]
+    try:
+        if inference is not None:
+            results = await asyncio.to_thread(inference.predict_shelf_life_batch, payloads)
+        else:
+            results = await asyncio.to_thread(shelf_life.predict_shelf_life_batch, payloads)
+        if calibration.ENABLED:
+            if corrections.stale():
+                corrections.load(await store.calibration_table(corrections.household))
+            results = [corrections.apply(r, p["category"], p["location"]) for r, p in zip(results, payloads)]
+        return results
     except Exception as e:
-        print("ERROR in /predict:", e)
-        traceback.print_exc()
-        return {"error": str(e)}
+        logger.exception("ERROR in /predict_batch")
+        return [{"error": str(e)} for _ in payloads]
+
+# ==============================================================
+# IMAGE UPLOADS: size limit, bounded concurrency, memory budget
+# ==============================================================
+import imaging
+
+image_budget = uploads.ImageBudget()
+
+async def _image_job(upload, op: str, local_fn, remote_fn):
+    """
+    Reserve memory for `op` from the image header alone, then decode and run
+    off the event loop. In-process the spooled upload is handed to the decoder
+    as a file, never read into one bytes object.
+    """
+    w, h = await asyncio.to_thread(imaging.probe, upload.file)
+    if w * h > uploads.MAX_PIXELS:
+        raise HTTPException(status_code=413, detail=f"Image has {w}x{h} pixels; the limit is "
+                                                    f"{uploads.MAX_PIXELS / 1e6:.0f} MP")
+    need = imaging.estimate_bytes(w, h, op)
+    if inference is not None:
+        need += upload.size or 0  # bytes are read and sent to the inference process
+    async with image_budget.admit(need):
+        if inference is not None:
+            contents = await upload.read()
+            return await asyncio.to_thread(remote_fn, contents)
+        return await asyncio.to_thread(local_fn, upload.file)
 
 # ==============================================================
 # IMAGE RECOGNITION ENDPOINT (EfficientNetB0)
@@ -157,45 +371,144 @@ async def predict(input_data: InputData):
 from fastapi import UploadFile, File
 
 @app.post("/predict-image")
-async def predict_image(file: UploadFile = File(...)):
+async def predict_image(file: UploadFile = File(...), top_k: int = Query(1, ge=1, le=14), tta: bool = False):
+    """`top_k` adds the k most likely classes; `tta` averages 8 flipped/cropped views in one batch."""
     try:
-        # Read file bytes
-        contents = await file.read()
+        result = await _image_job(
+            file, "tta" if tta else "single",
+            lambda f: _recognizer().recognize(f, top_k, tta),
+            lambda data: inference.recognize(data, top_k, tta),
+        )
+        return {"result": result}
 
-        # Pass to recognizer
-        result = recognize(contents)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
 
+# ==============================================================
+# MULTI-ITEM DETECTION (one photo of a shelf -> several items)
+# ==============================================================
+@app.post("/detect-items")
+async def detect_items(file: UploadFile = File(...), min_confidence: float = Query(0.5, ge=0.0, le=1.0),
+                       add: bool = False, location: str = Query("Fridge", pattern="^(Fridge|Freezer|Pantry)$")):
+    """
+    Detect several items in one photo: a list of {class, category, confidence, bbox}.
+    With `add=true` the detections go straight into the inventory in one
+    transaction (one row per class, qty = count).
+    """
+    try:
+        result = await _image_job(
+            file, "detect",
+            lambda f: _recognizer().detect(f, min_confidence),
+            lambda data: inference.detect(data, min_confidence),
+        )
+        if add and "detections" in result:
+            items = detections_to_items(result["detections"], location)
+            result["added"] = await store.add_items(items) if items else []
         return {"result": result}
 
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.exception("ERROR in /detect-items")
         return {"error": str(e)}
 
 # ==============================================================
 # ADD ITEM ENDPOINT (used by React frontend)
 # ==============================================================
 from fastapi import Request
-from db_manager import (
-    init_db,
-    add_item,
-    list_items,
-    get_item,
-    update_item,
-    delete_item,
-    consume_item
-)
+import db_manager
+from storage import get_async_storage
+
+# Async storage backend (SMARTFOOD_STORAGE=sqlite|postgres).
+# SQLite calls run in worker threads so they don't block the event loop.
+store = get_async_storage()
+
+@app.on_event("startup")
+async def open_storage():
+    await store.init()  # Ensure table exists
+    db_manager.add_write_listener(corrections.on_write)
+
+@app.on_event("shutdown")
+async def close_storage():
+    await store.close()
+
+# ==============================================================
+# EXPIRY ALERTS (pushed by expiry_alerts.ExpiryScheduler)
+# ==============================================================
+import json
+from fastapi.responses import StreamingResponse
+import expiry_alerts
+
+alerts = expiry_alerts.ExpiryScheduler(store) if expiry_alerts.ENABLED else None
+
+@app.on_event("startup")
+async def start_alerts():
+    if alerts is not None:
+        await alerts.start()
+
+@app.on_event("shutdown")
+async def stop_alerts():
+    if alerts is not None:
+        await alerts.stop()
+
+def _require_alerts():
+    if alerts is None:
+        raise HTTPException(status_code=404, detail="Expiry alerts are disabled (SMARTFOOD_ALERTS=0)")
+    return alerts
+
+@app.get("/alerts")
+async def recent_alerts(since: int = 0):
+    """Alerts emitted since alert id `since` (the most recent 500, from any worker)."""
+    return {"status": "success", "alerts": _require_alerts().recent(since)}
+
+@app.get("/alerts/stream")
+async def alerts_stream(last_event_id: str = Header(None)):
+    """Server-Sent Events: one `expiry` event per alert; reconnects resume from Last-Event-ID."""
+    scheduler = _require_alerts()
+    queue = scheduler.subscribe(int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    alert = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {alert['id']}\nevent: expiry\ndata: {json.dumps(alert)}\n\n"
+        finally:
+            scheduler.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/admin/alerts/upcoming", dependencies=[Depends(require_admin)])
+async def upcoming_alerts(limit: int = Query(20, ge=1, le=500)):
+    scheduler = _require_alerts()
+    return {"scheduled_items": len(scheduler.items), "upcoming": scheduler.upcoming(limit)}
+
+@app.get("/admin/calibration", dependencies=[Depends(require_admin)])
+async def calibration_status():
+    """This household's learned shelf-life corrections, largest adjustment first."""
+    rows = await store.calibration_table(corrections.household)
+    keys = [{"category": cat, "location": loc, "observations": n,
+             "factor": round(calibration.factor(log_ratio, n), 4)} for cat, loc, log_ratio, n in rows]
+    keys.sort(key=lambda k: -abs(math.log(k["factor"])))
+    return {"household": corrections.household, "enabled": calibration.ENABLED, "keys": keys}
 
 @app.post("/add_item")
 async def add_item_endpoint(request: Request):
     """
     Accepts JSON from frontend and saves item into SQLite database.
     Expected fields:
-      name, category, qty, unit, location, purchased_on, expiry_on, source, notes
+      name, category, qty, unit, location, purchased_on, expiry_on, source, notes,
+      model_shelf_life_days (from /predict, only when expiry_on was set from it)
     """
     try:
         data = await request.json()
-        print("Incoming add_item data:", data)
-
-        init_db()  # Ensure table exists
+        log_sampled(logger, logging.DEBUG, "Incoming add_item data: %s", data)
 
         name = data.get("name")
         category = data.get("category", "")
@@ -206,35 +519,30 @@ async def add_item_endpoint(request: Request):
         expiry_on = data.get("expiry_on")
         source = data.get("source", "WebApp")
         notes = data.get("notes", "")
+        model_days = data.get("model_shelf_life_days")
 
-        iid = add_item(name, category, qty, unit, location, purchased_on, expiry_on, source, notes)
+        iid = await store.add_item(name, category, qty, unit, location, purchased_on, expiry_on, source, notes,
+                                   float(model_days) if model_days is not None else None)
 
         return {"status": "success", "id": iid, "message": f"Item '{name}' added successfully."}
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("ERROR in /add_item")
         return {"error": str(e)}
 
 # ==============================================================
 # LIST ALL ITEMS (with days_left + expired logic)
 # ==============================================================
 @app.get("/list_items")
-def list_all_items():
+async def list_all_items():
     """Return all items currently in the database with days left."""
-    from datetime import datetime, date
     try:
-        rows = list_items()
+        rows = await store.list_items_with_days()
         items = []
-        for (iid, name, qty, unit, cat, loc, pur, exp) in rows:
+        for (iid, name, qty, unit, cat, loc, pur, exp, diff) in rows:
             days_left = None
-            if exp:
-                try:
-                    exp_date = datetime.strptime(exp, "%Y-%m-%d").date()
-                    diff = (exp_date - date.today()).days
-                    days_left = "Expired" if diff < 0 else diff
-                except Exception:
-                    pass
+            if diff is not None:
+                days_left = "Expired" if diff < 0 else diff
 
             items.append({
                 "id": iid,
@@ -256,39 +564,58 @@ def list_all_items():
 # LIST URGENT ITEMS (expiring ≤ 3 days or expired)
 # ==============================================================
 @app.get("/list_items_urgent")
-def list_items_urgent():
+async def list_items_urgent():
     """Return items that are expired or expiring soon."""
-    from datetime import datetime, date
     try:
-        rows = list_items()
+        # range scan on the expiry index, soonest first
+        rows = await store.list_items_with_days(within_days=3, by_expiry=True)
         urgent = []
-        for (iid, name, qty, unit, cat, loc, pur, exp) in rows:
-            days_left = None
-            if exp:
-                try:
-                    exp_date = datetime.strptime(exp, "%Y-%m-%d").date()
-                    diff = (exp_date - date.today()).days
-                    days_left = "Expired" if diff < 0 else diff
-                except Exception:
-                    pass
-
-            if days_left == "Expired" or (isinstance(days_left, int) and days_left <= 3):
-                urgent.append({
-                    "id": iid,
-                    "name": name,
-                    "qty": qty,
-                    "unit": unit,
-                    "category": cat,
-                    "location": loc,
-                    "purchased_on": pur,
-                    "expiry_on": exp,
-                    "days_left": days_left
-                })
+        for (iid, name, qty, unit, cat, loc, pur, exp, diff) in rows:
+            urgent.append({
+                "id": iid,
+                "name": name,
+                "qty": qty,
+                "unit": unit,
+                "category": cat,
+                "location": loc,
+                "purchased_on": pur,
+                "expiry_on": exp,
+                "days_left": "Expired" if diff < 0 else diff
+            })
         return {"status": "success", "items": urgent}
     except Exception as e:
         return {"error": str(e)}
 
 
+# ==============================================================
+# SEARCH ITEMS (trigram full-text, typo-tolerant fallback)
+# ==============================================================
+@app.get("/search")
+async def search_items(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=200)):
+    """Items whose name, category or notes match q, best first; fuzzy=true when only typo matches were found."""
+    try:
+        rows, fuzzy = await store.search_items(q, limit)
+        items = []
+        for (iid, name, qty, unit, cat, loc, pur, exp, diff) in rows:
+            days_left = None
+            if diff is not None:
+                days_left = "Expired" if diff < 0 else diff
+            items.append({
+                "id": iid,
+                "name": name,
+                "qty": qty,
+                "unit": unit,
+                "category": cat,
+                "location": loc,
+                "purchased_on": pur,
+                "expiry_on": exp,
+                "days_left": days_left
+            })
+        return {"status": "success", "query": q, "fuzzy": fuzzy, "items": items}
+    except Exception as e:
+        return {"error": str(e)}
+
+
 # ==============================================================
 # CONSUME ITEM ENDPOINT
 # ==============================================================
@@ -299,10 +626,12 @@ class ConsumeRequest(BaseModel):
 async def consume_item_api(item_id: int, req: ConsumeRequest):
     """Reduce quantity of an item."""
     try:
-        ok, new_qty = consume_item(item_id, req.amount)
+        ok, new_qty = await store.consume_item(item_id, req.amount)
         if not ok:
             raise HTTPException(status_code=404, detail="Item not found")
         return {"status": "success", "item_id": item_id, "new_qty": new_qty}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -310,13 +639,11 @@ async def consume_item_api(item_id: int, req: ConsumeRequest):
 # DATABASE ENDPOINTS
 # ==============================================================
 
-from datetime import date, datetime
-
 @app.post("/add_item")
-def add_item_api(item: dict):
+async def add_item_api(item: dict):
     """Add new item to the database."""
     try:
-        iid = add_item(
+        iid = await store.add_item(
             name=item.get("name"),
             category=item.get("category"),
             qty=item.get("qty", 1),
@@ -332,20 +659,12 @@ def add_item_api(item: dict):
         return {"error": str(e)}
 
 @app.get("/list_items")
-def list_all_items():
+async def list_all_items():
     """Return all items currently in the database."""
     try:
-        rows = list_items()
+        rows = await store.list_items_with_days()
         items = []
-        for (iid, name, qty, unit, cat, loc, pur, exp) in rows:
-            days_left = None
-            if exp:
-                try:
-                    exp_date = datetime.strptime(exp, "%Y-%m-%d").date()
-                    days_left = (exp_date - date.today()).days
-                except Exception:
-                    pass
-
+        for (iid, name, qty, unit, cat, loc, pur, exp, days_left) in rows:
             items.append({
                 "id": iid,
                 "name": name,
@@ -362,40 +681,32 @@ def list_all_items():
         return {"error": str(e)}
 
 @app.get("/list_items_urgent")
-def list_urgent_items():
+async def list_urgent_items():
     """Return items that are expired or expiring within 3 days."""
     try:
-        rows = list_items()
+        rows = await store.list_items_with_days(within_days=3, by_expiry=True)
         urgent = []
-        for (iid, name, qty, unit, cat, loc, pur, exp) in rows:
-            days_left = None
-            if exp:
-                try:
-                    exp_date = datetime.strptime(exp, "%Y-%m-%d").date()
-                    days_left = (exp_date - date.today()).days
-                except Exception:
-                    pass
-            if days_left is not None and days_left <= 3:
-                urgent.append({
-                    "id": iid,
-                    "name": name,
-                    "qty": qty,
-                    "unit": unit,
-                    "category": cat,
-                    "location": loc,
-                    "purchased_on": pur,
-                    "expiry_on": exp,
-                    "days_left": days_left
-                })
+        for (iid, name, qty, unit, cat, loc, pur, exp, days_left) in rows:
+            urgent.append({
+                "id": iid,
+                "name": name,
+                "qty": qty,
+                "unit": unit,
+                "category": cat,
+                "location": loc,
+                "purchased_on": pur,
+                "expiry_on": exp,
+                "days_left": days_left
+            })
         return urgent
     except Exception as e:
         return {"error": str(e)}
 
 @app.put("/update_item/{item_id}")
-def update_item_api(item_id: int, item: dict):
+async def update_item_api(item_id: int, item: dict):
     """Edit item by ID."""
     try:
-        update_item(
+        await store.update_item(
             item_id=item_id,
             name=item.get("name"),
             category=item.get("category"),
@@ -412,20 +723,170 @@ def update_item_api(item_id: int, item: dict):
         return {"error": str(e)}
 
 @app.delete("/delete_item/{item_id}")
-def delete_item_api(item_id: int):
-    """Delete an item by ID."""
+async def delete_item_api(item_id: int, reason: str = Query("wasted", pattern="^(wasted|consumed|none)$")):
+    """Delete an item by ID; any remaining quantity is logged as wasted (or consumed; none skips the log)."""
     try:
-        delete_item(item_id)
+        await store.delete_item(item_id, None if reason == "none" else reason)
         return {"status": "deleted"}
     except Exception as e:
         return {"error": str(e)}
 
+# ==============================================================
+# ANALYTICS (daily rollups of consume/delete events)
+# ==============================================================
+import analytics
+
+@app.get("/analytics/waste")
+async def waste_analytics(weeks: int = Query(8, ge=1, le=260),
+                          by: str = Query(None, pattern="^(category|location|source)$")):
+    """Wasted vs consumed per week over the last N weeks, optionally per category/location/source."""
+    from_day, to_day = analytics.report_range(weeks)
+    rows = await store.rollups(from_day, to_day)
+    return {"status": "success", **analytics.waste_report(rows, weeks, by)}
+
+# ==============================================================
+# RECIPE SUGGESTIONS (inverted ingredient index; see recipes.py)
+# ==============================================================
+import recipes
+
+@app.get("/recipes/suggest")
+async def suggest_recipes(k: int = Query(10, ge=1, le=100), within_days: int = Query(3, ge=0, le=30),
+                          require: list[str] = Query([])):
+    """
+    Recipes that use up what expires within `within_days`, ranked by the
+    items they use weighted by days left; `require` names ingredients every
+    suggestion must also use.
+    """
+    index = await asyncio.to_thread(recipes.get_index)
+    if index is None:
+        raise HTTPException(status_code=404, detail="No recipe index; build one with python src/recipes.py build")
+    rows = await store.list_items_with_days(within_days=within_days, by_expiry=True)
+    items = [(name, diff) for (_, name, qty, _, _, _, _, _, diff) in rows if qty is None or qty > 0]
+    suggestions = await asyncio.to_thread(index.suggest, items, k, require)
+    return {"status": "success", "urgent_items": len(items), "recipes": suggestions}
+
+# ==============================================================
+# EXPORT / IMPORT (streamed Arrow IPC, Parquet or NDJSON; see transfer.py)
+# ==============================================================
+import transfer
+
+_FORMAT = "^(arrow|parquet|ndjson)$"
+
+@app.get("/export", dependencies=[Depends(require_admin)])
+async def export_items(format: str = Query("ndjson", pattern=_FORMAT),
+                       batch_size: int = Query(transfer.BATCH_SIZE, ge=1, le=1_000_000)):
+    """The whole items table, read and encoded one batch at a time (constant memory)."""
+    try:
+        encoder = transfer.Encoder(format)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        async for rows in store.iter_item_batches(batch_size):
+            chunk = await asyncio.to_thread(encoder.write, rows)
+            if chunk:
+                yield chunk
+        yield encoder.close()
+
+    ext = "arrows" if format == "arrow" else format
+    return StreamingResponse(body(), media_type=transfer.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f"attachment; filename=smartfood-items.{ext}"})
+
+@app.post("/import", dependencies=[Depends(require_admin)])
+async def import_items(file: UploadFile = File(...), format: str = Query(None, pattern=_FORMAT)):
+    """
+    Add the items of an /export file (format defaults to the file name's
+    extension) through the bulk-insert path, one transaction per batch.
+    Ids are reassigned.
+    """
+    imported = 0
+    try:
+        batches = transfer.decode(file.file, transfer.format_for(file.filename, format))
+        while True:
+            items = await asyncio.to_thread(next, batches, None)
+            if items is None:
+                break
+            imported += len(await store.add_items(items))
+    except (ValueError, RuntimeError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"{e} ({imported} items imported before the error)")
+    return {"status": "success", "imported": imported}
+
+import bulk_import
+
+@app.post("/import_csv", dependencies=[Depends(require_admin)])
+async def import_csv(file: UploadFile = File(...), predict: bool = Query(True)):
+    """
+    Add the items of a receipt or CSV export (see bulk_import.py) in one
+    transaction. Missing expiries come from the shelf-life table, then, unless
+    predict is false, from one batched model call per chunk.
+    """
+    if calibration.ENABLED and corrections.stale():
+        corrections.load(await store.calibration_table(corrections.household))
+
+    def predict_batch(payloads):
+        if inference is not None:
+            results = inference.predict_shelf_life_batch(payloads)
+        else:
+            results = shelf_life.predict_shelf_life_batch(payloads)
+        if calibration.ENABLED:
+            results = [corrections.apply(r, p["category"], p["location"]) for r, p in zip(results, payloads)]
+        return results
+
+    start = time.perf_counter()
+    try:
+        batches, stats = await asyncio.to_thread(bulk_import.stage, file.file, predict_batch if predict else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    prepared = time.perf_counter()
+    imported = await store.add_item_rows(batches)
+    return {"status": "success", "imported": imported, **stats,
+            **bulk_import.timings(imported, start, prepared, time.perf_counter())}
+
+# ==============================================================
+# BACKUPS (online snapshots of the SQLite database; see backup.py)
+# ==============================================================
+import backup
+from storage import SQLiteStorage, ThreadedStorage
+
+# Postgres has its own tooling (pg_dump, base backups)
+backups = (backup.BackupJob() if isinstance(store, ThreadedStorage) and isinstance(store.backend, SQLiteStorage)
+           else None)
+
+@app.on_event("startup")
+async def start_backups():
+    if backups is not None:
+        await backups.start()
+
+@app.on_event("shutdown")
+async def stop_backups():
+    if backups is not None:
+        await backups.stop()
+
+def _require_backups():
+    if backups is None:
+        raise HTTPException(status_code=404, detail="Snapshots are only available for the sqlite storage backend")
+    return backups
+
+@app.post("/admin/backup", dependencies=[Depends(require_admin)])
+async def take_backup():
+    """Snapshot the database now; the result includes its duration and the longest lock-holding step."""
+    try:
+        return {"status": "success", **await _require_backups().run_now()}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/admin/backups", dependencies=[Depends(require_admin)])
+async def list_backups():
+    job = _require_backups()
+    return {"interval_hours": job.interval_hours, "last": job.last,
+            "snapshots": await asyncio.to_thread(backup.list_snapshots)}
+
 @app.post("/consume_item/{item_id}")
-def consume_item_api(item_id: int, payload: dict):
+async def consume_item_api(item_id: int, payload: dict):
     """Consume a specified amount from an item."""
     try:
         amount = payload.get("amount", 1)
-        ok, new_qty = consume_item(item_id, amount)
+        ok, new_qty = await store.consume_item(item_id, amount)
         return {"status": "success", "new_qty": new_qty} if ok else {"error": "failed"}
     except Exception as e:
         return {"error": str(e)}
@@ -1,13 +1,20 @@
-from db_manager import init_db, add_item, list_items, DB_PATH, get_item, update_item, delete_item, consume_item
+from db_manager import init_db, add_item, add_items, add_item_rows, iter_items, iter_item_batches, max_item_id, ITEM_SORTS, DB_PATH, get_item, update_item, delete_item, consume_item, search_items
+import argparse
+import functools
+import itertools
+import shutil
+import sys
+import time
 import datetime as dt
 from utils import shelf_life_days, estimated_expiry, days_left, parse_date_input, safe_input
-from tkinter import Tk
-from tkinter.filedialog import askopenfilename
 import re
 import os
-import requests
 import datetime as dt
-from semantic_mapper import get_closest_category
+from client import get_client
+
+# Heavy dependencies load on first use of the command that needs them:
+# tkinter for the file dialogs, semantic_mapper (SentenceTransformer + torch)
+# when categorising, requests/recognizer inside client.py.
 
 
 # ANSI color helpers
@@ -48,6 +55,16 @@ def _color_days(d):
         return f"{YELLOW}{d}{RESET}"
     return f"{GREEN}{d}{RESET}"
 
+def _pick_image(title):
+    """Open a file dialog and return the chosen image path ("" if cancelled)."""
+    from tkinter import Tk
+    from tkinter.filedialog import askopenfilename
+    Tk().withdraw()
+    return askopenfilename(
+        title=title,
+        filetypes=[("Image Files", "*.jpg *.jpeg *.png *.bmp *.gif")]
+    )
+
 def menu():
     print("\nSmartFood AI (console)")
     print("[1] Add item manually")
@@ -60,8 +77,6 @@ def menu():
     print("[8] Add item via barcode scan")
     print("[0] Exit")
 
-import requests
-
 def cmd_add_item():
     # --- Semantic AI food name and category detection ---
     user_food = input("Name of food item: ").strip()
@@ -104,8 +119,9 @@ def cmd_add_item():
     purchased_raw = input("Purchased on (YYYY-MM-DD or '3' = 3 days ago) [today]: ").strip()
     purchased = parse_date_input(purchased_raw) or dt.date.today().isoformat()
     expiry = None
+    model_days = None  # kept only if the predicted expiry is used (calibration baseline)
 
-    # --- Predict shelf life using FastAPI model ---
+    # --- Predict shelf life (API server or in-process, see client.py) ---
     try:
         payload = {
             "category": category,
@@ -114,9 +130,8 @@ def cmd_add_item():
             "state": state.lower(),
             "temperature": temperature
         }
-        response = requests.post("http://127.0.0.1:8000/predict", json=payload)
-        if response.status_code == 200:
-            data = response.json()
+        data = get_client().predict_shelf_life(payload)
+        if "error" not in data:
             predicted_days = data.get("predicted_shelf_life_days")
             if predicted_days:
                 expiry_date = dt.date.today() + dt.timedelta(days=float(predicted_days))
@@ -130,63 +145,127 @@ def cmd_add_item():
                     expiry = confirm
                 else:
                     print("Using predicted expiry.")
+                    model_days = data.get("model_shelf_life_days", predicted_days)
             else:
                 print("Could not get a prediction from API.")
         else:
-            print("API error:", response.text)
+            print("API error:", data["error"])
     except Exception as e:
         print("Prediction failed:", e)
 
     # --- Save item to local database ---
     try:
-        iid = add_item(name, category, qty, unit, location, purchased, expiry, source="AI", notes=None)
+        iid = add_item(name, category, qty, unit, location, purchased, expiry, source="AI", notes=None,
+                       model_shelf_life_days=model_days)
         print(f"Saved (id {iid}).")
     except Exception as e:
         print("Error saving item:", e)
 
 
-def cmd_list_items():
-    rows = list_items()
-    W_ID, W_DAYS, W_NAME, W_QTY, W_UNIT, W_CAT, W_LOC, W_PUR, W_EXP = 2, 9, 15, 6, 4, 12, 7, 10, 10
-    print("\n" + f"{'ID':>{W_ID}} | {'Days':<{W_DAYS}} | {'Item':<{W_NAME}} | {'Qty':>{W_QTY}} | {'Unit':<{W_UNIT}} | {'Category':<{W_CAT}} | {'Loc':<{W_LOC}} | {'Purchased':<{W_PUR}} | {'Expiry':<{W_EXP}}")
-    print("-" * (W_ID + W_DAYS + W_NAME + W_QTY + W_UNIT + W_CAT + W_LOC + W_PUR + W_EXP + 24))
-    for (iid, name, qty, unit, cat, loc, pur, exp) in rows:
-        dleft = days_left(exp)
-        dtxt = pad_visible(_color_days(dleft), W_DAYS)
-        print(f"{iid:>{W_ID}d} | {dtxt} | {name[:W_NAME]:<{W_NAME}} | {qty:>{W_QTY}.1f} | {unit:<{W_UNIT}} | {(cat or '-').title():<{W_CAT}} | {loc:<{W_LOC}} | {pur or '-':<{W_PUR}} | {exp or '-':<{W_EXP}}")
-
-def cmd_list_by_urgency():
-    rows = list_items()
-    annotated = [(days_left(exp), iid, name, qty, unit, cat, loc, pur, exp) for (iid, name, qty, unit, cat, loc, pur, exp) in rows]
-    annotated.sort(key=lambda x: (x[0] is None, x[0] if x[0] is not None else 99999))
-    print("\n" + f"{'ID':>2} | {'Days':<9} | {'Item':<15} | {'Qty':>6} | {'Unit':<4} | {'Category':<12} | {'Loc':<7} | {'Expiry':<10}")
-    print("-" * 85)
-    for (dleft, iid, name, qty, unit, cat, loc, pur, exp) in annotated:
-        dtxt = pad_visible(_color_days(dleft), 9)
-        print(f"{iid:>2d} | {dtxt} | {name[:15]:<15} | {qty:>6.1f} | {unit:<4} | {(cat or '-').title():<12} | {loc:<7} | {exp or '-':<10}")
+# --- Streaming table rendering -------------------------------------------
+# Rows come from db_manager.iter_items() one page at a time and are printed
+# as they arrive; format strings and coloured day cells are computed once.
+
+@functools.lru_cache(maxsize=512)
+def _days_cell(d, width=9):
+    """Coloured, padded days cell (the ANSI strip/pad runs once per distinct value)."""
+    return pad_visible(_color_days(d), width)
+
+@functools.lru_cache(maxsize=None)
+def _table_format(kind, w_id):
+    """Return (header, rule, row format) for a table layout and ID column width."""
+    if kind == "full":
+        header = f"{'ID':>{w_id}} | {'Days':<9} | {'Item':<15} | {'Qty':>6} | {'Unit':<4} | {'Category':<12} | {'Loc':<7} | {'Purchased':<10} | {'Expiry':<10}"
+        row = f"{{iid:>{w_id}}} | {{days}} | {{name:<15.15}} | {{qty:>6.1f}} | {{unit:<4}} | {{cat:<12}} | {{loc:<7}} | {{pur:<10}} | {{exp:<10}}"
+    elif kind == "urgency":
+        header = f"{'ID':>{w_id}} | {'Days':<9} | {'Item':<15} | {'Qty':>6} | {'Unit':<4} | {'Category':<12} | {'Loc':<7} | {'Expiry':<10}"
+        row = f"{{iid:>{w_id}}} | {{days}} | {{name:<15.15}} | {{qty:>6.1f}} | {{unit:<4}} | {{cat:<12}} | {{loc:<7}} | {{exp:<10}}"
+    else:  # brief
+        header = f"{'ID':>{w_id}}  | {'Days':<9} | {'Item':<15} | {'Qty':>6} | {'Unit':<4} | {'Expiry':<10}"
+        row = f"{{iid:>{w_id}}}  | {{days}} | {{name:<15.15}} | {{qty:>6.1f}} | {{unit:<4}} | {{exp:<10}}"
+    return header, "-" * len(header), row
+
+def _item_lines(rows, kind):
+    header, rule, row_fmt = _table_format(kind, max(2, len(str(max_item_id()))))
+    yield ""
+    yield header
+    yield rule
+    for (iid, name, qty, unit, cat, loc, pur, exp, dleft) in rows:
+        yield row_fmt.format(iid=iid, days=_days_cell(dleft), name=name, qty=qty or 0, unit=unit or "",
+                             cat=(cat or "-").title(), loc=loc or "-", pur=pur or "-", exp=exp or "-")
+
+def _pager(lines, use_pager=None):
+    """Print lines a screen at a time ([Enter] more, [q] stop). Streams straight through when not on a TTY."""
+    if use_pager is None:
+        use_pager = sys.stdin.isatty() and sys.stdout.isatty()
+    height = max(5, shutil.get_terminal_size().lines - 2)
+    shown = 0
+    for line in lines:
+        print(line)
+        shown += 1
+        if use_pager and shown >= height:
+            if input("-- more -- [Enter] next page, [q] stop: ").strip().lower() == "q":
+                return
+            shown = 0
+
+def _stream_items(kind, pager=None, **filters):
+    """Render iter_items(**filters) through the pager. Returns False if there were no rows."""
+    rows = iter_items(**filters)
+    try:
+        first = next(rows, None)
+        if first is None:
+            return False
+        _pager(_item_lines(itertools.chain([first], rows), kind), pager)
+        return True
+    finally:
+        rows.close()
+
+def cmd_list_items(sort="id", location=None, category=None, within=None, pager=None, kind="full"):
+    if not _stream_items(kind, pager, sort=sort, location=location, category=category, within_days=within):
+        print("\nNo matching items.")
+
+def cmd_list_by_urgency(**filters):
+    # sorted by the expiry index in SQLite, items without expiry last
+    cmd_list_items(sort="expiry", kind="urgency", **filters)
 
 def _show_items_brief():
-    rows = list_items()
-    if not rows:
+    if not _stream_items("brief"):
         print("\nNo items in database.\n")
         return
-    print("\n" + f"{'ID':>2}  | {'Days':<9} | {'Item':<15} | {'Qty':>6} | {'Unit':<4} | {'Expiry':<10}")
-    print("-" * 60)
-    for (iid, name, qty, unit, cat, loc, pur, exp) in rows:
-        dtxt = pad_visible(_color_days(days_left(exp)), 9)
-        print(f"{iid:>2}  | {dtxt} | {name[:15]:<15} | {qty:>6.1f} | {unit:<4} | {exp or '-':<10}")
     print()
 
+def _show_search(q, kind="brief", limit=20, pager=None):
+    """Render search_items(q) as a table. Returns False if nothing matched."""
+    rows, fuzzy = search_items(q, limit)
+    if not rows:
+        return False
+    if fuzzy:
+        print(f"\nNo exact match for '{q}'; closest items:")
+    _pager(_item_lines(rows, kind), pager)
+    return True
+
+def _ask_item_id(action):
+    """Prompt for an item id; any other text searches the inventory and asks again. None on cancel."""
+    while True:
+        s = safe_input(f"Enter item ID to {action}, or text to search (Enter to cancel): ", allow_empty=True)
+        if not s:
+            print("Cancelled.")
+            return None
+        if s.isdigit():
+            return int(s)
+        if not _show_search(s):
+            print(f"No items match '{s}'.")
+        print()
+
+def cmd_search(q, limit=20, pager=None):
+    if not _show_search(q, "full", limit, pager):
+        print(f"\nNo items match '{q}'.")
+
 def cmd_edit_item():
     _show_items_brief()
-    s = safe_input("Enter item ID to edit (or Enter to cancel): ", allow_empty=True)
-    if not s:
-        print("Cancelled.")
-        return
-    if not s.isdigit():
-        print("Invalid id.")
+    iid = _ask_item_id("edit")
+    if iid is None:
         return
-    iid = int(s)
     row = get_item(iid)
     if not row:
         print("Item not found.")
@@ -210,19 +289,18 @@ def cmd_edit_item():
             n_expiry = expiry
     n_source = input(f"Source [{source or ''}]: ").strip() or source
     n_notes = input(f"Notes [{notes or ''}]: ").strip() or notes
-    update_item(iid, n_name, n_cat, n_qty, n_unit, n_loc, n_purchased, n_expiry, n_source, n_notes)
+    try:
+        update_item(iid, n_name, n_cat, n_qty, n_unit, n_loc, n_purchased, n_expiry, n_source, n_notes)
+    except ValueError as e:
+        print("Item not updated:", e)
+        return
     print("Item updated.")
 
 def cmd_delete_item():
     _show_items_brief()
-    s = safe_input("Enter item ID to delete (or Enter to cancel): ", allow_empty=True)
-    if not s:
-        print("Cancelled.")
+    iid = _ask_item_id("delete")
+    if iid is None:
         return
-    if not s.isdigit():
-        print("Invalid id.")
-        return
-    iid = int(s)
     row = get_item(iid)
     if not row:
         print("Item not found.")
@@ -231,21 +309,21 @@ def cmd_delete_item():
     print(f"\nSelected: {iid} - {name} | {qty} {unit} | {category or '-'} | {location} | purchased: {purchased or '-'} | expiry: {expiry or '-'}")
     yn = safe_input("Delete this item? [y/N] ", valid_options=["y", "yes", "n", "no"], allow_empty=True)
     if yn in ("y", "yes"):
-        delete_item(iid)
+        reason = "wasted"
+        if qty:
+            why = safe_input("Was it [w]asted, [c]onsumed, or added by [m]istake? [w] ",
+                             valid_options=["w", "c", "m"], allow_empty=True)
+            reason = {"c": "consumed", "m": None}.get((why or "w").lower(), "wasted")
+        delete_item(iid, reason)
         print("Item deleted.")
     else:
         print("Cancelled.")
 
 def cmd_consume_item():
     _show_items_brief()
-    s = safe_input("Enter item ID to consume (or Enter to cancel): ", allow_empty=True)
-    if not s:
-        print("Cancelled.")
+    iid = _ask_item_id("consume")
+    if iid is None:
         return
-    if not s.isdigit():
-        print("Please enter a valid numeric ID.")
-        return
-    iid = int(s)
     row = get_item(iid)
     if not row:
         print("Item not found.")
@@ -285,11 +363,7 @@ def cmd_recognize_image():
     """Image recognition → confirm item → ask details → call shelf-life model → save to DB."""
     try:
         # --- GUI file picker ---
-        Tk().withdraw()
-        img_path = askopenfilename(
-            title="Select an image to recognize",
-            filetypes=[("Image Files", "*.jpg *.jpeg *.png *.bmp *.gif")]
-        )
+        img_path = _pick_image("Select an image to recognize")
         if not img_path:
             print("Cancelled.")
             return
@@ -297,12 +371,8 @@ def cmd_recognize_image():
         print(f"\nSelected image: {img_path}")
         print("Sending to SmartFoodAI Image Recognition API...")
 
-        # --- Send image to FastAPI CNN endpoint ---
-        with open(img_path, "rb") as f:
-            files = {"file": (os.path.basename(img_path), f, "image/jpeg")}
-            response = requests.post("http://127.0.0.1:8000/predict-image", files=files)
-
-        data = response.json()
+        # --- Run the CNN (API server or in-process) ---
+        data = get_client().recognize_image(img_path)
 
         if "error" in data:
             print("Recognition error:", data["error"])
@@ -323,6 +393,7 @@ def cmd_recognize_image():
 
         # --- Semantic category mapping ---
         try:
+            from semantic_mapper import get_closest_category
             auto_category, score = get_closest_category(food_name)
             print(f"\nDetected category: {auto_category} (similarity {score:.2f})")
             use_auto_cat = input("Use this category? [Y/n]: ").strip().lower()
@@ -360,6 +431,7 @@ def cmd_recognize_image():
 
         # --- Predict shelf life using the API ---
         print("\nCalculating shelf-life prediction...")
+        model_days = None
 
         payload = {
             "category": category,
@@ -370,8 +442,7 @@ def cmd_recognize_image():
         }
 
         try:
-            resp = requests.post("http://127.0.0.1:8000/predict", json=payload)
-            model_data = resp.json()
+            model_data = get_client().predict_shelf_life(payload)
 
             predicted_days = model_data.get("predicted_shelf_life_days")
 
@@ -389,6 +460,7 @@ def cmd_recognize_image():
                     expiry = confirm
                 else:
                     print("Using predicted expiry.")
+                    model_days = model_data.get("model_shelf_life_days", predicted_days)
             else:
                 print("Could not get prediction from API.")
                 expiry = None
@@ -399,7 +471,7 @@ def cmd_recognize_image():
 
         # --- Save to DB ---
         try:
-            iid = add_item(food_name, category, qty, unit, location, purchased, expiry, "ImageAI", None)
+            iid = add_item(food_name, category, qty, unit, location, purchased, expiry, "ImageAI", None, model_days)
             print(f"\nSaved item successfully! (ID {iid})")
         except Exception as e:
             print("Error saving item:", e)
@@ -407,8 +479,78 @@ def cmd_recognize_image():
     except Exception as e:
         print("Error during image recognition workflow:", e)
 
-def main():
+def build_parser():
+    ap = argparse.ArgumentParser(prog="smartfood",
+                                 description="SmartFoodAI console. Run without a command for the interactive menu.")
+    sub = ap.add_subparsers(dest="command")
+    ls = sub.add_parser("list", help="list inventory items (streamed, paged)")
+    ls.add_argument("--sort", choices=ITEM_SORTS, default="id")
+    ls.add_argument("--location", help="Fridge, Freezer or Pantry")
+    ls.add_argument("--category")
+    ls.add_argument("--within", type=int, metavar="DAYS", help="only items expiring within DAYS (expired included)")
+    ls.add_argument("--no-pager", action="store_true", help="print everything without pausing")
+    for name, help_text in (("export", "write all items to an Arrow, Parquet or NDJSON file"),
+                            ("import", "add the items of an Arrow, Parquet or NDJSON file")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("path", help="file name; the extension picks the format (export: - for stdout)")
+        p.add_argument("--format", choices=("arrow", "parquet", "ndjson"))
+    se = sub.add_parser("search", help="find items by name, category or notes (prefix, substring, typo-tolerant)")
+    se.add_argument("query", nargs="+")
+    se.add_argument("--limit", type=int, default=20)
+    se.add_argument("--no-pager", action="store_true", help="print everything without pausing")
+    imp = sub.add_parser("import-csv", help="add the items of a receipt or CSV export, filling in missing expiries")
+    imp.add_argument("path")
+    imp.add_argument("--chunk-rows", type=int, default=20000, help="lines parsed per batch")
+    imp.add_argument("--no-predict", action="store_true",
+                     help="leave expiries the shelf-life table doesn't know empty instead of asking the model")
+    return ap
+
+def cmd_import_csv(path, chunk_rows=20000, predict=True):
+    """Vectorised CSV import in one transaction (see bulk_import.py)."""
+    import bulk_import  # pandas loads only here
+    predict_batch = get_client().predict_shelf_life_batch if predict else None
+    try:
+        stats = bulk_import.import_csv(path, add_item_rows, predict_batch, chunk_rows=chunk_rows)
+    except (ValueError, OSError) as e:
+        print(f"import-csv failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"imported {stats['imported']} items in {stats['seconds']:.1f}s ({stats['rows_per_sec']:,} rows/s); "
+          f"expiry given {stats.get('expiry_given', 0)}, from table {stats.get('expiry_from_table', 0)}, "
+          f"predicted {stats.get('expiry_from_model', 0)}, unknown {stats.get('expiry_missing', 0)}",
+          file=sys.stderr)
+
+def cmd_transfer(command, path, fmt=None):
+    """Streaming export/import of the items table (see transfer.py)."""
+    import transfer  # pyarrow, if installed, loads only here
+    start = time.perf_counter()
+    try:
+        if command == "export":
+            rows = transfer.export_to(path, iter_item_batches(transfer.BATCH_SIZE), fmt)
+        else:
+            rows = transfer.import_from(path, add_items, fmt)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"{command} failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    print(f"{command}ed {rows} items in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)", file=sys.stderr)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
     init_db()
+    if args.command == "list":
+        cmd_list_items(sort=args.sort, location=args.location, category=args.category, within=args.within,
+                       pager=False if args.no_pager else None,
+                       kind="urgency" if args.sort == "expiry" else "full")
+        return
+    if args.command == "search":
+        cmd_search(" ".join(args.query), args.limit, pager=False if args.no_pager else None)
+        return
+    if args.command in ("export", "import"):
+        cmd_transfer(args.command, args.path, args.format)
+        return
+    if args.command == "import-csv":
+        cmd_import_csv(args.path, args.chunk_rows, predict=not args.no_predict)
+        return
     print(f"Using database: {DB_PATH}")
     while True:
         menu()
@@ -423,11 +565,7 @@ def main():
         elif choice == "8":
             print("Select an image containing the barcode...")
             try:
-                Tk().withdraw()
-                img_path = askopenfilename(
-                    title="Select Barcode Image",
-                    filetypes=[("Image Files", "*.jpg *.jpeg *.png *.bmp *.gif")]
-                )
+                img_path = _pick_image("Select Barcode Image")
                 if not img_path:
                     print("No file selected.")
                 else:
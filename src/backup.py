@@ -0,0 +1,291 @@
+"""
+Online snapshots of the SQLite database through SQLite's backup API, so the
+live smartfood.db is never copied file-wise (a torn copy) or taken offline.
+
+snapshot() copies PAGES_PER_STEP pages per step. In WAL mode (init_db
+turns it on) the whole copy runs inside one read transaction on the source:
+it is a consistent snapshot and writers keep appending to the WAL
+meanwhile, so they are never blocked. In rollback-journal mode every step
+holds a shared lock, so a writer waits at most one step (STEP_PAUSE between
+steps lets it in); a write between steps restarts the copy, and after
+MAX_RESTARTS the rest is copied in a single step so the snapshot finishes.
+Each result reports the longest step (`max_step_ms`), the bound on what a
+concurrent writer can stall for.
+
+Snapshots are written as <dir>/smartfood-<UTC time>.db[.gz], pass PRAGMA
+quick_check and are renamed into place only when complete; the newest
+SMARTFOOD_BACKUP_KEEP are kept. The API takes one every
+SMARTFOOD_BACKUP_INTERVAL_H hours (BackupJob) and on POST /admin/backup.
+
+  python src/backup.py snapshot [--dir DIR] [--no-gzip]
+  python src/backup.py list [--dir DIR]
+  python src/backup.py restore backups/smartfood-20250101T080000.000Z.db.gz
+"""
+import asyncio
+import contextlib
+import datetime as dt
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Optional
+
+import db_manager
+from metrics import REGISTRY
+
+logger = logging.getLogger("smartfood.backup")
+
+INTERVAL_HOURS = float(os.environ.get("SMARTFOOD_BACKUP_INTERVAL_H", "0"))
+KEEP = int(os.environ.get("SMARTFOOD_BACKUP_KEEP", "7"))
+COMPRESS = os.environ.get("SMARTFOOD_BACKUP_GZIP", "1") != "0"
+
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.002
+MAX_RESTARTS = 3
+GZIP_LEVEL = 6
+PREFIX = "smartfood-"
+SUFFIXES = (".db", ".db.gz")
+
+SNAPSHOT_TIME = REGISTRY.histogram(
+    "smartfood_backup_seconds", "Database snapshot duration by phase", ("phase",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+SNAPSHOTS = REGISTRY.counter(
+    "smartfood_backups_total", "Database snapshots by outcome", ("status",))
+
+
+def backup_dir(db_path: str = None) -> str:
+    """SMARTFOOD_BACKUP_DIR, or backups/ next to the database."""
+    return os.environ.get("SMARTFOOD_BACKUP_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(db_path or db_manager.DB_PATH)), "backups")
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(db_path: str, dest: str) -> dict:
+    """Stepped backup of db_path into a new file dest; returns step statistics."""
+    perf = time.perf_counter
+    src = sqlite3.connect(db_path, isolation_level=None)
+    dst = sqlite3.connect(dest)
+    stats = {"mode": src.execute("PRAGMA journal_mode").fetchone()[0], "steps": 0, "restarts": 0,
+             "max_step_ms": 0.0, "pages": 0}
+    wal = stats["mode"] == "wal"
+    state = {"remaining": None, "since": perf()}
+
+    def progress(status, remaining, total):
+        step = perf() - state["since"]
+        stats["steps"] += 1
+        stats["pages"] = total
+        stats["max_step_ms"] = max(stats["max_step_ms"], round(step * 1e3, 3))
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            stats["restarts"] += 1
+            if stats["restarts"] >= MAX_RESTARTS:
+                raise _TooManyRestarts
+        state["remaining"] = remaining
+        if not wal and remaining:
+            time.sleep(STEP_PAUSE)
+        state["since"] = perf()
+
+    try:
+        if wal:
+            # one read transaction for the whole copy: a fixed snapshot that writers don't wait on
+            src.execute("BEGIN")
+            src.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        try:
+            src.backup(dst, pages=PAGES_PER_STEP, progress=progress)
+        except _TooManyRestarts:
+            logger.info("snapshot of %s restarted %d times under writes; copying the rest in one step",
+                        db_path, stats["restarts"])
+            state["remaining"] = None
+            state["since"] = perf()
+            src.backup(dst, pages=-1, progress=progress)
+        if wal:
+            src.execute("COMMIT")
+        # a snapshot is one self-contained file, whatever the live database's journal mode
+        dst.execute("PRAGMA journal_mode=DELETE")
+        check = dst.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise sqlite3.DatabaseError(f"snapshot failed quick_check: {check}")
+    finally:
+        dst.close()
+        src.close()
+    return stats
+
+
+def snapshot(dest_dir: str = None, compress: bool = COMPRESS, keep: Optional[int] = KEEP,
+             db_path: str = None) -> dict:
+    """
+    Snapshot the live database into dest_dir (default backup_dir()) and
+    rotate old snapshots (keep=None: no rotation). Returns the path, sizes, phase timings and the
+    step statistics of the copy.
+    """
+    db_path = db_path or db_manager.DB_PATH
+    dest_dir = dest_dir or backup_dir(db_path)
+    os.makedirs(dest_dir, exist_ok=True)
+    stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%S.%f")[:-3] + "Z"
+    final = os.path.join(dest_dir, f"{PREFIX}{stamp}" + (".db.gz" if compress else ".db"))
+    partial = os.path.join(dest_dir, f"{PREFIX}{stamp}.db.partial")
+
+    start = time.perf_counter()
+    try:
+        stats = _copy(db_path, partial)
+        copied = time.perf_counter()
+        if compress:
+            with open(partial, "rb") as f, gzip.open(final + ".partial", "wb", compresslevel=GZIP_LEVEL) as out:
+                shutil.copyfileobj(f, out, 1 << 20)
+            db_bytes = os.path.getsize(partial)
+            os.replace(final + ".partial", final)
+            os.remove(partial)
+        else:
+            db_bytes = os.path.getsize(partial)
+            os.replace(partial, final)
+    except BaseException:
+        SNAPSHOTS.inc(status="failed")
+        for leftover in (partial, final + ".partial"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(leftover)
+        raise
+    done = time.perf_counter()
+    SNAPSHOTS.inc(status="ok")
+    SNAPSHOT_TIME.observe(copied - start, phase="copy")
+    SNAPSHOT_TIME.observe(done - copied, phase="compress")
+
+    result = {
+        "path": final,
+        "bytes": os.path.getsize(final),
+        "db_bytes": db_bytes,
+        "duration_s": round(done - start, 3),
+        "copy_s": round(copied - start, 3),
+        "compress_s": round(done - copied, 3),
+        **stats,
+        "removed": rotate(dest_dir, keep) if keep else [],
+    }
+    logger.info("snapshot %s: %d bytes in %.2fs (%d steps, longest %.1f ms, %d restarts)", final,
+                result["bytes"], result["duration_s"], stats["steps"], stats["max_step_ms"], stats["restarts"])
+    return result
+
+
+def list_snapshots(dest_dir: str = None) -> list:
+    """Complete snapshots in dest_dir, newest first: [{"path", "bytes", "created"}]."""
+    dest_dir = dest_dir or backup_dir()
+    if not os.path.isdir(dest_dir):
+        return []
+    names = sorted((n for n in os.listdir(dest_dir) if n.startswith(PREFIX) and n.endswith(SUFFIXES)),
+                   reverse=True)
+    out = []
+    for name in names:
+        path = os.path.join(dest_dir, name)
+        st = os.stat(path)
+        out.append({"path": path, "bytes": st.st_size,
+                    "created": dt.datetime.fromtimestamp(st.st_mtime, dt.timezone.utc).isoformat(timespec="seconds")})
+    return out
+
+
+def rotate(dest_dir: str, keep: int = KEEP) -> list:
+    """Delete all but the newest `keep` snapshots; returns the removed paths."""
+    removed = [s["path"] for s in list_snapshots(dest_dir)[max(keep, 1):]]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore(snapshot_path: str, db_path: str = None, safety_snapshot: bool = True) -> dict:
+    """
+    Replace the contents of the live database with a snapshot (.db or .db.gz).
+    The copy goes through SQLite (one backup step holding the write lock), so
+    open connections see either the old or the restored database, never a mix.
+    Unless safety_snapshot is False, the current database is snapshotted first.
+    The item cache of every process reloads at its next read; the API's
+    alert schedule catches up at its next resync (or restart the API).
+    """
+    db_path = db_path or db_manager.DB_PATH
+    # no rotation here: it could delete the snapshot being restored
+    safety = snapshot(db_path=db_path, keep=None)["path"] if safety_snapshot and os.path.exists(db_path) else None
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(db_path))) as tmp:
+        source = snapshot_path
+        if snapshot_path.endswith(".gz"):
+            source = os.path.join(tmp, "restore.db")
+            with gzip.open(snapshot_path, "rb") as f, open(source, "wb") as out:
+                shutil.copyfileobj(f, out, 1 << 20)
+        src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        dst = sqlite3.connect(db_path, timeout=30)
+        try:
+            check = src.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"{snapshot_path} failed quick_check: {check}")
+            start = time.perf_counter()
+            src.backup(dst)
+            elapsed = time.perf_counter() - start
+        finally:
+            src.close()
+            dst.close()
+    return {"restored": snapshot_path, "db_path": db_path, "duration_s": round(elapsed, 3), "safety_snapshot": safety}
+
+
+class BackupJob:
+    """Periodic snapshots inside the API process, plus on-demand ones (run_now)."""
+
+    def __init__(self, interval_hours: float = INTERVAL_HOURS, **snapshot_kwargs):
+        self.interval_hours = interval_hours
+        self.snapshot_kwargs = snapshot_kwargs
+        self.last = None
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def start(self):
+        if self.interval_hours > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def run_now(self) -> dict:
+        if self._lock.locked():
+            raise RuntimeError("a snapshot is already running")
+        async with self._lock:
+            self.last = await asyncio.to_thread(snapshot, **self.snapshot_kwargs)
+            return self.last
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_hours * 3600)
+            try:
+                await self.run_now()
+            except RuntimeError:
+                pass  # an on-demand snapshot is in progress
+            except Exception:
+                logger.exception("scheduled snapshot failed")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description="Online snapshots of the SmartFoodAI database")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("snapshot")
+    p.add_argument("--dir", help="default: SMARTFOOD_BACKUP_DIR or backups/ next to the database")
+    p.add_argument("--no-gzip", action="store_true")
+    p.add_argument("--keep", type=int, default=KEEP)
+    p = sub.add_parser("list")
+    p.add_argument("--dir")
+    p = sub.add_parser("restore")
+    p.add_argument("path")
+    p.add_argument("--no-safety-snapshot", action="store_true", help="don't snapshot the current database first")
+    args = ap.parse_args()
+
+    if args.cmd == "snapshot":
+        result = snapshot(args.dir, compress=COMPRESS and not args.no_gzip, keep=args.keep)
+    elif args.cmd == "list":
+        result = list_snapshots(args.dir)
+    else:
+        result = restore(args.path, safety_snapshot=not args.no_safety_snapshot)
+    print(json.dumps(result, indent=2))
@@ -1,9 +1,8 @@
-import requests
-import pyzxing
 import datetime as dt
 from db_manager import add_item
 from utils import parse_date_input
-from semantic_mapper import get_closest_category  # <-- AI semantic mapping
+from client import get_client
+# pyzxing, requests and semantic_mapper (AI category mapping) are imported on first use
 
 # --- BARCODE SCANNER (offline image detection) ---
 def scan_barcode_local(image_path: str):
@@ -11,6 +10,7 @@ def scan_barcode_local(image_path: str):
     Detect and decode barcodes from an image using pyzxing (offline, cross-platform).
     Returns the barcode number as string, or None if not detected.
     """
+    import pyzxing
     reader = pyzxing.BarCodeReader()
     results = reader.decode(image_path)
 
@@ -29,6 +29,7 @@ def lookup_product_by_barcode(barcode: str) -> dict | None:
     Query Open Food Facts API for product details.
     Returns dict with product_name, brand, category or None if not found.
     """
+    import requests
     url = f"https://world.openfoodfacts.org/api/v2/product/{barcode}.json"
     try:
         r = requests.get(url, timeout=5)
@@ -77,6 +78,7 @@ def scan_and_add_product(image_path: str):
 
     # --- AI semantic refinement ---
     try:
+        from semantic_mapper import get_closest_category
         auto_cat, score = get_closest_category(name)
         if auto_cat:
             print(f"AI-refined category: {auto_cat} (similarity={score:.2f})")
@@ -93,8 +95,9 @@ def scan_and_add_product(image_path: str):
     purchased_raw = input("Purchased on (YYYY-MM-DD or '3' = 3 days ago) [today]: ").strip()
     purchased = parse_date_input(purchased_raw) or dt.date.today().isoformat()
 
-    # --- Predict shelf life using your FastAPI ---
+    # --- Predict shelf life (API server or in-process, see client.py) ---
     expiry = None
+    model_days = None  # kept only if the predicted expiry is used (calibration baseline)
     try:
         payload = {
             "category": category,
@@ -103,9 +106,8 @@ def scan_and_add_product(image_path: str):
             "state": "raw",
             "temperature": 4 if location.lower() == "fridge" else 20
         }
-        response = requests.post("http://127.0.0.1:8000/predict", json=payload)
-        if response.status_code == 200:
-            data = response.json()
+        data = get_client().predict_shelf_life(payload)
+        if "error" not in data:
             predicted_days = data.get("predicted_shelf_life_days")
             if predicted_days:
                 expiry_date = dt.date.today() + dt.timedelta(days=float(predicted_days))
@@ -119,8 +121,9 @@ def scan_and_add_product(image_path: str):
                     expiry = confirm
                 else:
                     print("Using predicted expiry.")
+                    model_days = data.get("model_shelf_life_days", predicted_days)
         else:
-            print("API error:", response.text)
+            print("API error:", data["error"])
     except Exception as e:
         print("Prediction skipped:", e)
 
@@ -140,7 +143,8 @@ def scan_and_add_product(image_path: str):
             purchased,
             expiry,
             "Barcode",
-            f"{product_info.get('brands', 'Unknown')} | {barcode}"
+            f"{product_info.get('brands', 'Unknown')} | {barcode}",
+            model_days,
         )
         print(f"Saved item ID {iid}: {name} ({barcode})")
     except Exception as e:
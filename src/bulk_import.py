@@ -0,0 +1,288 @@
+"""
+Bulk import of receipts and CSV exports: read in pandas chunks, processed
+column-wise, written in one transaction.
+
+  python src/app.py import-csv receipt.csv
+  curl -F file=@receipt.csv localhost:8000/import_csv
+
+Columns are matched by header (COLUMNS lists the accepted spellings); only
+a name column is required. Per chunk of CHUNK_ROWS lines:
+
+  purchased_on  the formats of utils.parse_date_input ("3d", "3 days ago",
+                "yesterday", "MM/DD", ISO; empty is today) as vectorised
+                string operations. Anything else goes through
+                utils.normalize_date once per distinct value.
+  expiry_on     ISO parsed vectorised, other spellings via normalize_date
+                per distinct value. Missing expiries are filled from the
+                shelf-life table (utils.shelf_life_days, once per distinct
+                name), then from the shelf-life model: one batched predict
+                call over the chunk's distinct (category, location) pairs.
+
+All rows are staged and then written by add_item_rows() in a single
+transaction, so the write lock is held only for the insert and a bad line
+leaves the database untouched (ValueError naming the line).
+"""
+import datetime as dt
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import normalize_date, shelf_life_days
+
+logger = logging.getLogger("smartfood.bulk_import")
+
+CHUNK_ROWS = 20000
+SOURCE = "CSV"
+
+COLUMNS = {
+    "name": ("name", "item", "product", "description", "product_name"),
+    "category": ("category",),
+    "qty": ("qty", "quantity", "count", "amount"),
+    "unit": ("unit", "units"),
+    "location": ("location", "storage"),
+    "purchased_on": ("purchased_on", "purchased", "purchase_date", "date", "bought"),
+    "expiry_on": ("expiry_on", "expiry", "expires", "expiry_date", "expiration_date", "best_before"),
+    "source": ("source",),
+    "notes": ("notes", "note"),
+}
+LOCATIONS = ("Fridge", "Freezer", "Pantry")
+# what the CLI assumes when it asks the model (see app.cmd_add_item)
+TEMPERATURES = {"fridge": 4.0, "freezer": -18.0, "pantry": 20.0}
+
+_EPOCH = dt.date(1970, 1, 1).toordinal()
+_ISO = r"^\d{4}-\d{2}-\d{2}$"
+_RELATIVE = r"^(?:(-?\d+)\s*(?:d(?:ays?)?)?|(\d+)\s*days?\s*ago)$"
+_MONTH_DAY = r"^(\d{1,2})[/-](\d{1,2})$"
+
+
+def _columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename recognised headers to ITEM_FIELDS names and drop the rest."""
+    aliases = {alias: field for field, spellings in COLUMNS.items() for alias in spellings}
+    renamed = {}
+    for col in df.columns:
+        field = aliases.get(str(col).strip().lower().replace(" ", "_"))
+        if field and field not in renamed.values():
+            renamed[col] = field
+    if "name" not in renamed.values():
+        raise ValueError(f"import needs a name column (one of {', '.join(COLUMNS['name'])})")
+    return df[list(renamed)].rename(columns=renamed)
+
+
+def _days_from_iso(values: pd.Series) -> np.ndarray:
+    """Day ordinals (float, NaN if not a valid ISO date) of strings in YYYY-MM-DD form."""
+    parsed = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce").to_numpy().astype("datetime64[D]")
+    days = parsed.astype(np.int64).astype(np.float64) + _EPOCH
+    days[np.isnat(parsed)] = np.nan
+    return days
+
+
+def _fallback(text: pd.Series, days: np.ndarray, what: str, first_line: int):
+    """normalize_date() once per distinct value still unparsed (in place); ValueError names the first bad line."""
+    todo = np.isnan(days) & (text != "").to_numpy()
+    if not todo.any():
+        return
+    parsed = {}
+    for value in pd.unique(text[todo]):
+        try:
+            parsed[value] = dt.date.fromisoformat(normalize_date(value)).toordinal()
+        except ValueError:
+            line = first_line + int(np.flatnonzero(todo & (text == value).to_numpy())[0])
+            raise ValueError(f"line {line}: unrecognised {what} {value!r}") from None
+    days[todo] = text[todo].map(parsed).to_numpy(dtype=np.float64)
+
+
+def purchase_days(values: pd.Series, today: dt.date, first_line: int = 2) -> np.ndarray:
+    """
+    utils.parse_date_input() over a column, as day ordinals: same keywords,
+    relative days and MM/DD, with empty meaning today; other spellings
+    through normalize_date.
+    """
+    text = values.fillna("").astype(str).str.strip()
+    low = text.str.lower()
+    t = today.toordinal()
+    days = np.full(len(text), np.nan)
+
+    days[(low == "").to_numpy() | low.isin(("today", "t")).to_numpy()] = t
+    days[low.isin(("yesterday", "y", "yd")).to_numpy()] = t - 1
+
+    rel = low.str.extract(_RELATIVE)
+    n = pd.to_numeric(rel[0].fillna(rel[1]), errors="coerce").to_numpy(dtype=np.float64)
+    todo = np.isnan(days) & ~np.isnan(n)
+    days[todo] = t - n[todo]
+
+    todo = np.isnan(days) & text.str.match(_ISO).to_numpy()
+    if todo.any():
+        days[todo] = _days_from_iso(text[todo])
+
+    md = text.str.extract(_MONTH_DAY)
+    todo = np.isnan(days) & md[0].notna().to_numpy()
+    if todo.any():
+        parts = pd.DataFrame({"year": today.year, "month": pd.to_numeric(md[0][todo]),
+                              "day": pd.to_numeric(md[1][todo])})
+        parsed = pd.to_datetime(parts, errors="coerce").to_numpy().astype("datetime64[D]")
+        days[todo] = np.where(np.isnat(parsed), np.nan, parsed.astype(np.int64) + _EPOCH)
+
+    days[(days < 1) | (days > dt.date.max.toordinal())] = np.nan  # "99999 days ago"
+    _fallback(text, days, "purchase date", first_line)
+    return days
+
+
+def expiry_days(values: pd.Series, first_line: int = 2) -> np.ndarray:
+    """Day ordinals of an expiry column; NaN where it is empty."""
+    text = values.fillna("").astype(str).str.strip()
+    days = np.full(len(text), np.nan)
+    todo = text.str.match(_ISO).to_numpy()
+    if todo.any():
+        days[todo] = _days_from_iso(text[todo])
+    _fallback(text, days, "expiry date", first_line)
+    return days
+
+
+def _iso(days: np.ndarray) -> np.ndarray:
+    """ISO strings (None for NaN) of day ordinals."""
+    out = np.full(len(days), None, dtype=object)
+    ok = ~np.isnan(days)
+    out[ok] = np.datetime_as_string((days[ok].astype(np.int64) - _EPOCH).astype("datetime64[D]"))
+    return out
+
+
+def _fill_from_table(names: pd.Series, purchased: np.ndarray, expiry: np.ndarray, lookups: dict) -> int:
+    """
+    Fill missing expiries from the shelf-life table, one lookup per distinct
+    name (lookups: name -> days, shared across chunks); returns rows filled.
+    """
+    todo = np.isnan(expiry)
+    if not todo.any():
+        return 0
+    keys = names[todo].str.strip().str.lower()
+    for k in pd.unique(keys):
+        if k not in lookups:
+            lookups[k] = shelf_life_days(k)  # misses scan the table: worth doing once per import
+    found = keys.map(lookups).to_numpy(dtype=np.float64)
+    idx = np.flatnonzero(todo)[~np.isnan(found)]
+    expiry[idx] = purchased[idx] + found[~np.isnan(found)]
+    return len(idx)
+
+
+def _fill_from_model(categories: pd.Series, locations: pd.Series, purchased: np.ndarray, expiry: np.ndarray,
+                     model_days: np.ndarray, predict_batch) -> int:
+    """
+    Fill missing expiries with one predict_batch() call over the distinct
+    (category, location) pairs, and model_days with the uncorrected predictions.
+    """
+    todo = np.isnan(expiry)
+    if predict_batch is None or not todo.any():
+        return 0
+    keys = pd.DataFrame({"category": categories[todo].str.lower().replace("", "unknown"),
+                         "location": locations[todo].str.lower()})
+    pairs = keys.drop_duplicates()
+    payloads = [{"category": c, "location": loc, "packaging": "sealed", "state": "raw",
+                 "temperature": TEMPERATURES[loc]} for c, loc in pairs.itertuples(index=False)]
+    try:
+        results = predict_batch(payloads)
+    except Exception as e:  # the model or API being down leaves the expiries empty, not the import failed
+        logger.warning("shelf-life prediction failed, %d expiries left empty: %s", todo.sum(), e)
+        return 0
+    predicted = {(p["category"], p["location"]): (r.get("predicted_shelf_life_days"),
+                                                  r.get("model_shelf_life_days", r.get("predicted_shelf_life_days")))
+                 for p, r in zip(payloads, results)}
+    days = np.array([predicted.get(k, (None, None)) for k in keys.itertuples(index=False)],
+                    dtype=np.float64).reshape(-1, 2)  # None -> nan
+    ok = ~np.isnan(days[:, 0])
+    idx = np.flatnonzero(todo)[ok]
+    expiry[idx] = purchased[idx] + np.floor(days[ok, 0])  # whole days, like date + timedelta(days=...)
+    model_days[idx] = days[ok, 1]
+    return len(idx)
+
+
+def prepare(chunk: pd.DataFrame, today: dt.date, predict_batch=None, source: str = SOURCE,
+            first_line: int = 2, lookups: dict = None) -> tuple:
+    """
+    ITEM_FIELDS tuples for add_item_rows() from one chunk of raw CSV text
+    columns, plus counts of where the expiries came from.
+    """
+    df = _columns(chunk)
+    n = len(df)
+
+    def col(name, default=""):
+        if name in df:
+            return df[name].fillna("").astype(str).str.strip()
+        return pd.Series([default] * n, index=df.index, dtype=object)
+
+    names = col("name")
+    if (names == "").any():
+        raise ValueError(f"line {first_line + int(np.flatnonzero((names == '').to_numpy())[0])}: missing name")
+    categories = col("category")
+    location = col("location").str.title().replace("", "Fridge")
+    bad = ~location.isin(LOCATIONS)
+    if bad.any():
+        i = int(np.flatnonzero(bad.to_numpy())[0])
+        raise ValueError(f"line {first_line + i}: location must be one of {LOCATIONS}, got {location.iloc[i]!r}")
+    qty_text = col("qty")
+    qty = pd.to_numeric(qty_text.replace("", "1"), errors="coerce")
+    if qty.isna().any():
+        i = int(np.flatnonzero(qty.isna().to_numpy())[0])
+        raise ValueError(f"line {first_line + i}: quantity {qty_text.iloc[i]!r} is not a number")
+
+    purchased = purchase_days(col("purchased_on"), today, first_line)
+    expiry = expiry_days(col("expiry_on"), first_line)
+    given = int((~np.isnan(expiry)).sum())
+    from_table = _fill_from_table(names, purchased, expiry, {} if lookups is None else lookups)
+    model_days = np.full(n, np.nan)
+    from_model = _fill_from_model(categories, location, purchased, expiry, model_days, predict_batch)
+
+    rows = list(zip(
+        names.tolist(),
+        [c or None for c in categories.tolist()],
+        qty.astype(np.float64).tolist(),
+        col("unit").tolist(),
+        location.tolist(),
+        _iso(purchased).tolist(),
+        _iso(expiry).tolist(),
+        col("source", source).replace("", source).tolist(),
+        [n or None for n in col("notes").tolist()],
+        [None if np.isnan(d) else d for d in model_days.tolist()],
+    ))
+    return rows, {"expiry_given": given, "expiry_from_table": from_table, "expiry_from_model": from_model,
+                  "expiry_missing": n - given - from_table - from_model}
+
+
+def read_chunks(f, chunk_rows: int = CHUNK_ROWS):
+    """DataFrames of at most chunk_rows lines of a CSV path or binary file, every column as text."""
+    return pd.read_csv(f, chunksize=chunk_rows, dtype=str, keep_default_na=False, skipinitialspace=True)
+
+
+def stage(f, predict_batch=None, chunk_rows: int = CHUNK_ROWS, source: str = SOURCE,
+          today: dt.date = None) -> tuple:
+    """
+    prepare() every chunk of a CSV path or binary file. predict_batch(payloads)
+    -> /predict results fills expiries the table doesn't know (None: leave
+    them empty). Returns (list of row lists for add_item_rows, counts).
+    """
+    today = today or dt.date.today()
+    batches, stats, line, lookups = [], {}, 2, {}
+    for chunk in read_chunks(f, chunk_rows):
+        rows, counts = prepare(chunk, today, predict_batch, source, first_line=line, lookups=lookups)
+        batches.append(rows)
+        line += len(rows)
+        for k, v in counts.items():
+            stats[k] = stats.get(k, 0) + v
+    return batches, stats
+
+
+def import_csv(f, add_item_rows, predict_batch=None, chunk_rows: int = CHUNK_ROWS, source: str = SOURCE,
+               today: dt.date = None) -> dict:
+    """stage() then one add_item_rows() call; returns the counts and timings."""
+    start = time.perf_counter()
+    batches, stats = stage(f, predict_batch, chunk_rows, source, today)
+    prepared = time.perf_counter()
+    added = add_item_rows(batches)
+    return {"imported": added, **stats, **timings(added, start, prepared, time.perf_counter())}
+
+
+def timings(rows: int, start: float, prepared: float, done: float) -> dict:
+    """Phase durations and throughput of an import, from perf_counter() readings."""
+    return {"prepare_s": round(prepared - start, 3), "insert_s": round(done - prepared, 3),
+            "seconds": round(done - start, 3), "rows_per_sec": round(rows / max(done - start, 1e-9))}
@@ -0,0 +1,108 @@
+"""
+Per-household shelf-life calibration: an online correction applied to the
+shelf-life model's output, learned from what actually happens to items.
+
+Every item that leaves the inventory (delete_item, or a consume_item that
+empties it) is one observation of its real life (event day - purchased day)
+against the model's uncorrected prediction for it (model_shelf_life_days,
+stored with the item when its expiry was set from /predict). Items whose
+expiry came from anywhere else (the user, a CSV, the shelf-life table) say
+nothing about the model and are skipped; comparing with the stored expiry
+would also feed earlier corrections back into the next. Only the
+informative side is used:
+
+  wasted before the predicted life    -> the prediction was too long
+  consumed after the predicted life   -> the item outlived the prediction
+
+(thrown out late or eaten early says nothing about when it spoils). The
+residual log(actual / expected), clamped to +-log(MAX_FACTOR), updates an
+exponentially weighted mean per (household, category, location) with one
+UPSERT in the same transaction as the item event, so an update is O(1) and
+the table holds one small row per key. The first observations are a plain
+running mean (weight max(ALPHA, 1/n)), later ones decay with ALPHA.
+
+/predict multiplies its prediction by exp(mean * n / (n + PRIOR_N)): a key
+with few observations stays close to the model. The model is not retrained.
+
+A database is one household's inventory, named by SMARTFOOD_HOUSEHOLD; the
+key carries it so tables from several households can be pooled.
+"""
+import math
+import os
+import time
+from typing import Optional
+
+ENABLED = os.environ.get("SMARTFOOD_CALIBRATION", "1") != "0"
+HOUSEHOLD = os.environ.get("SMARTFOOD_HOUSEHOLD", "default")
+ALPHA = float(os.environ.get("SMARTFOOD_CALIBRATION_ALPHA", "0.2"))
+PRIOR_N = 3
+MAX_FACTOR = 3.0
+REFRESH_SECONDS = 60
+
+_MAX_LOG = math.log(MAX_FACTOR)
+
+
+def key(category: Optional[str], location: Optional[str]) -> tuple:
+    """Calibration key for a category/location as typed ("Fridge" and "fridge" are one key)."""
+    return (category or "unknown").strip().lower(), (location or "").strip().lower()
+
+
+def residual(kind: str, day: int, purchased_day: Optional[int], model_days: Optional[float]) -> Optional[float]:
+    """log(actual life / model_days) for an item leaving on day number `day`, or None if uninformative."""
+    if purchased_day is None or model_days is None:
+        return None
+    expected = model_days
+    actual = day - purchased_day
+    if expected <= 0 or actual < 0:
+        return None
+    if kind == "wasted" and actual < expected:
+        r = math.log(max(actual, 0.5) / expected)
+    elif kind == "consumed" and actual > expected:
+        r = math.log(actual / expected)
+    else:
+        return None
+    return max(-_MAX_LOG, min(_MAX_LOG, r))
+
+
+def factor(log_ratio: float, n: int) -> float:
+    """Multiplier for predicted days, shrunk towards 1 while n is small."""
+    return math.exp(log_ratio * n / (n + PRIOR_N))
+
+
+class Corrections:
+    """
+    In-memory copy of one household's calibration rows for the /predict path.
+    Reloaded when older than REFRESH_SECONDS (other processes write too) or
+    after a local consume/delete (on_write, a db_manager write listener).
+    """
+
+    def __init__(self, household: str = HOUSEHOLD):
+        self.household = household
+        self.table = {}
+        self.loaded_at = None
+
+    def stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > REFRESH_SECONDS
+
+    def load(self, rows):
+        """rows: (category, location, log_ratio, n) as returned by calibration_table()."""
+        self.table = {(cat, loc): (log_ratio, n) for cat, loc, log_ratio, n in rows}
+        self.loaded_at = time.monotonic()
+
+    def on_write(self, op, item_id, fields):
+        if op in ("consume", "delete"):
+            self.loaded_at = None
+
+    def apply(self, result: dict, category: str, location: str) -> dict:
+        """Scale a predict_shelf_life() result by this household's correction for category/location."""
+        if result.get("status") != "success" or "predicted_shelf_life_days" not in result:
+            return result
+        log_ratio, n = self.table.get(key(category, location), (0.0, 0))
+        f = factor(log_ratio, n)
+        model_days = result["predicted_shelf_life_days"]
+        return {
+            **result,
+            "predicted_shelf_life_days": max(round(model_days * f, 1), 0.1),
+            "model_shelf_life_days": model_days,
+            "calibration": {"household": self.household, "factor": round(f, 4), "observations": n},
+        }
@@ -0,0 +1,128 @@
+"""
+Prediction client used by the CLI and the barcode workflow.
+
+Two modes, selected with SMARTFOOD_CLIENT_MODE:
+  - remote (default): talks to the FastAPI server at SMARTFOOD_API_URL over a
+    persistent keep-alive session with retries and timeouts.
+  - local: calls the shelf-life model and the image recognizer in process, so
+    no server needs to be running. Models load lazily on first use.
+
+Both return the same JSON-shaped dicts as the /predict and /predict-image
+endpoints.
+"""
+import os
+from typing import Optional
+
+DEFAULT_API_URL = "http://127.0.0.1:8000"
+PREDICT_BATCH_MAX = 1000  # rows per /predict_batch request
+
+
+class LocalClient:
+    mode = "local"
+
+    def __init__(self):
+        self.corrections = None
+
+    def predict_shelf_life(self, payload: dict) -> dict:
+        import shelf_life
+        result = shelf_life.predict_shelf_life(
+            payload["category"], payload["location"], payload["packaging"],
+            payload["state"], payload["temperature"],
+        )
+        return self._calibrate(result, payload["category"], payload["location"])
+
+    def predict_shelf_life_batch(self, payloads: list) -> list:
+        import shelf_life
+        results = shelf_life.predict_shelf_life_batch(payloads)
+        return [self._calibrate(r, p["category"], p["location"]) for r, p in zip(results, payloads)]
+
+    def _calibrate(self, result: dict, category: str, location: str) -> dict:
+        # same per-household correction the API applies to /predict
+        import calibration
+        import db_manager
+        if not calibration.ENABLED:
+            return result
+        if self.corrections is None:
+            self.corrections = calibration.Corrections()
+            db_manager.add_write_listener(self.corrections.on_write)
+        if self.corrections.stale():
+            self.corrections.load(db_manager.calibration_table(self.corrections.household))
+        return self.corrections.apply(result, category, location)
+
+    def recognize_image(self, path: str, top_k: int = 1, tta: bool = False) -> dict:
+        import recognizer  # loads TensorFlow + the CNN on first call
+        with open(path, "rb") as f:
+            result = recognizer.recognize(f.read(), top_k, tta)
+        if "error" in result:
+            return {"error": result["error"]}
+        return {"result": result}
+
+    def close(self):
+        if self.corrections is not None:
+            import db_manager
+            db_manager.remove_write_listener(self.corrections.on_write)
+            self.corrections = None
+
+
+class RemoteClient:
+    mode = "remote"
+
+    def __init__(self, base_url: Optional[str] = None, timeout=(3.05, 30.0), retries: int = 3,
+                 backoff: float = 0.3):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = (base_url or os.environ.get("SMARTFOOD_API_URL", DEFAULT_API_URL)).rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries, connect=retries, read=retries, backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),  # /predict* calls are idempotent
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def predict_shelf_life(self, payload: dict) -> dict:
+        r = self.session.post(f"{self.base_url}/predict", json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def predict_shelf_life_batch(self, payloads: list) -> list:
+        results = []
+        for i in range(0, len(payloads), PREDICT_BATCH_MAX):
+            r = self.session.post(f"{self.base_url}/predict_batch", json=payloads[i:i + PREDICT_BATCH_MAX],
+                                  timeout=self.timeout)
+            r.raise_for_status()
+            results.extend(r.json())
+        return results
+
+    def recognize_image(self, path: str, top_k: int = 1, tta: bool = False) -> dict:
+        with open(path, "rb") as f:
+            files = {"file": (os.path.basename(path), f, "image/jpeg")}
+            r = self.session.post(f"{self.base_url}/predict-image", files=files, timeout=self.timeout,
+                                  params={"top_k": top_k, "tta": str(tta).lower()})
+        r.raise_for_status()
+        return r.json()
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+
+
+def get_client(mode: Optional[str] = None):
+    """Return the process-wide client (created on first use)."""
+    global _client
+    mode = (mode or os.environ.get("SMARTFOOD_CLIENT_MODE", "remote")).lower()
+    if _client is None or _client.mode != mode:
+        if mode == "local":
+            _client = LocalClient()
+        elif mode == "remote":
+            _client = RemoteClient()
+        else:
+            raise ValueError(f"Unknown client mode: {mode}")
+    return _client
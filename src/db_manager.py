@@ -1,11 +1,27 @@
 from typing import Optional
+import logging
 import sqlite3
 import os
+import threading
+import re
 import datetime as dt
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "..", "smartfood.db")
+from utils import normalize_date
+from metrics import timed, DB_QUERY_TIME
+import calibration
+import inventory_cache
 
-SCHEMA = """
+DB_PATH = os.environ.get("SMARTFOOD_DB") or os.path.join(os.path.dirname(__file__), "..", "smartfood.db")
+
+# Dates are stored as validated ISO text; *_day columns are generated day
+# numbers (same as date.toordinal()) so range queries and sorting by expiry
+# are index operations instead of per-row string parsing in Python.
+DAY_EXPR = "CAST(julianday({col}) - 1721424.5 AS INTEGER)"
+
+CHANGE_LOG_KEEP = 20000
+ALERT_KEEP_DAYS = 30
+
+SCHEMA = f"""
 PRAGMA foreign_keys = ON;
 
 CREATE TABLE IF NOT EXISTS items (
@@ -18,51 +34,650 @@ CREATE TABLE IF NOT EXISTS items (
   purchased_on TEXT,
   expiry_on TEXT,
   source TEXT,
-  notes TEXT
+  notes TEXT,
+  model_shelf_life_days REAL,  -- uncorrected model prediction, when the expiry came from the model
+  purchased_day INTEGER GENERATED ALWAYS AS ({DAY_EXPR.format(col="purchased_on")}) VIRTUAL,
+  expiry_day INTEGER GENERATED ALWAYS AS ({DAY_EXPR.format(col="expiry_on")}) VIRTUAL
+);
+
+-- Append-only history of what left the inventory (consume_item / delete_item),
+-- with the item's attributes copied so it survives the row's deletion.
+CREATE TABLE IF NOT EXISTS item_events (
+  id INTEGER PRIMARY KEY,
+  item_id INTEGER NOT NULL,
+  ts TEXT NOT NULL,
+  day INTEGER NOT NULL,
+  kind TEXT NOT NULL CHECK(kind IN ('consumed','wasted')),
+  qty REAL NOT NULL,
+  unit TEXT,
+  name TEXT,
+  category TEXT,
+  location TEXT,
+  source TEXT,
+  purchased_day INTEGER,
+  expiry_day INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_item_events_day ON item_events(day);
+
+-- Per-day totals, kept current by the trigger below so reports never scan item_events.
+CREATE TABLE IF NOT EXISTS daily_rollups (
+  day INTEGER NOT NULL,
+  category TEXT NOT NULL,
+  location TEXT NOT NULL,
+  source TEXT NOT NULL,
+  consumed_qty REAL NOT NULL DEFAULT 0,
+  consumed_events INTEGER NOT NULL DEFAULT 0,
+  wasted_qty REAL NOT NULL DEFAULT 0,
+  wasted_events INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, category, location, source)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_item_events_rollup AFTER INSERT ON item_events
+BEGIN
+  INSERT INTO daily_rollups(day, category, location, source,
+                            consumed_qty, consumed_events, wasted_qty, wasted_events)
+  VALUES (NEW.day, COALESCE(NEW.category, ''), COALESCE(NEW.location, ''), COALESCE(NEW.source, ''),
+          CASE WHEN NEW.kind = 'consumed' THEN NEW.qty ELSE 0 END, NEW.kind = 'consumed',
+          CASE WHEN NEW.kind = 'wasted' THEN NEW.qty ELSE 0 END, NEW.kind = 'wasted')
+  ON CONFLICT(day, category, location, source) DO UPDATE SET
+    consumed_qty = consumed_qty + excluded.consumed_qty,
+    consumed_events = consumed_events + excluded.consumed_events,
+    wasted_qty = wasted_qty + excluded.wasted_qty,
+    wasted_events = wasted_events + excluded.wasted_events;
+END;
+
+-- Online shelf-life correction per household/category/location (see calibration.py):
+-- an exponentially weighted mean of log(actual / expected life) over n observations.
+CREATE TABLE IF NOT EXISTS shelf_life_calibration (
+  household TEXT NOT NULL,
+  category TEXT NOT NULL,
+  location TEXT NOT NULL,
+  log_ratio REAL NOT NULL,
+  n INTEGER NOT NULL,
+  updated_day INTEGER NOT NULL,
+  PRIMARY KEY (household, category, location)
+) WITHOUT ROWID;
+
+-- Expiry alerts, one per (item, threshold, expiry day) whichever API worker fires it
+-- first (see expiry_alerts.py); the id is the SSE event id. Pruned a month after expiry.
+-- item_id is cleared when the item is deleted, as SQLite may hand its id to a new item.
+CREATE TABLE IF NOT EXISTS expiry_alerts (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  item_id INTEGER,
+  threshold INTEGER NOT NULL,
+  expiry_day INTEGER NOT NULL,
+  alert TEXT NOT NULL,
+  UNIQUE (item_id, threshold, expiry_day)
+);
+CREATE TRIGGER IF NOT EXISTS trg_expiry_alerts_prune AFTER INSERT ON expiry_alerts
+WHEN NEW.id % 256 = 0
+BEGIN DELETE FROM expiry_alerts WHERE expiry_day < NEW.expiry_day - {ALERT_KEEP_DAYS}; END;
+CREATE TRIGGER IF NOT EXISTS trg_items_delete_alerts AFTER DELETE ON items
+BEGIN UPDATE expiry_alerts SET item_id = NULL WHERE item_id = OLD.id; END;
+
+-- Ids of changed items, whoever wrote them; inventory_cache.py replays it to stay
+-- coherent. Only the last CHANGE_LOG_KEEP entries are kept, pruned in batches.
+CREATE TABLE IF NOT EXISTS item_changes (
+  seq INTEGER PRIMARY KEY,
+  item_id INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_items_insert_log AFTER INSERT ON items
+BEGIN INSERT INTO item_changes(item_id) VALUES (NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS trg_items_update_log AFTER UPDATE ON items
+BEGIN INSERT INTO item_changes(item_id) VALUES (NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS trg_items_delete_log AFTER DELETE ON items
+BEGIN INSERT INTO item_changes(item_id) VALUES (OLD.id); END;
+CREATE TRIGGER IF NOT EXISTS trg_item_changes_prune AFTER INSERT ON item_changes
+WHEN NEW.seq % 1024 = 0
+BEGIN DELETE FROM item_changes WHERE seq <= NEW.seq - {CHANGE_LOG_KEEP}; END;
+"""
+
+SCHEMA_VERSION = 4
+
+# Trigram full-text index over the searchable text of items (search_items).
+# External content: the text stays in items and the triggers keep the index
+# in step; updates that leave name/category/notes alone (consume) skip it.
+# Kept out of SCHEMA so a SQLite built without FTS5 (or older than 3.34, no
+# trigram tokenizer) still opens the database; search then scans with LIKE.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+  name, category, notes, content='items', content_rowid='id', tokenize='trigram'
 );
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_insert AFTER INSERT ON items
+BEGIN
+  INSERT INTO items_fts(rowid, name, category, notes) VALUES (NEW.id, NEW.name, NEW.category, NEW.notes);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_delete AFTER DELETE ON items
+BEGIN
+  INSERT INTO items_fts(items_fts, rowid, name, category, notes)
+  VALUES ('delete', OLD.id, OLD.name, OLD.category, OLD.notes);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_items_fts_update AFTER UPDATE OF name, category, notes ON items
+BEGIN
+  INSERT INTO items_fts(items_fts, rowid, name, category, notes)
+  VALUES ('delete', OLD.id, OLD.name, OLD.category, OLD.notes);
+  INSERT INTO items_fts(rowid, name, category, notes) VALUES (NEW.id, NEW.name, NEW.category, NEW.notes);
+END;
 """
 
+# Closing the last connection to a WAL database checkpoints it and deletes
+# the -wal/-shm files, which every short-lived get_con() connection would
+# then pay to recreate; one idle connection per process keeps them in place.
+_keepalive = {}
+_keepalive_lock = threading.Lock()  # first get_con() calls can race from API worker threads
+
+def _keep_open(reopen: bool = False):
+    with _keepalive_lock:
+        if DB_PATH in _keepalive and not reopen:
+            return
+        for path in list(_keepalive):
+            _keepalive.pop(path).close()
+        anchor = _keepalive[DB_PATH] = sqlite3.connect(DB_PATH, check_same_thread=False)
+        anchor.execute("PRAGMA schema_version").fetchone()  # a read attaches it to the WAL index
+
 def get_con():
+    if DB_PATH not in _keepalive:
+        _keep_open()
     return sqlite3.connect(DB_PATH)
 
+# In-process copy of the items table serving the read functions below
+# (inventory_cache.py); None when SMARTFOOD_ITEM_CACHE=0. While the table is too
+# big its reads return None and the callers query SQLite.
+_item_cache = None
+
+def item_cache():
+    global _item_cache
+    if not inventory_cache.ENABLED:
+        return None
+    if _item_cache is None or _item_cache.closed or _item_cache.path != DB_PATH:
+        if _item_cache is not None:
+            _item_cache.close()
+        _item_cache = inventory_cache.InventoryCache(DB_PATH)
+    return _item_cache
+
+# --- write listeners (e.g. the API's expiry alert scheduler) ---
+_write_listeners = []
+
+def add_write_listener(fn):
+    """
+    Call fn(op, item_id, fields) after every committed write in this process.
+    op is "add", "update", "consume" or "delete"; fields holds the values
+    written (normalised dates), {"qty": new_qty} for consume and {} for delete.
+    Listeners run on the writing thread and must be quick.
+    """
+    _write_listeners.append(fn)
+
+def remove_write_listener(fn):
+    if fn in _write_listeners:
+        _write_listeners.remove(fn)
+
+def notify_write(op: str, item_id: int, fields: Optional[dict] = None):
+    for fn in list(_write_listeners):
+        try:
+            fn(op, item_id, fields or {})
+        except Exception:
+            logging.getLogger("smartfood.db").exception("write listener failed")
+
+@timed(DB_QUERY_TIME, function="init_db")
 def init_db():
     con = get_con()
+    # WAL: readers (and backup.snapshot) never block writers; persistent in the file
+    con.execute("PRAGMA journal_mode=WAL")
+    _keep_open(reopen=True)  # reattach now that the file is in WAL mode
     con.executescript(SCHEMA)
+    _migrate(con)
+    _ensure_fts(con)
     con.commit()
     con.close()
 
+def _ensure_fts(con):
+    """Create items_fts (indexing the rows already there) unless it exists or FTS5 is missing."""
+    if con.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone():
+        return
+    try:
+        con.executescript(FTS_SCHEMA)
+        con.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        logging.getLogger("smartfood.db").warning("full-text search unavailable (%s); search falls back to LIKE", e)
+
+def _migrate(con):
+    """Bring an existing database up to SCHEMA_VERSION (tracked in PRAGMA user_version)."""
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        # table_xinfo (not table_info) also lists generated columns
+        cols = {r[1] for r in con.execute("PRAGMA table_xinfo(items)")}
+        for col, src in (("purchased_day", "purchased_on"), ("expiry_day", "expiry_on")):
+            if col not in cols:
+                con.execute(f"ALTER TABLE items ADD COLUMN {col} INTEGER "
+                            f"GENERATED ALWAYS AS ({DAY_EXPR.format(col=src)}) VIRTUAL")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_items_expiry_day ON items(expiry_day)")
+        fixed, cleared = migrate_dates(con)
+        if fixed or cleared:
+            logging.getLogger("smartfood.db").info("rewrote dates in %d row(s), cleared %d unparseable value(s)",
+                                                   fixed, cleared)
+    if version < 2:
+        # location filter + expiry order for paged listings
+        con.execute("CREATE INDEX IF NOT EXISTS idx_items_location_expiry ON items(location, expiry_day)")
+    if version < 3:
+        # name-prefix matches for search_items
+        con.execute("CREATE INDEX IF NOT EXISTS idx_items_name_nocase ON items(name COLLATE NOCASE)")
+    if version < 4:
+        # the shelf-life calibration's baseline (calibration.residual)
+        if "model_shelf_life_days" not in {r[1] for r in con.execute("PRAGMA table_xinfo(items)")}:
+            con.execute("ALTER TABLE items ADD COLUMN model_shelf_life_days REAL")
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def migrate_dates(con) -> tuple[int, int]:
+    """
+    One-shot fix of legacy free-text dates: rewrite them as ISO.
+    Values that can't be parsed are set to NULL and kept in `notes`.
+    Returns (rows rewritten, values cleared).
+    """
+    fixed = cleared = 0
+    rows = con.execute("""SELECT id, purchased_on, expiry_on, notes FROM items
+                          WHERE (purchased_on IS NOT NULL AND purchased_day IS NULL)
+                             OR (expiry_on IS NOT NULL AND expiry_day IS NULL)
+                             OR purchased_on GLOB '*[^0-9-]*' OR expiry_on GLOB '*[^0-9-]*'""").fetchall()
+    for iid, pur, exp, notes in rows:
+        values = {}
+        for col, raw in (("purchased_on", pur), ("expiry_on", exp)):
+            try:
+                values[col] = normalize_date(raw)
+            except ValueError:
+                values[col] = None
+                notes = f"{notes} | {col}: {raw}" if notes else f"{col}: {raw}"
+                cleared += 1
+        con.execute("UPDATE items SET purchased_on=?, expiry_on=?, notes=? WHERE id=?",
+                    (values["purchased_on"], values["expiry_on"], notes, iid))
+        fixed += 1
+    return fixed, cleared
+
+@timed(DB_QUERY_TIME, function="add_item")
 def add_item(name, category=None, qty=1, unit="", location="Fridge",
-             purchased_on=None, expiry_on=None, source=None, notes=None):
+             purchased_on=None, expiry_on=None, source=None, notes=None, model_shelf_life_days=None):
+    """
+    model_shelf_life_days: the shelf-life model's uncorrected prediction
+    ("model_shelf_life_days" of /predict), given only when the expiry was set
+    from it; the calibration learns from those items alone.
+    """
     con = get_con()
-    purchased_on = purchased_on or dt.date.today().isoformat()
+    purchased_on = normalize_date(purchased_on) or dt.date.today().isoformat()
+    expiry_on = normalize_date(expiry_on)
     cur = con.execute(
-        """INSERT INTO items(name, category, qty, unit, location, purchased_on, expiry_on, source, notes)
-           VALUES (?,?,?,?,?,?,?,?,?)""",
-        (name, category, qty, unit, location, purchased_on, expiry_on, source, notes)
+        """INSERT INTO items(name, category, qty, unit, location, purchased_on, expiry_on, source, notes,
+                             model_shelf_life_days)
+           VALUES (?,?,?,?,?,?,?,?,?,?)""",
+        (name, category, qty, unit, location, purchased_on, expiry_on, source, notes, model_shelf_life_days)
     )
     con.commit()
-    iid = cur.lastrowid      
+    iid = cur.lastrowid
     con.close()
-    return iid               
+    if _write_listeners:
+        notify_write("add", iid, {"name": name, "category": category, "qty": qty, "location": location,
+                                  "purchased_on": purchased_on, "expiry_on": expiry_on})
+    return iid
 
+ITEM_FIELDS = ("name", "category", "qty", "unit", "location", "purchased_on", "expiry_on", "source", "notes",
+               "model_shelf_life_days")
+
+@timed(DB_QUERY_TIME, function="add_items")
+def add_items(items):
+    """
+    Insert several items (dicts keyed like add_item's arguments) in one
+    transaction. Returns the new ids in order; nothing is written if any
+    row fails.
+    """
+    today = dt.date.today().isoformat()
+    rows = []
+    for it in items:
+        rows.append((it["name"], it.get("category"), it.get("qty", 1), it.get("unit", ""),
+                     it.get("location", "Fridge"), normalize_date(it.get("purchased_on")) or today,
+                     normalize_date(it.get("expiry_on")), it.get("source"), it.get("notes"),
+                     it.get("model_shelf_life_days")))
+    con = get_con()
+    try:
+        with con:
+            ids = list(_insert_rows(con, rows))
+    finally:
+        con.close()
+    if _write_listeners:
+        for iid, row in zip(ids, rows):
+            notify_write("add", iid, dict(zip(ITEM_FIELDS, row)))
+    return ids
+
+INSERT_ITEM_SQL = """INSERT INTO items(name, category, qty, unit, location, purchased_on, expiry_on, source, notes,
+                                       model_shelf_life_days)
+                     VALUES (?,?,?,?,?,?,?,?,?,?)"""
+# Rows per multi-row INSERT in _insert_rows: 900 parameters, under the 999 of
+# SQLite before 3.32. Statement overhead, the items_fts trigger's included,
+# is paid per chunk; row-at-a-time inserts made bulk adds ~3x slower.
+INSERT_CHUNK_ROWS = 90
+
+def _insert_sql(n: int) -> str:
+    return INSERT_ITEM_SQL + ",(?,?,?,?,?,?,?,?,?,?)" * (n - 1)
+
+def _insert_rows(con, rows) -> range:
+    """
+    Insert a list of ITEM_FIELDS tuples inside the caller's transaction,
+    INSERT_CHUNK_ROWS per statement, and return their ids. While the largest
+    id is below 2**63-1 SQLite numbers new rows max(id) + 1, so under the
+    write lock a batch gets consecutive ids ending at last_insert_rowid().
+    """
+    full = _insert_sql(INSERT_CHUNK_ROWS)
+    for i in range(0, len(rows), INSERT_CHUNK_ROWS):
+        chunk = rows[i:i + INSERT_CHUNK_ROWS]
+        con.execute(full if len(chunk) == INSERT_CHUNK_ROWS else _insert_sql(len(chunk)),
+                    [v for row in chunk for v in row])
+    last = con.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return range(last - len(rows) + 1, last + 1) if rows else range(0)
+
+@timed(DB_QUERY_TIME, function="add_item_rows")
+def add_item_rows(batches) -> int:
+    """
+    Insert already normalised ITEM_FIELDS tuples, given as an iterable of
+    lists, in a single transaction (all or nothing). The bulk path of
+    bulk_import.py; returns the number of rows added.
+    """
+    count, added = 0, []
+    con = get_con()
+    try:
+        with con:
+            for rows in batches:
+                ids = _insert_rows(con, rows)
+                count += len(ids)
+                if _write_listeners:
+                    added.append((ids, rows))
+    finally:
+        con.close()
+    for ids, rows in added:
+        for iid, row in zip(ids, rows):
+            notify_write("add", iid, dict(zip(ITEM_FIELDS, row)))
+    return count
+
+@timed(DB_QUERY_TIME, function="list_items")
 def list_items():
+    cache = item_cache()
+    rows = cache.list_items() if cache else None
+    if rows is not None:
+        return rows
     con = get_con()
     rows = con.execute("""SELECT id,name,qty,unit,category,location,purchased_on,expiry_on
                           FROM items""").fetchall()
     con.close()
     return rows
 
+@timed(DB_QUERY_TIME, function="list_items_with_days")
+def list_items_with_days(within_days: Optional[int] = None, by_expiry: bool = False):
+    """
+    Like list_items() but with days_left appended to each row:
+      (id, name, qty, unit, category, location, purchased_on, expiry_on, days_left)
+    within_days: only items expiring within N days (expired included).
+    by_expiry: sort soonest first (items without expiry last).
+    Both use the expiry_day index (of the item cache, or SQLite's).
+    """
+    today = dt.date.today().toordinal()
+    cache = item_cache()
+    rows = cache.list_items_with_days(today, within_days, by_expiry) if cache else None
+    if rows is not None:
+        return rows
+    sql = """SELECT id,name,qty,unit,category,location,purchased_on,expiry_on, expiry_day - ?
+             FROM items"""
+    params = [today]
+    if within_days is not None:
+        sql += " WHERE expiry_day <= ?"
+        params.append(today + within_days)
+    if by_expiry:
+        # NULLs sort first in SQLite; only the unfiltered listing has any
+        sql += " ORDER BY expiry_day" if within_days is not None else " ORDER BY expiry_day IS NULL, expiry_day"
+    con = get_con()
+    rows = con.execute(sql, params).fetchall()
+    con.close()
+    return rows
+
+SEARCH_COLUMNS = "i.id,i.name,i.qty,i.unit,i.category,i.location,i.purchased_on,i.expiry_on, i.expiry_day - ?"
+SEARCH_WEIGHTS = "10.0, 3.0, 1.0"  # bm25 weights of name, category, notes
+SEARCH_FUZZY_CANDIDATES = 200     # best bm25 matches of the typo fragments, re-scored in Python
+SEARCH_FUZZY_MIN = 0.4            # least _fuzzy_score of a typo match
+
+# search_items keeps one connection per database: opening one and parsing the
+# schema costs more than the query. The lock serialises the API's threads on it.
+_search = {"path": None, "con": None, "schema": None, "fts": False}
+_search_lock = threading.Lock()
+
+def _search_con():
+    if _search["path"] != DB_PATH:
+        if _search["con"] is not None:
+            _search["con"].close()
+        _search.update(path=DB_PATH, con=sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False),
+                       schema=None)
+    con = _search["con"]
+    schema = con.execute("PRAGMA schema_version").fetchone()[0]
+    if schema != _search["schema"]:  # created by init_db, or gone after restoring an older snapshot
+        _search["fts"] = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone() is not None
+        _search["schema"] = schema
+    return con, _search["fts"]
+
+def _trigrams(word: str) -> set:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def _word_trigrams(word: str) -> set:
+    # padded as pg_trgm does, so word starts and ends weigh in and short words still have a few
+    return _trigrams(f"  {word} ")
+
+def _fuzzy_score(terms: list, row) -> float:
+    """Mean over query words of the best Dice similarity to a word of the row's name or category."""
+    words = [_word_trigrams(w) for w in re.findall(r"\w+", f"{row[1]} {row[4] or ''}".lower())]
+    total = 0.0
+    for t in terms:
+        g = _word_trigrams(t)
+        total += max((2 * len(g & w) / (len(g) + len(w)) for w in words), default=0.0)
+    return total / len(terms)
+
+def _typo_fragments(term: str) -> list:
+    """Pieces of term that survive one typo somewhere else in it: its halves, or its trigrams when short."""
+    if len(term) < 6:
+        return sorted(_trigrams(term))
+    half = len(term) // 2
+    return [term[:half], term[half:]]
+
+def _phrase(text: str) -> str:
+    # a quoted string is a phrase, which for the trigram tokenizer is a substring match
+    return '"' + text.replace('"', '""') + '"'
+
+@timed(DB_QUERY_TIME, function="search_items")
+def search_items(q: str, limit: int = 20) -> tuple[list, bool]:
+    """
+    Items matching the free text q, best first, as list_items_with_days rows.
+    Returns (rows, fuzzy).
+
+    Names starting with q come first, shortest first (an exact name before
+    longer ones), through the name index. Then items where every word of
+    three or more characters occurs in the name, category or notes (prefixes
+    and substrings match; case-insensitive), found through the items_fts
+    trigram index and ranked by bm25 with name weighted over category over
+    notes. The ranking covers every match, so its cost grows with how many
+    items a word matches.
+    Only when nothing matches does the typo-tolerant pass run: the items
+    ranking best on fragments of the query words that survive one typo, kept
+    if the words are on average close to words of the name or category
+    (fuzzy=True). Without a three-letter word only names are matched by
+    prefix; when SQLite lacks FTS5, words are matched by scanning.
+    """
+    text = " ".join(q.lower().split())
+    if not text:
+        return [], False
+    terms = [t for t in re.findall(r"\w+", text) if len(t) >= 3]
+    today = dt.date.today().toordinal()
+    with _search_lock:
+        con, fts = _search_con()
+        rows = con.execute(f"""SELECT {SEARCH_COLUMNS} FROM items i
+                               WHERE i.name COLLATE NOCASE >= ? AND i.name COLLATE NOCASE < ?
+                               ORDER BY length(i.name), i.id LIMIT ?""",
+                           (today, text, text + chr(0x10FFFF), limit)).fetchall()
+        if not terms or len(rows) == limit:
+            return rows, False
+        seen = [r[0] for r in rows]
+        more = limit - len(rows)
+        exclude = f"AND i.id NOT IN ({','.join('?' * len(seen))})" if seen else ""
+        if not fts:
+            where = " AND ".join("instr(lower(i.name || ' ' || coalesce(i.category, '') || ' ' || "
+                                 "coalesce(i.notes, '')), ?) > 0" for _ in terms)
+            in_name = " AND ".join("instr(lower(i.name), ?) > 0" for _ in terms)
+            rows += con.execute(f"""SELECT {SEARCH_COLUMNS} FROM items i WHERE {where} {exclude}
+                                    ORDER BY ({in_name}) DESC, length(i.name), i.id LIMIT ?""",
+                                (today, *terms, *seen, *terms, more)).fetchall()
+            return rows, False
+        # a quoted string is a phrase, which for the trigram tokenizer is a substring match
+        rows += con.execute(f"""SELECT {SEARCH_COLUMNS} FROM (
+                                  SELECT rowid AS id, bm25(items_fts, {SEARCH_WEIGHTS}) AS score FROM items_fts
+                                  WHERE items_fts MATCH ? ORDER BY score LIMIT ?) f
+                                JOIN items i ON i.id = f.id WHERE 1 {exclude} ORDER BY f.score, i.id LIMIT ?""",
+                            (today, " AND ".join(map(_phrase, terms)), limit, *seen, more)).fetchall()
+        if rows:
+            return rows, False
+        fragments = sorted({f for t in terms for f in _typo_fragments(t)})
+        candidates = con.execute(f"""SELECT {SEARCH_COLUMNS} FROM items i WHERE i.id IN (
+                                       SELECT rowid FROM items_fts WHERE items_fts MATCH ?
+                                       ORDER BY bm25(items_fts, {SEARCH_WEIGHTS}) LIMIT ?)""",
+                                 (today, " OR ".join(map(_phrase, fragments)), SEARCH_FUZZY_CANDIDATES)).fetchall()
+    scored = [(-score, row[0], row) for row in candidates if (score := _fuzzy_score(terms, row)) >= SEARCH_FUZZY_MIN]
+    scored.sort(key=lambda t: t[:2])
+    return [row for _, _, row in scored[:limit]], True
+
+ITEM_SORTS = ("id", "expiry", "name")
+
+def iter_items(page_size: int = 200, sort: str = "id", location: Optional[str] = None,
+               category: Optional[str] = None, within_days: Optional[int] = None):
+    """
+    Stream rows shaped like list_items_with_days(), fetched page by page with
+    keyset pagination (no OFFSET), so memory stays at one page regardless of
+    table size. Sorting and filtering happen in SQLite, or in memory when
+    the item cache serves the read.
+      sort: "id" | "expiry" (soonest first, no-expiry last) | "name"
+      location / category: exact match (case-insensitive)
+      within_days: only items expiring within N days (expired included)
+    """
+    if sort not in ITEM_SORTS:
+        raise ValueError(f"sort must be one of {ITEM_SORTS}")
+    today = dt.date.today().toordinal()
+    cache = item_cache()
+    rows = cache.iter_rows(today, sort, location, category, within_days) if cache else None
+    if rows is not None:
+        yield from rows
+        return
+    where, params = [], []
+    if location:
+        where.append("location = ?")
+        params.append(location.title())
+    if category:
+        where.append("category = ? COLLATE NOCASE")
+        params.append(category)
+    if within_days is not None:
+        where.append("expiry_day <= ?")
+        params.append(today + within_days)
+
+    base = """SELECT id,name,qty,unit,category,location,purchased_on,expiry_on, expiry_day - ?, expiry_day
+              FROM items"""
+    if sort == "expiry":
+        # two passes: dated items by (expiry_day, id), then undated ones by id
+        phases = [("expiry_day IS NOT NULL", ("expiry_day", "id"), 9),
+                  ("expiry_day IS NULL", ("id",), None)]
+    elif sort == "name":
+        phases = [(None, ("name", "id"), 1)]
+    else:
+        phases = [(None, ("id",), None)]
+
+    con = get_con()
+    try:
+        for phase_where, keys, key_col in phases:
+            clauses = where + ([phase_where] if phase_where else [])
+            last = None
+            while True:
+                page_clauses = list(clauses)
+                page_params = [today] + params
+                if last is not None:
+                    # row-value comparison continues right after the previous page
+                    page_clauses.append(f"({', '.join(keys)}) > ({', '.join('?' * len(keys))})")
+                    page_params += list(last)
+                sql = base
+                if page_clauses:
+                    sql += " WHERE " + " AND ".join(page_clauses)
+                sql += f" ORDER BY {', '.join(keys)} LIMIT ?"
+                rows = con.execute(sql, page_params + [page_size]).fetchall()
+                for r in rows:
+                    yield r[:9]
+                if len(rows) < page_size:
+                    break
+                tail = rows[-1]
+                last = (tail[key_col], tail[0]) if key_col is not None else (tail[0],)
+    finally:
+        con.close()
+
+EXPORT_COLUMNS = ("id",) + ITEM_FIELDS
+
+def iter_item_batches(batch_size: int = 65536):
+    """
+    Every items row as EXPORT_COLUMNS tuples, in id order and in lists of up
+    to batch_size. Each batch is its own short keyset query on a fresh
+    connection, so a slow consumer never holds a read lock that would block
+    writers, and the generator can be resumed from any thread.
+    """
+    last = 0
+    while True:
+        con = get_con()
+        try:
+            rows = con.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM items WHERE id > ? ORDER BY id LIMIT ?",
+                               (last, batch_size)).fetchall()
+        finally:
+            con.close()
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1][0]
+
+@timed(DB_QUERY_TIME, function="upcoming_expiries")
+def upcoming_expiries(from_day: int):
+    """
+    (id, name, qty, location, expiry_on) of unconsumed items expiring on or
+    after day number `from_day`, from the expiry_day index.
+    """
+    cache = item_cache()
+    rows = cache.upcoming_expiries(from_day) if cache else None
+    if rows is not None:
+        return rows
+    con = get_con()
+    rows = con.execute("""SELECT id,name,qty,location,expiry_on FROM items
+                          WHERE expiry_day >= ? AND (qty IS NULL OR qty > 0)""", (from_day,)).fetchall()
+    con.close()
+    return rows
+
+def max_item_id() -> int:
+    """Largest item id (O(1) on the rowid), used to size the ID column."""
+    con = get_con()
+    row = con.execute("SELECT MAX(id) FROM items").fetchone()
+    con.close()
+    return row[0] or 0
+
 # --- new helpers for edit/delete ---
+@timed(DB_QUERY_TIME, function="get_item")
 def get_item(item_id):
     """Return full row for item id or None."""
+    cache = item_cache()
+    row = cache.get_item(item_id) if cache else inventory_cache.NOT_CACHED
+    if row is not inventory_cache.NOT_CACHED:
+        return row
     con = get_con()
     row = con.execute("""SELECT id,name,category,qty,unit,location,purchased_on,expiry_on,source,notes
                          FROM items WHERE id = ?""", (item_id,)).fetchone()
     con.close()
     return row
 
+@timed(DB_QUERY_TIME, function="update_item")
 def update_item(item_id, name, category, qty, unit, location, purchased_on, expiry_on, source=None, notes=None):
     """Update item by id. Provide full values (use existing to keep)."""
+    purchased_on = normalize_date(purchased_on)
+    expiry_on = normalize_date(expiry_on)
     con = get_con()
     con.execute(
         """UPDATE items SET name=?, category=?, qty=?, unit=?, location=?, purchased_on=?, expiry_on=?, source=?, notes=?
@@ -71,32 +686,147 @@ def update_item(item_id, name, category, qty, unit, location, purchased_on, expi
     )
     con.commit()
     con.close()
+    if _write_listeners:
+        notify_write("update", item_id, {"name": name, "category": category, "qty": qty, "location": location,
+                                         "purchased_on": purchased_on, "expiry_on": expiry_on})
+
+EVENT_KINDS = ("consumed", "wasted")
+
+CALIBRATE_SQL = """
+INSERT INTO shelf_life_calibration(household, category, location, log_ratio, n, updated_day)
+VALUES (?, ?, ?, ?, 1, ?)
+ON CONFLICT(household, category, location) DO UPDATE SET
+  log_ratio = log_ratio + MAX(?, 1.0 / (n + 1)) * (excluded.log_ratio - log_ratio),
+  n = n + 1,
+  updated_day = excluded.updated_day
+"""
+
+def _record_event(con, item_id, kind, qty, final=False):
+    """
+    Append a consumption/disposal event for item_id (inside the caller's transaction).
+    final: the item leaves the inventory with this event, so its life also
+    updates the shelf-life calibration.
+    """
+    today = dt.date.today().toordinal()
+    con.execute(
+        """INSERT INTO item_events(item_id, ts, day, kind, qty, unit, name, category, location, source,
+                                   purchased_day, expiry_day)
+           SELECT id, ?, ?, ?, ?, unit, name, category, location, source, purchased_day, expiry_day
+           FROM items WHERE id = ?""",
+        (dt.datetime.now().isoformat(timespec="seconds"), today, kind, qty, item_id))
+    if final:
+        row = con.execute("SELECT category, location, purchased_day, model_shelf_life_days FROM items WHERE id = ?",
+                          (item_id,)).fetchone()
+        r = calibration.residual(kind, today, row[2], row[3]) if row else None
+        if r is not None:
+            con.execute(CALIBRATE_SQL, (calibration.HOUSEHOLD, *calibration.key(row[0], row[1]), r, today,
+                                        calibration.ALPHA))
 
-def delete_item(item_id):
-    """Delete item by id. Returns True if row deleted."""
+@timed(DB_QUERY_TIME, function="delete_item")
+def delete_item(item_id, reason: Optional[str] = "wasted"):
+    """
+    Delete item by id. Returns True if row deleted.
+    Any remaining quantity is recorded as an item event of kind `reason`
+    ("wasted" or "consumed"); reason=None records nothing (e.g. a mistaken entry).
+    """
+    if reason is not None and reason not in EVENT_KINDS:
+        raise ValueError(f"reason must be one of {EVENT_KINDS} or None")
     con = get_con()
-    cur = con.execute("DELETE FROM items WHERE id = ?", (item_id,))
-    con.commit()
-    affected = cur.rowcount
-    con.close()
+    try:
+        with con:
+            row = con.execute("SELECT qty FROM items WHERE id = ?", (item_id,)).fetchone()
+            if row and reason and (row[0] or 0) > 0:
+                _record_event(con, item_id, reason, row[0], final=True)
+            affected = con.execute("DELETE FROM items WHERE id = ?", (item_id,)).rowcount
+    finally:
+        con.close()
+    if affected and _write_listeners:
+        notify_write("delete", item_id)
     return affected > 0
 
+@timed(DB_QUERY_TIME, function="consume_item")
 def consume_item(item_id: int, amount: float) -> tuple[bool, Optional[float]]:
     """
     Reduce item quantity by amount. Returns (success, new_qty).
     If new qty <= 0, item is kept but qty=0 is stored.
+    The amount actually taken is recorded as a "consumed" item event.
     """
     con = get_con()
     try:
-        # Get current qty
-        row = con.execute("SELECT qty FROM items WHERE id = ?", (item_id,)).fetchone()
-        if not row:
-            return False, None
-        current = row[0] or 0
-        new_qty = max(0, current - amount)  # don't allow negative
-        # Update
-        con.execute("UPDATE items SET qty = ? WHERE id = ?", (new_qty, item_id))
-        con.commit()
-        return True, new_qty
+        with con:
+            # Get current qty
+            row = con.execute("SELECT qty FROM items WHERE id = ?", (item_id,)).fetchone()
+            if not row:
+                return False, None
+            current = row[0] or 0
+            new_qty = max(0, current - amount)  # don't allow negative
+            # Update
+            con.execute("UPDATE items SET qty = ? WHERE id = ?", (new_qty, item_id))
+            if current > new_qty:
+                _record_event(con, item_id, "consumed", current - new_qty, final=new_qty == 0)
     finally:
         con.close()
+    if _write_listeners:
+        notify_write("consume", item_id, {"qty": new_qty})
+    return True, new_qty
+
+ROLLUP_COLUMNS = ("day", "category", "location", "source",
+                  "consumed_qty", "consumed_events", "wasted_qty", "wasted_events")
+
+@timed(DB_QUERY_TIME, function="rollups")
+def rollups(from_day: int, to_day: int):
+    """daily_rollups rows (ROLLUP_COLUMNS) for day numbers from_day..to_day inclusive."""
+    con = get_con()
+    rows = con.execute(f"""SELECT {", ".join(ROLLUP_COLUMNS)} FROM daily_rollups
+                           WHERE day BETWEEN ? AND ?""", (from_day, to_day)).fetchall()
+    con.close()
+    return rows
+
+@timed(DB_QUERY_TIME, function="calibration_table")
+def calibration_table(household: str):
+    """(category, location, log_ratio, n) calibration rows of one household."""
+    con = get_con()
+    rows = con.execute("""SELECT category, location, log_ratio, n FROM shelf_life_calibration
+                          WHERE household = ?""", (household,)).fetchall()
+    con.close()
+    return rows
+
+@timed(DB_QUERY_TIME, function="record_alert")
+def record_alert(item_id: int, threshold: int, expiry_day: int, alert: str) -> tuple[int, bool]:
+    """
+    Log an expiry alert (JSON text) once per (item_id, threshold, expiry_day).
+    Returns (alert id, True) for the first caller, (existing id, False) after.
+    """
+    con = get_con()
+    with con:
+        cur = con.execute("""INSERT OR IGNORE INTO expiry_alerts(item_id, threshold, expiry_day, alert)
+                             VALUES (?,?,?,?)""", (item_id, threshold, expiry_day, alert))
+        if cur.rowcount:
+            alert_id, new = cur.lastrowid, True
+        else:
+            alert_id, new = con.execute("""SELECT id FROM expiry_alerts
+                                           WHERE item_id = ? AND threshold = ? AND expiry_day = ?""",
+                                        (item_id, threshold, expiry_day)).fetchone()[0], False
+    con.close()
+    return alert_id, new
+
+def recent_alerts(since: int = 0, limit: int = 500):
+    """(id, alert JSON) of the newest `limit` alerts with id > since, oldest first."""
+    con = get_con()
+    rows = con.execute("""SELECT id, alert FROM (SELECT id, alert FROM expiry_alerts WHERE id > ?
+                                                 ORDER BY id DESC LIMIT ?) ORDER BY id""",
+                       (since, limit)).fetchall()
+    con.close()
+    return rows
+
+def rebuild_rollups():
+    """Recompute daily_rollups from item_events (repair tool; normal writes keep it current)."""
+    con = get_con()
+    with con:
+        con.execute("DELETE FROM daily_rollups")
+        con.execute("""INSERT INTO daily_rollups
+                       SELECT day, COALESCE(category, ''), COALESCE(location, ''), COALESCE(source, ''),
+                              SUM(CASE WHEN kind = 'consumed' THEN qty ELSE 0 END), SUM(kind = 'consumed'),
+                              SUM(CASE WHEN kind = 'wasted' THEN qty ELSE 0 END), SUM(kind = 'wasted')
+                       FROM item_events GROUP BY 1, 2, 3, 4""")
+    con.close()
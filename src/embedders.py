@@ -0,0 +1,217 @@
+"""
+Sentence-embedding backends for semantic_mapper, selected with
+SMARTFOOD_EMBEDDER:
+
+  sentence-transformers  (default) the PyTorch all-MiniLM-L6-v2 model
+  onnx                   the same model exported to ONNX and int8-quantised,
+                         run with onnxruntime on CPU (no torch at runtime)
+  static                 a distilled static table: one vector per word plus
+                         character-trigram vectors for unseen words; a dict
+                         lookup and a mean, no neural network at all
+
+SMARTFOOD_EMBEDDER_PATH points at the ONNX export directory or the static
+table (.npz). Build them once from the default model (needs torch, and for
+onnx also transformers):
+
+  python src/embedders.py export-onnx models/minilm-onnx-int8
+  python src/embedders.py distill-static models/food_static_embeddings.npz --vocab words.txt
+
+All backends return float32 rows, L2-normalised, so cosine similarity is a dot product.
+"""
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+logger = logging.getLogger("smartfood.embedders")
+
+ST_MODEL_NAME = "all-MiniLM-L6-v2"
+DEFAULT_ONNX_DIR = os.path.join("models", "minilm-onnx-int8")
+DEFAULT_STATIC_PATH = os.path.join("models", "food_static_embeddings.npz")
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+class Embedder(ABC):
+    name = "base"
+
+    @abstractmethod
+    def encode(self, texts) -> np.ndarray:
+        """Embed each text as one float32, L2-normalised row."""
+
+
+class SentenceTransformerEmbedder(Embedder):
+    name = "sentence_transformer"
+
+    def __init__(self, model_name: str = ST_MODEL_NAME):
+        os.environ.setdefault("USE_TF", "0")
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts) -> np.ndarray:
+        out = self.model.encode(list(texts), convert_to_tensor=False)
+        return _normalize(np.asarray(out, dtype=np.float32))
+
+
+class OnnxEmbedder(Embedder):
+    """MiniLM exported to ONNX (see export_onnx); mean pooling over the attention mask, as SentenceTransformer does."""
+
+    name = "minilm_onnx"
+
+    def __init__(self, model_dir: str = DEFAULT_ONNX_DIR, max_length: int = 32, threads: int = 1):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(os.path.join(model_dir, "model.onnx"), opts,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts) -> np.ndarray:
+        batch = self.tokenizer.encode_batch(list(texts))
+        ids = np.array([e.ids for e in batch], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in batch], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        m = mask[..., None].astype(np.float32)
+        pooled = (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+        return _normalize(pooled.astype(np.float32))
+
+
+def _trigrams(word: str):
+    """Character trigrams, "#"-prefixed so they can't collide with whole words in the table."""
+    w = f"<{word}>"
+    return ["#" + w[i:i + 3] for i in range(len(w) - 2)]
+
+
+class StaticEmbedder(Embedder):
+    """Distilled word + trigram table (see distill_static)."""
+
+    name = "static_embeddings"
+
+    def __init__(self, path: str = DEFAULT_STATIC_PATH):
+        data = np.load(path, allow_pickle=False)
+        self.vectors = data["vectors"]  # float16 (n_tokens, dim)
+        self.index = {tok: i for i, tok in enumerate(data["tokens"].tolist())}
+
+    def _word_vector(self, word):
+        i = self.index.get(word)
+        if i is not None:
+            return self.vectors[i].astype(np.float32)
+        rows = [self.index[t] for t in _trigrams(word) if t in self.index]
+        if rows:
+            return self.vectors[rows].astype(np.float32).mean(axis=0)
+        return None
+
+    def encode(self, texts) -> np.ndarray:
+        out = np.zeros((len(texts), self.vectors.shape[1]), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vecs = [v for v in map(self._word_vector, _WORD.findall(text.lower())) if v is not None]
+            if vecs:
+                out[row] = np.mean(vecs, axis=0)
+        return _normalize(out)
+
+
+BACKENDS = {
+    "sentence-transformers": SentenceTransformerEmbedder,
+    "onnx": OnnxEmbedder,
+    "static": StaticEmbedder,
+}
+
+
+def get_embedder(kind: str = None, path: str = None) -> Embedder:
+    """Build the backend selected by SMARTFOOD_EMBEDDER / SMARTFOOD_EMBEDDER_PATH."""
+    kind = (kind or os.environ.get("SMARTFOOD_EMBEDDER", "sentence-transformers")).lower()
+    path = path or os.environ.get("SMARTFOOD_EMBEDDER_PATH")
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown embedder: {kind} (choose from {', '.join(BACKENDS)})")
+    logger.info("Loading %s embedder%s", kind, f" from {path}" if path else "")
+    if kind == "sentence-transformers":
+        return SentenceTransformerEmbedder(path or ST_MODEL_NAME)
+    return BACKENDS[kind](path) if path else BACKENDS[kind]()
+
+
+# ==============================================================
+# BUILD TOOLS
+# ==============================================================
+def export_onnx(out_dir: str, model_name: str = "sentence-transformers/" + ST_MODEL_NAME, quantize: bool = True):
+    """Export the transformer to ONNX and (by default) quantise weights to int8."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["green apple"], return_tensors="pt")
+    fp32 = os.path.join(out_dir, "model_fp32.onnx")
+    torch.onnx.export(
+        model, (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]), fp32,
+        input_names=["input_ids", "attention_mask", "token_type_ids"], output_names=["last_hidden_state"],
+        dynamic_axes={n: {0: "batch", 1: "seq"} for n in ("input_ids", "attention_mask", "token_type_ids",
+                                                           "last_hidden_state")},
+        opset_version=14,
+    )
+    final = os.path.join(out_dir, "model.onnx")
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32, final, weight_type=QuantType.QInt8)
+        os.remove(fp32)
+    else:
+        os.replace(fp32, final)
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, "tokenizer.json"))
+    return final
+
+
+def distill_static(out_path: str, vocab, teacher: Embedder = None, batch_size: int = 256):
+    """
+    Encode every vocabulary word with the teacher model; each character
+    trigram gets the mean vector of the words containing it.
+    """
+    teacher = teacher or get_embedder("sentence-transformers")
+    words = sorted({w for text in vocab for w in _WORD.findall(text.lower())})
+    vecs = np.concatenate([teacher.encode(words[i:i + batch_size]) for i in range(0, len(words), batch_size)])
+    sums, counts = {}, {}
+    for word, vec in zip(words, vecs):
+        for tri in set(_trigrams(word)):
+            sums[tri] = sums.get(tri, 0) + vec
+            counts[tri] = counts.get(tri, 0) + 1
+    tris = sorted(sums)
+    tri_vecs = np.array([sums[t] / counts[t] for t in tris], dtype=np.float32).reshape(len(tris), vecs.shape[1])
+    tokens = np.array(words + tris)
+    np.savez_compressed(out_path, tokens=tokens,
+                        vectors=np.concatenate([vecs, tri_vecs]).astype(np.float16))
+    return out_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Build embedding artifacts for semantic_mapper")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export-onnx", help="export all-MiniLM-L6-v2 to ONNX (int8)")
+    p.add_argument("out_dir")
+    p.add_argument("--no-quantize", action="store_true")
+    p = sub.add_parser("distill-static", help="distill a static word/trigram table from the full model")
+    p.add_argument("out_path")
+    p.add_argument("--vocab", required=True, help="text file, one food name per line")
+    args = ap.parse_args()
+
+    if args.cmd == "export-onnx":
+        print(export_onnx(args.out_dir, quantize=not args.no_quantize))
+    else:
+        with open(args.vocab, encoding="utf-8") as f:
+            print(distill_static(args.out_path, [line.strip() for line in f if line.strip()]))
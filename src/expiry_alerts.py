@@ -0,0 +1,386 @@
+"""
+Expiry alerts pushed from inside the API process, instead of clients
+polling /list_items_urgent.
+
+ExpiryScheduler keeps a min-heap of upcoming alert times, one entry per
+(item, threshold): an item expiring on day E fires at SMARTFOOD_ALERT_HOUR
+local time on E - d for each d in SMARTFOOD_ALERT_DAYS (default 3, 1, 0).
+The heap is filled once from an indexed range query (storage
+upcoming_expiries) and then kept current by db_manager write listeners, so
+each add/update/consume/delete costs O(log n). Superseded entries are not
+searched for; each tracked item carries a generation number and stale heap
+entries are skipped when they reach the top.
+
+Before an alert goes out the item is re-read, so one consumed, deleted or
+re-dated by another process is dropped (or rescheduled). The alert is then
+logged in storage (expiry_alerts) once per (item, threshold, expiry day):
+with several API workers, each running its own schedule, the first to log
+it wins and the log's id is the alert id, shared by all workers and stable
+across restarts. Each worker tails the log every SMARTFOOD_ALERT_POLL_S, so
+all alerts reach:
+  - GET /alerts/stream  Server-Sent Events, replaying missed alerts from
+                        Last-Event-ID while they are still in the history
+  - GET /alerts         recent alerts as JSON (?since=<id>)
+and only the worker that logged an alert sends it to:
+  - SMARTFOOD_ALERT_WEBHOOK, if set: one JSON POST per alert, retried
+
+An item written with a threshold already passed (added the day before it
+expires, or its expiry moved earlier) alerts immediately for the most urgent
+one. Thresholds that passed while the server was down are not replayed.
+
+Each schedule sees its own process's writes at once; writes from elsewhere
+(the CLI, other API workers) are picked up by the periodic resync
+(SMARTFOOD_ALERT_RESYNC_S), and meanwhile fire from the worker that made
+them. Set SMARTFOOD_ALERTS=0 to turn the scheduler off.
+"""
+import asyncio
+import collections
+import datetime as dt
+import functools
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+import urllib.request
+
+import db_manager
+from metrics import REGISTRY
+
+logger = logging.getLogger("smartfood.alerts")
+
+ENABLED = os.environ.get("SMARTFOOD_ALERTS", "1") != "0"
+ALERT_DAYS = tuple(sorted({int(d) for d in os.environ.get("SMARTFOOD_ALERT_DAYS", "3,1,0").split(",")},
+                          reverse=True))
+ALERT_HOUR = int(os.environ.get("SMARTFOOD_ALERT_HOUR", "8"))
+RESYNC_SECONDS = float(os.environ.get("SMARTFOOD_ALERT_RESYNC_S", "3600"))
+POLL_SECONDS = float(os.environ.get("SMARTFOOD_ALERT_POLL_S", "5"))
+WEBHOOK_URL = os.environ.get("SMARTFOOD_ALERT_WEBHOOK")
+
+HISTORY_SIZE = 500
+SUBSCRIBER_QUEUE = 100
+WEBHOOK_QUEUE = 1000
+WEBHOOK_ATTEMPTS = 3
+RESYNC_CHUNK = 5000
+
+ALERTS_SENT = REGISTRY.counter(
+    "smartfood_expiry_alerts_total", "Expiry alerts emitted, by channel", ("channel",))
+WEBHOOK_FAILURES = REGISTRY.counter(
+    "smartfood_expiry_webhook_failures_total", "Expiry alerts the webhook did not accept after retries")
+
+
+@functools.lru_cache(maxsize=4096)
+def _local_time(day: int, hour: int) -> float:
+    return dt.datetime.combine(dt.date.fromordinal(day), dt.time(hour)).timestamp()
+
+
+def fire_time(expiry_day: int, days_before: int, hour: int = ALERT_HOUR) -> float:
+    """Epoch seconds of the alert for an item expiring on `expiry_day` (a date ordinal)."""
+    return _local_time(expiry_day - days_before, hour)
+
+
+def _post_json(url, payload, timeout=5.0):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+
+
+class _Tracked:
+    __slots__ = ("gen", "name", "qty", "location", "expiry_on", "expiry_day")
+
+
+class ExpiryScheduler:
+    def __init__(self, store, days=ALERT_DAYS, hour: int = ALERT_HOUR, webhook_url: str = WEBHOOK_URL,
+                 resync_seconds: float = RESYNC_SECONDS, poll_seconds: float = POLL_SECONDS, clock=time.time):
+        self.store = store
+        self.days = tuple(sorted(set(days), reverse=True))
+        self.hour = hour
+        self.webhook_url = webhook_url
+        self.resync_seconds = resync_seconds
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+
+        self.heap = []    # (fire_at, item_id, days_before, gen)
+        self.items = {}   # item_id -> _Tracked
+        self.history = collections.deque(maxlen=HISTORY_SIZE)  # tail of the storage log
+        self.subscribers = set()
+        self._gen = itertools.count()
+        self._due = asyncio.Queue()  # (item_id, gen, days_before) awaiting a check and the log
+        self._poll = None
+        self._replay = None  # writes seen while a resync query is in flight
+        self._loop = None
+        self._wake = None
+        self._tasks = []
+        self._stopping = False
+        self._webhook_queue = None
+
+    # --------------------------------------------------------------
+    # lifecycle
+    # --------------------------------------------------------------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._poll = asyncio.Event()
+        db_manager.add_write_listener(self.on_write)
+        for alert_id, alert in await self.store.recent_alerts(0, HISTORY_SIZE):
+            self.history.append({"id": alert_id, **json.loads(alert)})
+        await self.resync()
+        self._tasks.append(asyncio.create_task(self._run()))
+        self._tasks.append(asyncio.create_task(self._publish()))
+        self._tasks.append(asyncio.create_task(self._tail()))
+        if self.webhook_url:
+            self._webhook_queue = asyncio.Queue(WEBHOOK_QUEUE)
+            self._tasks.append(asyncio.create_task(self._deliver()))
+        logger.info("expiry alerts: %d items scheduled, thresholds %s days, webhook %s",
+                    len(self.items), self.days, "on" if self.webhook_url else "off")
+
+    async def stop(self):
+        db_manager.remove_write_listener(self.on_write)
+        # wait_for() can swallow a cancel that lands as the wake-up fires, so the loop also checks a flag
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def resync(self):
+        """
+        Rebuild the schedule from storage (one range query on the expiry
+        index). The new heap is built aside, yielding to the event loop
+        every RESYNC_CHUNK rows, and swapped in at the end; writes that
+        arrive meanwhile are replayed on top of it.
+        """
+        self._replay = []
+        try:
+            rows = await self.store.upcoming_expiries(dt.date.today().toordinal())
+            items, heap = {}, []
+            now = self.clock()
+            for n, (iid, name, qty, location, expiry_on) in enumerate(rows, 1):
+                t = self._track(name, qty, location, expiry_on)
+                items[iid] = t
+                heap.extend(e for e in self._entries(iid, t) if e[0] > now)
+                if n % RESYNC_CHUNK == 0:
+                    await asyncio.sleep(0)
+            heapq.heapify(heap)
+        except BaseException:
+            self._replay = None
+            raise
+        replay, self._replay = self._replay, None
+        self.items, self.heap = items, heap
+        for write in replay:
+            self._apply(*write)
+        if self._wake is not None:
+            self._wake.set()
+
+    # --------------------------------------------------------------
+    # write path
+    # --------------------------------------------------------------
+    def on_write(self, op, item_id, fields):
+        """db_manager write listener; may be called from a storage worker thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._apply(op, item_id, fields)
+        else:
+            loop.call_soon_threadsafe(self._apply, op, item_id, fields)
+
+    def _apply(self, op, item_id, fields):
+        if self._replay is not None:
+            self._replay.append((op, item_id, fields))  # applied once the resync snapshot is in
+            return
+        if op == "delete":
+            self.items.pop(item_id, None)
+        elif op == "consume":
+            tracked = self.items.get(item_id)
+            if tracked is not None:
+                tracked.qty = fields.get("qty")
+                if tracked.qty is not None and tracked.qty <= 0:
+                    del self.items[item_id]
+        else:
+            self._upsert(item_id, fields, new_item=(op == "add"))
+        # superseded entries are dropped lazily; rebuild if they pile up
+        if len(self.heap) > 2 * len(self.items) * len(self.days) + 1024:
+            self.heap = [e for e in self.heap if self._live(e)]
+            heapq.heapify(self.heap)
+
+    def _track(self, name, qty, location, expiry_on):
+        t = _Tracked()
+        t.gen = next(self._gen)
+        t.name, t.qty, t.location, t.expiry_on = name, qty, location, expiry_on
+        t.expiry_day = dt.date.fromisoformat(expiry_on).toordinal()
+        return t
+
+    def _entries(self, item_id, t):
+        """Heap entries for every threshold, most distant first."""
+        return [(fire_time(t.expiry_day, d, self.hour), item_id, d, t.gen) for d in self.days]
+
+    def _upsert(self, item_id, fields, new_item=False):
+        old = self.items.pop(item_id, None)
+        expiry_on, qty = fields.get("expiry_on"), fields.get("qty")
+        if not expiry_on or (qty is not None and qty <= 0):
+            return
+        t = self.items[item_id] = self._track(fields.get("name"), qty, fields.get("location"), expiry_on)
+
+        now = self.clock()
+        passed = None
+        head = self.heap[0][0] if self.heap else None
+        for entry in self._entries(item_id, t):
+            if entry[0] > now:
+                heapq.heappush(self.heap, entry)
+            else:
+                passed = entry[2]
+        if self._wake is not None and self.heap and (head is None or self.heap[0][0] < head):
+            self._wake.set()  # new earliest entry: the run loop is sleeping until a later one
+        if passed is not None and (new_item or old is None or old.expiry_day != t.expiry_day):
+            self._emit(item_id, t, passed)
+
+    def _live(self, entry):
+        tracked = self.items.get(entry[1])
+        return tracked is not None and tracked.gen == entry[3]
+
+    # --------------------------------------------------------------
+    # firing
+    # --------------------------------------------------------------
+    async def _run(self):
+        next_resync = self.clock() + self.resync_seconds
+        while not self._stopping:
+            while self.heap and not self._live(self.heap[0]):
+                heapq.heappop(self.heap)
+            now = self.clock()
+            due = self.heap[0][0] if self.heap else float("inf")
+            if due <= now:
+                _, item_id, d, _ = heapq.heappop(self.heap)
+                self._emit(item_id, self.items[item_id], d)
+                continue
+            if next_resync <= now:
+                try:
+                    await self.resync()
+                except Exception:
+                    logger.exception("expiry alert resync failed")
+                next_resync = now + self.resync_seconds
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), min(due, next_resync) - now)
+            except asyncio.TimeoutError:
+                pass
+
+    def _emit(self, item_id, t, days_before):
+        # checked against storage and logged by _publish, off the write path
+        self._due.put_nowait((item_id, t.gen, days_before))
+
+    async def _publish(self):
+        while True:
+            item_id, gen, days_before = await self._due.get()
+            try:
+                await self._publish_one(item_id, gen, days_before)
+            except Exception:
+                logger.exception("expiry alert for item %s failed", item_id)
+
+    async def _publish_one(self, item_id, gen, days_before):
+        t = self.items.get(item_id)
+        if t is None or t.gen != gen:
+            return  # rewritten here since it fell due; the newer schedule decides
+        row = await self.store.get_item(item_id)
+        if self.items.get(item_id) is not t:
+            return
+        if row is None or (row[3] is not None and row[3] <= 0):
+            del self.items[item_id]  # consumed or deleted by another process
+            return
+        if row[7] != t.expiry_on:
+            # re-dated by another process: follow storage, which alerts if a threshold passed
+            self._upsert(item_id, {"name": row[1], "qty": row[3], "location": row[5], "expiry_on": row[7]})
+            return
+        days_left = t.expiry_day - dt.date.today().toordinal()
+        alert = {
+            "item_id": item_id,
+            "name": row[1],
+            "qty": row[3],
+            "location": row[5],
+            "expiry_on": t.expiry_on,
+            "days_left": days_left,
+            "threshold": days_before,
+            "status": "expired" if days_left < 0 else "expires_today" if days_left == 0 else "expiring",
+            "at": dt.datetime.now().isoformat(timespec="seconds"),
+        }
+        alert_id, new = await self.store.record_alert(item_id, days_before, t.expiry_day, json.dumps(alert))
+        if not new:
+            return  # another worker logged it first and sends the webhook
+        self._poll.set()
+        if self._webhook_queue is not None:
+            try:
+                self._webhook_queue.put_nowait({"id": alert_id, **alert})
+            except asyncio.QueueFull:
+                WEBHOOK_FAILURES.inc()
+
+    async def _tail(self):
+        """Deliver alerts logged by any worker to this process's history and subscribers."""
+        while True:
+            self._poll.clear()  # before reading, so an alert logged meanwhile wakes the next round
+            since = self.history[-1]["id"] if self.history else 0
+            try:
+                rows = await self.store.recent_alerts(since, HISTORY_SIZE)
+            except Exception:
+                logger.exception("reading the expiry alert log failed")
+                rows = []
+            for alert_id, body in rows:
+                alert = {"id": alert_id, **json.loads(body)}
+                self.history.append(alert)
+                ALERTS_SENT.inc(channel="history")
+                for queue in self.subscribers:
+                    if queue.full():  # slow reader: drop its oldest alert rather than block the scheduler
+                        queue.get_nowait()
+                    queue.put_nowait(alert)
+                    ALERTS_SENT.inc(channel="sse")
+            try:
+                await asyncio.wait_for(self._poll.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self):
+        while True:
+            alert = await self._webhook_queue.get()
+            for attempt in range(WEBHOOK_ATTEMPTS):
+                try:
+                    await asyncio.to_thread(_post_json, self.webhook_url, alert)
+                    ALERTS_SENT.inc(channel="webhook")
+                    break
+                except Exception as e:
+                    if attempt == WEBHOOK_ATTEMPTS - 1:
+                        WEBHOOK_FAILURES.inc()
+                        logger.warning("expiry webhook failed for alert %s: %s", alert["id"], e)
+                    else:
+                        await asyncio.sleep(2 ** attempt)
+
+    # --------------------------------------------------------------
+    # consumers
+    # --------------------------------------------------------------
+    def recent(self, since: int = 0):
+        return [a for a in self.history if a["id"] > since]
+
+    def subscribe(self, last_event_id: int = None) -> asyncio.Queue:
+        queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+        if last_event_id is not None:
+            for alert in self.recent(last_event_id)[-SUBSCRIBER_QUEUE:]:
+                queue.put_nowait(alert)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def upcoming(self, limit: int = 20):
+        """Next scheduled alerts (O(n); for inspection, not the hot path)."""
+        live = heapq.nsmallest(limit, (e for e in self.heap if self._live(e)))
+        return [{"item_id": iid, "name": self.items[iid].name, "expiry_on": self.items[iid].expiry_on,
+                 "threshold": d, "fires_at": dt.datetime.fromtimestamp(at).isoformat(timespec="seconds")}
+                for at, iid, d, _ in live]
@@ -0,0 +1,96 @@
+"""
+Image decoding and CNN input geometry, shared by the recognizer and the
+API's upload admission (no TensorFlow import here).
+
+open_image() decodes at the smallest resolution the operation needs: for
+JPEGs Pillow's draft mode scales in the DCT domain while decoding
+(1/2, 1/4, 1/8), so a 12 MP phone photo is never materialised at full
+size; other formats are reduced by an integer factor right after loading.
+Either way the result's shorter side lands in [min_side, 2 * min_side).
+"""
+import math
+from typing import Optional
+
+from PIL import Image
+
+INPUT_SIZE = 224  # EfficientNetB0 input
+TTA_SIZE = 256    # TTA crops of INPUT_SIZE are taken from a TTA_SIZE resize
+
+DETECT_SCALES = (0.5, 0.33)  # window side as a fraction of the shorter image side
+DETECT_STRIDE = 0.5          # window step as a fraction of the window side
+
+
+def min_side_for(op: str, scales=DETECT_SCALES) -> int:
+    """Shortest image side an operation needs ("single", "tta" or "detect")."""
+    if op == "detect":
+        return math.ceil(INPUT_SIZE / min(scales))
+    return TTA_SIZE if op == "tta" else INPUT_SIZE
+
+
+def work_size(w: int, h: int, min_side: int) -> tuple:
+    """Size open_image() decodes (w, h) to: shorter side min_side, never upscaled."""
+    scale = min(1.0, min_side / min(w, h))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def _positions(length, side, step):
+    last = length - side
+    pos = list(range(0, last + 1, step))
+    if pos[-1] != last:
+        pos.append(last)
+    return pos
+
+
+def windows(w, h, scales=DETECT_SCALES, stride=DETECT_STRIDE):
+    """Square sliding windows (x0, y0, x1, y1) at each scale, covering the image edge to edge."""
+    boxes = []
+    for scale in scales:
+        side = max(1, int(min(w, h) * scale))
+        step = max(1, int(side * stride))
+        boxes.extend((x, y, x + side, y + side)
+                     for y in _positions(h, side, step) for x in _positions(w, side, step))
+    return boxes
+
+
+def _stream(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        import io
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def probe(source) -> tuple:
+    """(width, height) from the header only; file-like sources are rewound."""
+    with Image.open(_stream(source)) as img:
+        size = img.size
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        source.seek(0)
+    return size
+
+
+def open_image(source, min_side: Optional[int] = None):
+    """
+    Decode bytes or a file object to RGB, downscaled so the shorter side is
+    about `min_side`. Returns (image, original_size).
+    """
+    img = Image.open(_stream(source))
+    original = img.size
+    if min_side and min(original) > min_side:
+        img.draft("RGB", work_size(*original, min_side))
+        factor = min(img.size) // min_side
+        if factor >= 2:
+            img = img.reduce(factor)
+    return img.convert("RGB"), original
+
+
+def estimate_bytes(w: int, h: int, op: str) -> int:
+    """Rough peak memory for one request: decoded RGB (plus a working copy) and the float32 batch."""
+    ww, wh = work_size(w, h, min_side_for(op))
+    decoded = ww * wh * 4 * 3 * 2  # open_image() may stop at up to 2x min_side per axis
+    per_view = INPUT_SIZE * INPUT_SIZE * 3 * (1 + 4)  # uint8 crop + float32 network input
+    if op == "detect":
+        views = len(windows(ww, wh))
+    else:
+        views = 8 if op == "tta" else 1
+    return decoded + views * per_view
@@ -0,0 +1,209 @@
+"""
+Dedicated inference process for multi-worker deployments.
+
+Model weights (shelf-life regressor, EfficientNet CNN) are loaded once, in this
+process. API workers started with SMARTFOOD_INFERENCE_ADDR set don't load any
+model; they forward /predict and /predict-image to this process over a local
+multiprocessing.connection socket (pickled tuples, so whoever can connect can
+run code in this process).
+
+    python src/inference_worker.py                  # listens on SMARTFOOD_INFERENCE_ADDR
+    SMARTFOOD_INFERENCE_ADDR=/run/user/1000/smartfood-inference.sock \\
+        gunicorn -c gunicorn_conf.py src.api_server:app
+
+Addresses: a filesystem path for a Unix socket (the default, created 0600 in
+$XDG_RUNTIME_DIR or the temp directory), or "host:port" for TCP.
+Connections are authenticated with SMARTFOOD_INFERENCE_KEY. Without it, a
+Unix-socket server writes a random key to "<socket>.key" (0600), which
+clients of the same user read; a TCP server refuses to start.
+"""
+import logging
+import os
+import secrets
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger("smartfood.inference")
+
+DEFAULT_ADDR = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), "smartfood-inference.sock")
+
+# Safe to send again after the connection dropped mid-request (they change no state)
+IDEMPOTENT_OPS = frozenset({"ping", "predict_shelf_life", "predict_shelf_life_batch", "recognize", "detect"})
+
+
+def parse_address(addr: str):
+    if addr.startswith("/") or addr.startswith("."):
+        return addr, "AF_UNIX"
+    host, _, port = addr.rpartition(":")
+    return (host or "127.0.0.1", int(port)), "AF_INET"
+
+
+def _key_path(address) -> str:
+    return address + ".key"
+
+
+def _authkey(address, family) -> bytes:
+    """SMARTFOOD_INFERENCE_KEY, or for a Unix socket the key its server generated."""
+    key = os.environ.get("SMARTFOOD_INFERENCE_KEY")
+    if key:
+        return key.encode()
+    if family != "AF_UNIX":
+        raise RuntimeError("SMARTFOOD_INFERENCE_KEY must be set for a TCP inference address")
+    with open(_key_path(address), "rb") as f:
+        return f.read()
+
+
+def _generate_key(address) -> bytes:
+    key = secrets.token_hex(32).encode()
+    path = _key_path(address)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+# ==============================================================
+# SERVER
+# ==============================================================
+def _handlers():
+    import model_registry
+    import shelf_life
+    import recognizer
+
+    return {
+        "ping": lambda: "pong",
+        "predict_shelf_life": shelf_life.predict_shelf_life,
+        "predict_shelf_life_batch": shelf_life.predict_shelf_life_batch,
+        "recognize": recognizer.recognize,
+        "detect": recognizer.detect,
+        "models": model_registry.admin,
+    }
+
+
+def _serve_connection(conn, handlers):
+    with conn:
+        while True:
+            try:
+                op, kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                conn.send(("ok", handlers[op](**kwargs)))
+            except Exception as e:
+                logger.exception("inference op %s failed", op)
+                conn.send(("error", (type(e).__name__, str(e))))
+
+
+def serve(addr: str = None):
+    """Load models, then serve requests; one thread per API-worker connection."""
+    addr = addr or os.environ.get("SMARTFOOD_INFERENCE_ADDR", DEFAULT_ADDR)
+    address, family = parse_address(addr)
+    if family == "AF_UNIX":
+        authkey = os.environ.get("SMARTFOOD_INFERENCE_KEY", "").encode() or _generate_key(address)
+        if os.path.exists(address):
+            os.unlink(address)
+    else:
+        authkey = _authkey(address, family)
+
+    handlers = _handlers()
+    import shelf_life
+    shelf_life.get_model()  # warm before accepting traffic
+
+    old_umask = os.umask(0o177)  # the socket file is created 0600: only this user can connect
+    try:
+        listener = Listener(address, family=family, authkey=authkey, backlog=64)
+    finally:
+        os.umask(old_umask)
+    with listener:
+        logger.info("Inference worker (pid %d) listening on %s", os.getpid(), addr)
+        print(f"READY {addr}", flush=True)
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_serve_connection, args=(conn, handlers), daemon=True).start()
+
+
+# ==============================================================
+# CLIENT (used inside API workers)
+# ==============================================================
+class InferenceError(RuntimeError):
+    """An operation failed inside the inference process; `kind` is the remote exception's class name."""
+
+    def __init__(self, message, kind="Exception"):
+        super().__init__(f"{kind}: {message}")
+        self.kind = kind
+
+
+class InferenceClient:
+    """Thread-safe pool of connections to the inference process."""
+
+    def __init__(self, addr: str = None, max_idle: int = 8):
+        self.addr = addr or os.environ.get("SMARTFOOD_INFERENCE_ADDR", DEFAULT_ADDR)
+        self.address, self.family = parse_address(self.addr)
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _acquire(self):
+        """(connection, pooled): pooled connections may have gone stale since their last use."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked: never share sockets with the parent
+                self._idle, self._pid = [], os.getpid()
+            if self._idle:
+                return self._idle.pop(), True
+        return Client(self.address, family=self.family, authkey=_authkey(self.address, self.family)), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle and self._pid == os.getpid():
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def call(self, op: str, **kwargs):
+        """
+        Run op remotely. A pooled connection that fails is retried once on a
+        new one (the inference process restarted) if the request can't have
+        run: the send failed, or op is in IDEMPOTENT_OPS. Otherwise, e.g. a
+        "models" reload cut off mid-request, the error is raised.
+        """
+        while True:
+            conn, pooled = self._acquire()
+            sent = False
+            try:
+                conn.send((op, kwargs))
+                sent = True
+                status, value = conn.recv()
+            except (EOFError, OSError):
+                conn.close()
+                if pooled and (not sent or op in IDEMPOTENT_OPS):
+                    continue  # stale pooled connection: the next one comes from the pool or is new
+                raise
+            self._release(conn)
+            if status == "error":
+                kind, message = value
+                raise InferenceError(message, kind)
+            return value
+
+    def predict_shelf_life(self, **kwargs) -> dict:
+        return self.call("predict_shelf_life", **kwargs)
+
+    def predict_shelf_life_batch(self, inputs: list) -> list:
+        return self.call("predict_shelf_life_batch", inputs=inputs)
+
+    def recognize(self, image_bytes: bytes, top_k: int = 1, tta: bool = False) -> dict:
+        return self.call("recognize", image_bytes=image_bytes, top_k=top_k, tta=tta)
+
+    def detect(self, image_bytes: bytes, min_confidence: float = 0.5) -> dict:
+        return self.call("detect", image_bytes=image_bytes, min_confidence=min_confidence)
+
+
+if __name__ == "__main__":
+    from metrics import setup_logging
+    setup_logging()
+    serve(sys.argv[1] if len(sys.argv) > 1 else None)
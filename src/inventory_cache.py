@@ -0,0 +1,297 @@
+"""
+In-process copy of the items table for the read paths of db_manager
+(list_items, list_items_with_days, iter_items, get_item, upcoming_expiries).
+
+One compact record per item (__slots__, the listing row kept as a ready
+tuple, repeated strings shared) plus secondary indexes:
+
+  by id        dict, in id order
+  by location  location -> set of ids
+  by expiry    sorted list of (expiry_day, id, record), undated items left out
+
+Coherence: triggers append every inserted/updated/deleted item id to the
+item_changes log (db_manager.SCHEMA), whichever connection or process
+writes. Before each read the cache asks its own connection for
+PRAGMA data_version, which changes only when another connection committed;
+if it did, the ids logged since the last sync are re-read by primary key.
+That covers this process's db_manager writes (each on its own connection)
+and external writers alike (other API workers, the CLI, sqlite3). A change
+touching more than RELOAD_FRACTION of the items falls back to a full
+reload, as does a log that no longer holds the entry of the last sync
+(pruned past it, or another database restored over this one).
+
+A table larger than SMARTFOOD_ITEM_CACHE_MAX rows is not cached; reads
+then go to SQLite as before. The row count is checked again once the
+database has changed and RETRY_SECONDS have passed, so the cache comes back
+when the table shrinks below the limit.
+"""
+import bisect
+import logging
+import operator
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import record_cache
+
+logger = logging.getLogger("smartfood.cache")
+
+ENABLED = os.environ.get("SMARTFOOD_ITEM_CACHE", "1") != "0"
+MAX_ITEMS = int(os.environ.get("SMARTFOOD_ITEM_CACHE_MAX", "200000"))
+RELOAD_FRACTION = 0.1
+RETRY_SECONDS = 60.0  # between row counts while the table is too big
+ID_CHUNK = 500
+
+COLUMNS = "id,name,qty,unit,category,location,purchased_on,expiry_on,source,notes,expiry_day"
+
+NOT_CACHED = object()  # get_item(): ask SQLite
+_LAST = float("inf")  # sorts after any id in (expiry_day, id) keys
+_second = operator.itemgetter(1)
+_key = operator.itemgetter(0, 1)
+
+# SQLite's NOCASE folds ASCII letters only
+_NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+class _Item:
+    """row: (id, name, qty, unit, category, location, purchased_on, expiry_on), as list_items() returns it."""
+
+    __slots__ = ("row", "source", "notes", "expiry_day")
+
+    def __init__(self, row, source, notes, expiry_day):
+        self.row = row
+        self.source = source
+        self.notes = notes
+        self.expiry_day = expiry_day
+
+
+def _item_id(item):
+    return item.row[0]
+
+
+class InventoryCache:
+    def __init__(self, db_path: str):
+        self.path = db_path
+        self.con = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.usable = True
+        self.closed = False
+        self.retry_at = 0.0  # monotonic time of the next size check while not usable
+        self.version = None
+        self.seq = 0  # last item_changes entry applied, and its item id (tells a restored log apart)
+        self.mark = None
+        self.items = {}
+        self.by_location = {}
+        self.by_expiry = []
+        self._strings = {}
+        self._ordered = True
+
+    def close(self):
+        with self.lock:
+            self.con.close()
+            self.usable = False
+            self.closed = True
+
+    # --- maintenance ---
+
+    def _clear(self):
+        self.items = {}
+        self.by_location = {}
+        self.by_expiry = []
+        self._strings = {}
+        self._ordered = True
+
+    def _put(self, r, bulk=False):
+        """Insert or replace one item from a COLUMNS row (bulk: by_expiry is sorted by the caller)."""
+        iid = r[0]
+        old = self.items.get(iid)
+        if old is not None:
+            self._unindex(iid, old)  # replaced in place below, keeping its position in id order
+        elif self.items and iid < next(reversed(self.items)):
+            self._ordered = False  # a reused id lands after larger ones; re-sorted on the next ordered read
+        s = self._strings
+        # name/notes are mostly unique; the rest repeat across items and are stored once
+        row = (iid, r[1], r[2], s.setdefault(r[3], r[3]), s.setdefault(r[4], r[4]), s.setdefault(r[5], r[5]),
+               s.setdefault(r[6], r[6]), s.setdefault(r[7], r[7]))
+        self.items[iid] = _Item(row, s.setdefault(r[8], r[8]), r[9], r[10])
+        self.by_location.setdefault(row[5], set()).add(iid)
+        if r[10] is not None:
+            entry = (r[10], iid, self.items[iid])
+            if bulk:
+                self.by_expiry.append(entry)
+            else:
+                bisect.insort(self.by_expiry, entry)
+
+    def _drop(self, iid):
+        item = self.items.pop(iid, None)
+        if item is not None:
+            self._unindex(iid, item)
+
+    def _unindex(self, iid, item):
+        self.by_location[item.row[5]].discard(iid)
+        if item.expiry_day is not None:
+            key = (item.expiry_day, iid)
+            i = bisect.bisect_left(self.by_expiry, key)  # (day, id) sorts just before (day, id, record)
+            if i < len(self.by_expiry) and self.by_expiry[i][:2] == key:
+                del self.by_expiry[i]
+
+    def _load(self):
+        """Full reload; runs inside a read transaction so seq and rows agree."""
+        count = self.con.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        if count > MAX_ITEMS:
+            if self.usable:
+                logger.info("items table has %d rows (> SMARTFOOD_ITEM_CACHE_MAX=%d); reads go to SQLite",
+                            count, MAX_ITEMS)
+            self.usable = False
+            self.retry_at = time.monotonic() + RETRY_SECONDS
+            self._clear()
+            return
+        if not self.usable:
+            logger.info("items table has %d rows; caching it again", count)
+            self.usable = True
+        self.seq, self.mark = self.con.execute(
+            "SELECT seq, item_id FROM item_changes ORDER BY seq DESC LIMIT 1").fetchone() or (0, None)
+        self._clear()
+        for r in self.con.execute(f"SELECT {COLUMNS} FROM items ORDER BY id"):
+            self._put(r, bulk=True)
+        self.by_expiry.sort(key=_key)
+
+    def _reload_ids(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), ID_CHUNK):
+            chunk = ids[i:i + ID_CHUNK]
+            found = set()
+            for r in self.con.execute(f"SELECT {COLUMNS} FROM items WHERE id IN ({','.join('?' * len(chunk))})",
+                                      chunk):
+                self._put(r)
+                found.add(r[0])
+            for iid in chunk:
+                if iid not in found:
+                    self._drop(iid)
+
+    def _sync(self) -> bool:
+        """Bring the cache up to date with the database; False if it can't serve reads."""
+        if not self.usable and (self.closed or time.monotonic() < self.retry_at):
+            return False
+        version = self.con.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.version:
+            if not self.usable:
+                self.retry_at = time.monotonic() + RETRY_SECONDS  # nothing written, the count still stands
+                return False
+            record_cache("inventory", True)
+            return True
+        record_cache("inventory", False)
+        self.con.execute("BEGIN")
+        try:
+            if self.version is None or not self.usable:
+                self._load()
+            else:
+                top = self.con.execute("SELECT MAX(seq) FROM item_changes").fetchone()[0] or 0
+                if self.seq:
+                    at = self.con.execute("SELECT item_id FROM item_changes WHERE seq = ?", (self.seq,)).fetchone()
+                    lost = at is None or at[0] != self.mark
+                else:
+                    lost = top > 0 and self.con.execute("SELECT MIN(seq) FROM item_changes").fetchone()[0] > 1
+                if lost:
+                    self._load()  # log pruned past our position, or another database restored over this one
+                elif top > self.seq:
+                    changes = self.con.execute("SELECT seq, item_id FROM item_changes WHERE seq > ? ORDER BY seq",
+                                               (self.seq,)).fetchall()
+                    ids = {item_id for _, item_id in changes}
+                    if len(ids) > max(ID_CHUNK, RELOAD_FRACTION * len(self.items)):
+                        self._load()
+                    else:
+                        self._reload_ids(ids)
+                        self.seq, self.mark = changes[-1]
+        finally:
+            self.con.execute("COMMIT")
+        self.version = version
+        return self.usable
+
+    def _id_order(self):
+        if not self._ordered:
+            self.items = {iid: self.items[iid] for iid in sorted(self.items)}
+            self._ordered = True
+        return self.items.values()
+
+    # --- reads (None / NOT_CACHED: the caller queries SQLite instead) ---
+
+    def list_items(self):
+        with self.lock:
+            if not self._sync():
+                return None
+            return [item.row for item in self._id_order()]
+
+    def list_items_with_days(self, today: int, within_days=None, by_expiry: bool = False):
+        with self.lock:
+            if not self._sync():
+                return None
+            if within_days is not None:
+                dated = self.by_expiry[:bisect.bisect_right(self.by_expiry, (today + within_days, _LAST))]
+                if not by_expiry:
+                    dated.sort(key=_second)
+                return [item.row + (day - today,) for day, _, item in dated]
+            if not by_expiry:
+                return [item.row + (None if item.expiry_day is None else item.expiry_day - today,)
+                        for item in self._id_order()]
+            rows = [item.row + (day - today,) for day, _, item in self.by_expiry]
+            rows.extend(item.row + (None,) for item in self._id_order() if item.expiry_day is None)
+            return rows
+
+    def iter_rows(self, today: int, sort: str, location=None, category=None, within_days=None):
+        """All rows iter_items() would yield, as a list."""
+        with self.lock:
+            if not self._sync():
+                return None
+            items = self.items
+            location = location.title() if location else None
+            if within_days is not None:
+                end = bisect.bisect_right(self.by_expiry, (today + within_days, _LAST))
+                selected = [item for _, _, item in self.by_expiry[:end]]
+                if sort != "expiry":
+                    selected.sort(key=_item_id)
+            elif sort == "expiry":
+                selected = [item for _, _, item in self.by_expiry]
+                selected.extend(item for item in self._id_order() if item.expiry_day is None)
+            elif location:
+                selected = [items[iid] for iid in sorted(self.by_location.get(location, ()))]
+                location = None  # already applied
+            else:
+                selected = list(self._id_order())
+            if location:
+                selected = [item for item in selected if item.row[5] == location]
+            if category:
+                folded = category.translate(_NOCASE)
+                selected = [item for item in selected
+                            if item.row[4] is not None and item.row[4].translate(_NOCASE) == folded]
+            rows = [item.row + (None if item.expiry_day is None else item.expiry_day - today,)
+                    for item in selected]
+        if sort == "name":
+            rows.sort(key=lambda r: (r[1], r[0]))
+        return rows
+
+    def get_item(self, item_id):
+        """(id, name, category, qty, unit, location, purchased_on, expiry_on, source, notes), None if
+        there is no such item, or NOT_CACHED."""
+        if not isinstance(item_id, int):
+            return NOT_CACHED  # SQLite's type affinity decides what "5" or 5.0 match
+        with self.lock:
+            if not self._sync():
+                return NOT_CACHED
+            item = self.items.get(item_id)
+            if item is None:
+                return None
+            iid, name, qty, unit, category, location, purchased_on, expiry_on = item.row
+            return (iid, name, category, qty, unit, location, purchased_on, expiry_on, item.source, item.notes)
+
+    def upcoming_expiries(self, from_day: int):
+        with self.lock:
+            if not self._sync():
+                return None
+            out = []
+            for _, _, item in self.by_expiry[bisect.bisect_left(self.by_expiry, (from_day,)):]:
+                iid, name, qty, _unit, _category, location, _purchased_on, expiry_on = item.row
+                if qty is None or qty > 0:
+                    out.append((iid, name, qty, location, expiry_on))
+            return out
@@ -0,0 +1,201 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+No external dependency: counters and histograms are plain dicts guarded by
+a lock, rendered on demand by the /metrics endpoint.
+
+    from metrics import timed, INFERENCE_TIME
+
+    with timed(INFERENCE_TIME, model="cnn"):
+        preds = model.predict(batch)
+
+    @timed(DB_QUERY_TIME, function="list_items")
+    def list_items(): ...
+"""
+import bisect
+import functools
+import logging
+import os
+import random
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if idx < len(self.buckets):
+                state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, state):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, ('le', '+Inf'))} {state[-1]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._metrics.setdefault(name, Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        lines.extend(_render_cache_ratios())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "smartfood_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "smartfood_http_request_duration_seconds", "HTTP request latency by route", ("route", "method"))
+INFERENCE_TIME = REGISTRY.histogram(
+    "smartfood_model_inference_seconds", "Model inference time by model", ("model",))
+DB_QUERY_TIME = REGISTRY.histogram(
+    "smartfood_db_query_seconds", "SQLite time per db_manager function", ("function",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "smartfood_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+
+
+def _render_cache_ratios():
+    totals = {}
+    with CACHE_REQUESTS._lock:
+        for (cache, result), n in CACHE_REQUESTS._values.items():
+            hits, total = totals.get(cache, (0.0, 0.0))
+            totals[cache] = (hits + (n if result == "hit" else 0), total + n)
+    if not totals:
+        return []
+    lines = ["# HELP smartfood_cache_hit_ratio Cache hit ratio since start",
+             "# TYPE smartfood_cache_hit_ratio gauge"]
+    for cache, (hits, total) in sorted(totals.items()):
+        lines.append(f'smartfood_cache_hit_ratio{{cache="{cache}"}} {hits / total if total else 0.0}')
+    return lines
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class timed:
+    """Observe elapsed seconds into `histogram`; works as a context manager or decorator."""
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, fn):
+        histogram, labels = self.histogram, self.labels
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+
+
+# ==============================================================
+# LOGGING
+# ==============================================================
+LOG_SAMPLE_RATE = float(os.environ.get("SMARTFOOD_LOG_SAMPLE", "0.01"))
+
+
+def setup_logging():
+    logging.basicConfig(
+        level=os.environ.get("SMARTFOOD_LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def log_sampled(logger, level, msg, *args, rate=None):
+    """
+    Log for a sampled fraction of calls (SMARTFOOD_LOG_SAMPLE, default 1%).
+    Returns before formatting anything when the level is disabled.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if random.random() >= (LOG_SAMPLE_RATE if rate is None else rate):
+        return
+    logger.log(level, msg, *args)
@@ -0,0 +1,278 @@
+"""
+Versioned model registry: discovery, background warm-up, atomic swaps and
+shadow comparison.
+
+Artifacts live in SMARTFOOD_MODELS_DIR (default models/) and are matched by
+stem case-insensitively, with an optional version suffix:
+
+    SmartFoodAI_ShelfLife_Model.pkl        version 0
+    SmartFoodAI_ShelfLife_Model_v3.pkl     version 3   (".v3" and "-v3" work too)
+
+Each model gets a ModelSlot. Request code calls slot.get() once and uses that
+object until it is done, so swapping versions never interrupts work in flight;
+the old version is freed when its last user lets go.
+
+    slot.reload()                          # newest version: load + validate in a thread, then swap
+    slot.reload(version=3, shadow=True)    # warm v3 as a shadow; live calls are mirrored to it
+    slot.promote()                         # shadow becomes active
+    slot.rollback()                        # previous active version comes back
+
+Shadow calls run on a single background thread after the primary result is
+returned; the divergence between the two results is recorded in
+smartfood_model_shadow_divergence. When that thread falls behind, mirrored
+calls are dropped rather than queued.
+"""
+import concurrent.futures
+import logging
+import os
+import re
+import threading
+import time
+
+from metrics import REGISTRY
+
+logger = logging.getLogger("smartfood.models")
+
+MODELS_DIR = os.environ.get("SMARTFOOD_MODELS_DIR", "models")
+SHADOW_MAX_PENDING = 64
+
+MODEL_RELOADS = REGISTRY.counter(
+    "smartfood_model_reloads_total", "Model reloads by model and outcome", ("model", "result"))
+SHADOW_CALLS = REGISTRY.counter(
+    "smartfood_model_shadow_calls_total", "Mirrored shadow-model calls by outcome", ("model", "result"))
+SHADOW_DIVERGENCE = REGISTRY.histogram(
+    "smartfood_model_shadow_divergence", "Difference between shadow and active model results", ("model",),
+    buckets=(0.001, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0))
+
+
+def discover(stem: str, ext: str, directory: str = None) -> list:
+    """Return [(version, path)] for artifacts named stem[_vN]ext, oldest first."""
+    directory = directory or MODELS_DIR
+    pattern = re.compile(rf"^{re.escape(stem)}(?:[._-]v(\d+))?{re.escape(ext)}$", re.IGNORECASE)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        m = pattern.match(name)
+        if m:
+            found.append((int(m.group(1) or 0), os.path.join(directory, name)))
+    return sorted(found)
+
+
+class ModelVersion:
+    __slots__ = ("version", "path", "model", "loaded_at")
+
+    def __init__(self, version, path, model):
+        self.version = version
+        self.path = path
+        self.model = model
+        self.loaded_at = time.time()
+
+    def describe(self) -> dict:
+        return {"version": self.version, "path": self.path, "loaded_at": self.loaded_at}
+
+
+_shadow_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="smartfood-shadow")
+_shadow_slots = threading.BoundedSemaphore(SHADOW_MAX_PENDING)
+
+
+class ModelSlot:
+    """
+    One named model. `loader(path)` loads an artifact, `validate(model)` raises
+    if it is unusable, `compare(active_result, shadow_result)` returns a
+    non-negative divergence for shadow mode.
+    """
+
+    def __init__(self, name, stem, ext, loader, validate=None, compare=None):
+        self.name = name
+        self.stem = stem
+        self.ext = ext
+        self.loader = loader
+        self.validate = validate
+        self.compare = compare
+        self.active = None
+        self.shadow = None
+        self.previous = None
+        self.state = "idle"
+        self.last_error = None
+        self._load_attempted = False
+        self._swap_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    # ---- serving ----
+    def get(self):
+        """The active model object (loading it on first use), or None."""
+        active = self.active
+        if active is None and not self._load_attempted:
+            self.ensure_loaded()
+            active = self.active
+        return active.model if active is not None else None
+
+    def ensure_loaded(self):
+        with self._load_lock:
+            if self.active is None and not self._load_attempted:
+                try:
+                    self._install(self._load(None), shadow=False)
+                except Exception as e:
+                    logger.exception("ERROR while loading model %s", self.name)
+                    self.last_error = f"{type(e).__name__}: {e}"
+                self._load_attempted = True
+
+    def set(self, model, version="external"):
+        """Install an already-loaded model as active (benchmarks and tooling)."""
+        self._install(ModelVersion(version, None, model), shadow=False)
+        self._load_attempted = True
+
+    def mirror(self, fn, active_result, batch: bool = False):
+        """
+        Run fn(shadow_model) in the background and record its divergence from
+        active_result. With batch=True both results are lists and each item's
+        divergence is recorded.
+        """
+        shadow = self.shadow
+        if shadow is None or self.compare is None:
+            return
+        if not _shadow_slots.acquire(blocking=False):
+            SHADOW_CALLS.inc(model=self.name, result="dropped")
+            return
+        _shadow_pool.submit(self._run_shadow, shadow, fn, active_result, batch)
+
+    def _run_shadow(self, shadow, fn, active_result, batch):
+        try:
+            result = fn(shadow.model)
+            for a, s in zip(active_result, result) if batch else [(active_result, result)]:
+                SHADOW_DIVERGENCE.observe(self.compare(a, s), model=self.name)
+            SHADOW_CALLS.inc(model=self.name, result="ok")
+        except Exception:
+            logger.exception("shadow %s v%s failed", self.name, shadow.version)
+            SHADOW_CALLS.inc(model=self.name, result="error")
+        finally:
+            _shadow_slots.release()
+
+    # ---- versions ----
+    def available(self) -> list:
+        return discover(self.stem, self.ext)
+
+    def _load(self, version) -> ModelVersion:
+        versions = self.available()
+        if version is not None:
+            matches = [path for v, path in versions if v == version]
+            if not matches:
+                raise LookupError(f"{self.name} has no version {version} in {MODELS_DIR}")
+            version, path = version, matches[0]
+        elif versions:
+            version, path = versions[-1]
+        else:
+            # nothing discovered: let the loader report the missing file
+            version, path = 0, os.path.join(MODELS_DIR, self.stem + self.ext)
+        logger.info("Loading %s v%s from %s", self.name, version, path)
+        start = time.perf_counter()
+        model = self.loader(path)
+        if self.validate is not None:
+            self.validate(model)
+        logger.info("%s v%s ready in %.2fs", self.name, version, time.perf_counter() - start)
+        return ModelVersion(version, path, model)
+
+    def _install(self, loaded: ModelVersion, shadow: bool):
+        with self._swap_lock:
+            if shadow:
+                self.shadow = loaded
+            else:
+                self.previous, self.active = self.active, loaded
+
+    def reload(self, version: int = None, shadow: bool = False, wait: bool = False) -> dict:
+        """Load and validate a version in a background thread, then swap it in (or install it as shadow)."""
+        if version is not None and version not in {v for v, _ in self.available()}:
+            raise LookupError(f"{self.name} has no version {version} in {MODELS_DIR}")
+        if not self._load_lock.acquire(blocking=False):
+            raise RuntimeError(f"{self.name}: a reload is already in progress")
+        self.state = "loading"
+        thread = threading.Thread(target=self._reload, args=(version, shadow),
+                                  name=f"smartfood-reload-{self.name}", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return self.status()
+
+    def _reload(self, version, shadow):
+        try:
+            loaded = self._load(version)
+        except Exception as e:
+            logger.exception("Reload of %s failed; keeping the current version", self.name)
+            self.state, self.last_error = "failed", f"{type(e).__name__}: {e}"
+            MODEL_RELOADS.inc(model=self.name, result="failed")
+        else:
+            self._install(loaded, shadow)
+            self.state, self.last_error = "idle", None
+            MODEL_RELOADS.inc(model=self.name, result="shadow" if shadow else "swapped")
+        finally:
+            self._load_attempted = True
+            self._load_lock.release()
+
+    def promote(self) -> dict:
+        with self._swap_lock:
+            if self.shadow is None:
+                raise LookupError(f"{self.name} has no shadow model to promote")
+            self.previous, self.active, self.shadow = self.active, self.shadow, None
+        MODEL_RELOADS.inc(model=self.name, result="promoted")
+        return self.status()
+
+    def rollback(self) -> dict:
+        with self._swap_lock:
+            if self.previous is None:
+                raise LookupError(f"{self.name} has no previous version")
+            self.active, self.previous = self.previous, self.active
+        MODEL_RELOADS.inc(model=self.name, result="rolled_back")
+        return self.status()
+
+    def drop_shadow(self) -> dict:
+        with self._swap_lock:
+            self.shadow = None
+        return self.status()
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "last_error": self.last_error,
+            "active": self.active.describe() if self.active else None,
+            "shadow": self.shadow.describe() if self.shadow else None,
+            "previous": self.previous.describe() if self.previous else None,
+            "available": [{"version": v, "path": p} for v, p in self.available()],
+        }
+
+
+_slots = {}
+
+
+def register(name, stem, ext, loader, validate=None, compare=None) -> ModelSlot:
+    return _slots.setdefault(name, ModelSlot(name, stem, ext, loader, validate, compare))
+
+
+def get_slot(name: str) -> ModelSlot:
+    try:
+        return _slots[name]
+    except KeyError:
+        raise LookupError(f"Unknown model: {name}") from None
+
+
+def admin(action: str, name: str = None, version: int = None, shadow: bool = False) -> dict:
+    """
+    Entry point for the /admin/models endpoints (and the inference worker).
+    Raises LookupError for unknown models/versions, RuntimeError if a reload
+    is already running.
+    """
+    if action == "status":
+        return {n: slot.status() for n, slot in sorted(_slots.items())}
+    slot = get_slot(name)
+    if action == "reload":
+        return slot.reload(version=version, shadow=shadow)
+    if action == "promote":
+        return slot.promote()
+    if action == "rollback":
+        return slot.rollback()
+    if action == "drop_shadow":
+        return slot.drop_shadow()
+    raise ValueError(f"Unknown action: {action}")
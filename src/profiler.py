@@ -0,0 +1,179 @@
+"""
+Opt-in sampling profiler for the API server.
+
+A background thread snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval, but only while profiling is
+"active": either a profiled request is in flight (sampled fraction or a
+chosen route) or an admin started a capture-everything session.
+
+Output is flamegraph-compatible:
+  - collapsed stacks ("frame;frame;frame count"), for flamegraph.pl / speedscope
+  - speedscope JSON (https://www.speedscope.app)
+
+Samples are per process, not per request: while a profiled request runs,
+concurrent requests on other threads are sampled too. Threads parked in
+idle waits (thread-pool queues, the event loop selector) are skipped.
+"""
+import collections
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Optional
+
+# leaf frames that mean "this thread is idle"
+_IDLE_LEAVES = {("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get"),
+                ("thread.py", "_worker")}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self._active = 0                 # profiled requests in flight
+        self._capture_all = False        # admin "profile everything" session
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ---- lifecycle ----
+    def start(self, capture_all: bool = False):
+        with self._lock:
+            self._capture_all = capture_all
+            if capture_all:
+                self._wake.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self.started_at = time.time()
+                self._thread = threading.Thread(target=self._run, name="smartfood-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._capture_all = False
+            self._stop.set()
+            self._wake.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=1.0)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.sample_count = 0
+
+    # ---- request scoping ----
+    def enter(self):
+        with self._lock:
+            self._active += 1
+            self._wake.set()
+
+    def exit(self):
+        with self._lock:
+            self._active = max(0, self._active - 1)
+            if not self._active and not self._capture_all:
+                self._wake.clear()
+
+    # ---- sampling ----
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                break
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            frames = sys._current_frames()
+            stacks = []
+            for tid, frame in frames.items():
+                if tid == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(tid, f"thread-{tid}"))
+                stacks.append(";".join(reversed(stack)))
+            del frames
+            with self._lock:
+                self.samples.update(stacks)
+                self.sample_count += 1
+            time.sleep(self.interval)
+
+    # ---- export ----
+    def collapsed(self) -> str:
+        with self._lock:
+            items = sorted(self.samples.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def speedscope(self, name: str = "SmartFoodAI API") -> dict:
+        frame_index, frames = {}, []
+        samples, weights = [], []
+        with self._lock:
+            items = list(self.samples.items())
+        for stack, count in items:
+            idxs = []
+            for label in stack.split(";"):
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                idxs.append(frame_index[label])
+            samples.append(idxs)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "seconds",
+                "startValue": 0, "endValue": sum(weights),
+                "samples": samples, "weights": weights,
+            }],
+            "name": name,
+            "exporter": "smartfoodai-profiler",
+        }
+
+
+class RequestSelector:
+    """Decides which requests get profiled: a random fraction and/or one route template."""
+
+    def __init__(self, sample_rate: float = 0.0, route: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.route = route
+        self._route_re = re.compile("^" + re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(route)) + "$") if route else None
+
+    def wants(self, path: str) -> bool:
+        if self._route_re is not None and self._route_re.match(path):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+def default_selector() -> RequestSelector:
+    """The selector configured by SMARTFOOD_PROFILE_SAMPLE_RATE / SMARTFOOD_PROFILE_ROUTE."""
+    return RequestSelector(
+        sample_rate=float(os.environ.get("SMARTFOOD_PROFILE_SAMPLE_RATE", "0")),
+        route=os.environ.get("SMARTFOOD_PROFILE_ROUTE") or None,
+    )
+
+
+# module-level state used by api_server
+ENABLED = os.environ.get("SMARTFOOD_PROFILING", "0").lower() in ("1", "true", "yes")
+sampler = StackSampler(interval=float(os.environ.get("SMARTFOOD_PROFILE_INTERVAL_MS", "5")) / 1000)
+selector = default_selector()
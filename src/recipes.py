@@ -0,0 +1,321 @@
+"""
+"Use it up" recipe suggestions: recipes ranked by how much of what is about
+to expire they use, from a precomputed inverted index over their
+ingredients.
+
+An index is a directory built from a local recipe dataset (CSV, JSON or
+JSON lines with a title and an ingredient list):
+
+  tokens.txt      normalised ingredient words, row = token id
+  offsets.i64     postings of token t are postings[offsets[t]:offsets[t + 1]]
+  postings.i32    recipe ids, sorted within each token
+  sizes.i16       ingredient lines per recipe
+  recipes.jsonl   {"title", "ingredients"[, "url"]}, line = recipe id
+  lines.i64       byte offset of each line of recipes.jsonl
+  meta.json       counts and the source file
+
+Ingredient lines and item names go through the same normalisation
+(ingredient_tokens: lower case, quantities, units and preparation words
+dropped, plurals folded), so "2 cups chopped fresh spinach" and "Organic
+Spinach" both become ["spinach"]. An item matches the recipes whose
+ingredients contain all of its words (the intersection of their posting
+lists), or, if none do, its last word ("smoked salmon" -> "salmon").
+
+suggest() scores each recipe by the sum over the items it uses of
+1 / (1 + days_left), so something expiring today counts 1 and something with
+three days left 0.25; ties go to recipes with fewer ingredients. Only the
+posting lists of the items' words are read: a query costs in proportion to
+how many recipes use those ingredients, plus one pass over a score per
+recipe to pick the top k, never a scan of the recipes themselves.
+
+  python src/recipes.py build data/recipes recipes.csv
+  python src/recipes.py query data/recipes spinach:0 "chicken breast":2 -k 5
+  python src/recipes.py suggest --within 3
+"""
+import csv
+import json
+import logging
+import os
+import re
+import threading
+from array import array
+
+import numpy as np
+
+logger = logging.getLogger("smartfood.recipes")
+
+DEFAULT_DIR = os.environ.get("SMARTFOOD_RECIPES") or os.path.join(os.path.dirname(__file__), "..", "data", "recipes")
+TITLE_FIELDS = ("title", "name")
+
+_WORD = re.compile(r"[a-z]+")
+_PARENS = re.compile(r"\([^)]*\)")
+# quantities, units, preparation and shopping words: not what an ingredient is
+STOPWORDS = frozenset("""
+    a about an and any as at bag bags bottle bottles box bunch can cans chopped clove cloves coarsely crushed cube
+    cubed cubes cup cups cut dash diced drained each extra family few finely for fresh freshly frozen grated
+    gram grams halved handful into jar jars kg large lb lbs leftover level lightly litre liter loosely med
+    medium melted minced ml more of optional or organic ounce ounces oz package packages packed peeled
+    piece pieces pinch pint pinches plus pound pounds quart quartered rinsed roughly room serve serving sheet
+    sheets slice sliced slices small softened sprig sprigs stick sticks taste tbsp tbs teaspoon teaspoons
+    tablespoon tablespoons temperature thawed thick thin thinly the to trimmed tsp value whole with
+""".split())
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"  # berries
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]  # tomatoes, peaches
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def ingredient_tokens(text: str) -> list:
+    """Normalised ingredient words of an ingredient line or item name, in order, without repeats."""
+    words = (_singular(w) for w in _WORD.findall(_PARENS.sub(" ", (text or "").lower())) if len(w) > 1)
+    return list(dict.fromkeys(w for w in words if w not in STOPWORDS))
+
+
+def _intersect(small: np.ndarray, large: np.ndarray) -> np.ndarray:
+    """Sorted unique ids in both: a binary search of large per element of small, no merge sort."""
+    if not len(small) or not len(large):
+        return small[:0]
+    i = np.minimum(np.searchsorted(large, small), len(large) - 1)
+    return small[large[i] == small]
+
+
+def urgency(days_left) -> float:
+    """Weight of an item in suggest(): 1 expiring today, 1/2 tomorrow, ... 0 if expired or undated."""
+    if days_left is None or days_left < 0:
+        return 0.0
+    return 1.0 / (1 + days_left)
+
+
+# ==============================================================
+# DATASETS
+# ==============================================================
+def _ingredient_list(value) -> list:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    text = (value or "").strip()
+    if text.startswith("["):
+        return _ingredient_list(json.loads(text))  # RecipeNLG-style CSV: a JSON array in the cell
+    return [s.strip() for s in re.split(r"[;|\n]", text) if s.strip()]
+
+
+def read_dataset(path: str):
+    """Yield {"title", "ingredients"[, "url"]} from a .csv, .json (list) or .jsonl recipe file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        elif path.endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for r in rows:
+            title = next((r[k] for k in TITLE_FIELDS if r.get(k)), None)
+            ingredients = _ingredient_list(r.get("ingredients"))
+            if not title or not ingredients:
+                continue
+            recipe = {"title": title.strip(), "ingredients": ingredients}
+            if r.get("url"):
+                recipe["url"] = r["url"]
+            yield recipe
+
+
+# ==============================================================
+# INDEX
+# ==============================================================
+class RecipeIndex:
+    def __init__(self, path: str):
+        self.path = path
+        with open(self._file("meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(self._file("tokens.txt"), encoding="utf-8") as f:
+            self.tokens = {tok: i for i, tok in enumerate(f.read().splitlines())}
+        self.offsets = np.fromfile(self._file("offsets.i64"), dtype=np.int64)
+        # a plain ndarray view of the mapping: slicing a np.memmap costs more than the lookups themselves
+        self.postings = (np.memmap(self._file("postings.i32"), dtype=np.int32, mode="r").view(np.ndarray)
+                         if self.offsets[-1] else np.zeros(0, dtype=np.int32))
+        self.sizes = np.fromfile(self._file("sizes.i16"), dtype=np.int16)
+        self.lines = np.fromfile(self._file("lines.i64"), dtype=np.int64)
+        if len(self.sizes) != self.meta["count"] or len(self.tokens) + 1 != len(self.offsets):
+            raise ValueError(f"{path}: index files disagree with meta.json; rebuild it")
+        self._lock = threading.Lock()
+        self._recipes = open(self._file("recipes.jsonl"), "rb")
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def close(self):
+        self._recipes.close()
+
+    def posting(self, token: str) -> np.ndarray:
+        t = self.tokens.get(token)
+        if t is None:
+            return self.postings[:0]
+        return self.postings[self.offsets[t]:self.offsets[t + 1]]
+
+    def matches(self, tokens) -> np.ndarray:
+        """Sorted ids of the recipes using an item with these ingredient_tokens()."""
+        if not tokens:
+            return self.postings[:0]
+        lists = sorted((self.posting(t) for t in tokens), key=len)
+        out = lists[0]
+        for p in lists[1:]:
+            if not len(out):
+                break
+            out = _intersect(out, p)
+        if not len(out) and len(tokens) > 1:
+            return self.posting(tokens[-1])  # the head noun alone: "smoked salmon" -> salmon
+        return out
+
+    def recipe(self, rid: int) -> dict:
+        with self._lock:
+            self._recipes.seek(int(self.lines[rid]))
+            return json.loads(self._recipes.readline())
+
+    def suggest(self, items, k: int = 10, require=()) -> list:
+        """
+        Top-k recipes for items, an iterable of (name, days_left): [{"id",
+        "title", "score", "uses", "ingredients", "url"?}], best first. Items
+        that are expired, undated or normalise to nothing are ignored; the same
+        ingredient twice counts once, at its most urgent. require: names every
+        suggested recipe must use as well (urgent or not).
+        """
+        weights, names = {}, {}
+        for name, days_left in items:
+            w = urgency(days_left)
+            key = tuple(ingredient_tokens(name))
+            if w <= 0 or not key:
+                continue
+            weights[key] = max(weights.get(key, 0.0), w)
+            names.setdefault(key, []).append(name)
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        used = []
+        for key, w in weights.items():
+            ids = self.matches(list(key))
+            if len(ids):
+                scores[ids] += w
+                used.append((names[key], ids))
+        for name in require:
+            allowed = np.zeros(len(self), dtype=bool)
+            allowed[self.matches(ingredient_tokens(name))] = True
+            scores[~allowed] = 0
+        # only the recipes scoring at least the k-th best (ties included) get sorted
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k] if len(scores) > k else 0
+        candidates = np.flatnonzero(scores >= kth) if kth > 0 else np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+        order = np.lexsort((self.sizes[candidates], -scores[candidates]))[:k]  # last key sorts first
+
+        out = []
+        for rid in candidates[order].tolist():
+            r = self.recipe(rid)
+            uses = [n for item_names, ids in used
+                    if (i := np.searchsorted(ids, rid)) < len(ids) and ids[i] == rid for n in item_names]
+            out.append({"id": rid, "title": r["title"], "score": round(float(scores[rid]), 4), "uses": uses,
+                        "ingredients": r["ingredients"], **({"url": r["url"]} if "url" in r else {})})
+        return out
+
+
+def build(path: str, recipes, source: str = None) -> RecipeIndex:
+    """Write a fresh index directory from recipe dicts (see read_dataset); overwrites an existing one."""
+    os.makedirs(path, exist_ok=True)
+    postings = {}
+    sizes, lines = array("h"), array("q")
+    with open(os.path.join(path, "recipes.jsonl"), "wb") as out:
+        for rid, r in enumerate(recipes):
+            lines.append(out.tell())
+            out.write(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n")
+            sizes.append(min(len(r["ingredients"]), 32767))
+            for tok in {t for line in r["ingredients"] for t in ingredient_tokens(line)}:
+                postings.setdefault(tok, array("i")).append(rid)  # ids arrive in order: lists stay sorted
+
+    tokens = sorted(postings)
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[t]) for t in tokens])
+    with open(os.path.join(path, "postings.i32"), "wb") as f:
+        for t in tokens:
+            f.write(np.asarray(postings[t], dtype=np.int32).tobytes())
+    offsets.tofile(os.path.join(path, "offsets.i64"))
+    np.asarray(sizes, dtype=np.int16).tofile(os.path.join(path, "sizes.i16"))
+    np.asarray(lines, dtype=np.int64).tofile(os.path.join(path, "lines.i64"))
+    with open(os.path.join(path, "tokens.txt"), "w", encoding="utf-8") as f:
+        f.write("".join(t + "\n" for t in tokens))
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": len(sizes), "tokens": len(tokens), "postings": int(offsets[-1]), "source": source},
+                  f, indent=2)
+    return RecipeIndex(path)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(path: str = None):
+    """The index at path (default SMARTFOOD_RECIPES or data/recipes), reopened after a rebuild; None if absent."""
+    global _index
+    path = path or DEFAULT_DIR
+    try:
+        built = os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _index_lock:
+        if _index is None or _index[0] != (path, built):
+            if _index is not None:
+                _index[1].close()
+            _index = ((path, built), RecipeIndex(path))
+            logger.info("recipe index %s: %d recipes, %d ingredient words", path, len(_index[1]),
+                        len(_index[1].tokens))
+        return _index[1]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    ap = argparse.ArgumentParser(description="Recipe suggestions for items about to expire")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build")
+    p.add_argument("path")
+    p.add_argument("dataset", help=".csv, .json or .jsonl with a title and ingredients per recipe")
+    p = sub.add_parser("query")
+    p.add_argument("path")
+    p.add_argument("items", nargs="+", help="name:days_left")
+    p.add_argument("-k", type=int, default=10)
+    p = sub.add_parser("suggest", help="for the urgent items of the inventory database")
+    p.add_argument("--path", default=None)
+    p.add_argument("--within", type=int, default=3, help="items expiring within this many days")
+    p.add_argument("-k", type=int, default=10)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        start = time.perf_counter()
+        index = build(args.path, read_dataset(args.dataset), source=os.path.abspath(args.dataset))
+        print(f"{len(index)} recipes, {len(index.tokens)} ingredient words in {args.path} "
+              f"({time.perf_counter() - start:.1f}s)")
+        raise SystemExit
+    if args.cmd == "query":
+        index = RecipeIndex(args.path)
+        items = [(name, float(days)) if name else (days, 0.0)  # no ":days": expiring today
+                 for name, _, days in (s.rpartition(":") for s in args.items)]
+    else:
+        import db_manager
+        db_manager.init_db()
+        index = get_index(args.path)
+        if index is None:
+            raise SystemExit(f"no recipe index in {args.path or DEFAULT_DIR}; build one first")
+        items = [(r[1], r[8]) for r in db_manager.list_items_with_days(within_days=args.within, by_expiry=True)
+                 if r[2] is None or r[2] > 0]
+    start = time.perf_counter()
+    found = index.suggest(items, k=args.k)
+    elapsed = time.perf_counter() - start
+    for s in found:
+        print(f"{s['score']:.3f}  {s['title']}  (uses {', '.join(s['uses'])}; {len(s['ingredients'])} ingredients)")
+    print(f"{len(found)} suggestions from {len(index)} recipes in {elapsed * 1e3:.2f} ms")
@@ -1,16 +1,16 @@
 import tensorflow as tf
 import numpy as np
-from tensorflow.keras.preprocessing import image
 from tensorflow.keras.applications.efficientnet import preprocess_input
 from PIL import Image
-import io
-import os
+import logging
 
-MODEL_PATH = os.path.join("models", "SmartFoodAI_ImageRecognition_Model.keras")
-print(f"[Recognizer] Loading CNN model from: {MODEL_PATH}")
+import model_registry
+from imaging import INPUT_SIZE, TTA_SIZE, DETECT_SCALES, min_side_for, open_image, windows
+from metrics import timed, INFERENCE_TIME
 
-model = tf.keras.models.load_model(MODEL_PATH)
-print("[Recognizer] Model loaded successfully!")
+logger = logging.getLogger("smartfood.recognizer")
+
+MODEL_STEM = "SmartFoodAI_ImageRecognition_Model"
 
 CLASS_NAMES = [
     'apple', 'banana', 'bell_pepper_green', 'bell_pepper_red',
@@ -18,26 +18,160 @@ CLASS_NAMES = [
     'orange', 'peach', 'potato', 'strawberry', 'tomato'
 ]
 
-def recognize(image_bytes):
+
+def _validate(cnn):
+    preds = np.asarray(cnn.predict(np.zeros((1, 224, 224, 3), dtype=np.float32), verbose=0))
+    if preds.shape != (1, len(CLASS_NAMES)) or not np.isfinite(preds).all():
+        raise ValueError(f"CNN output shape {preds.shape} doesn't match {len(CLASS_NAMES)} classes")
+
+
+def _divergence(active, shadow):
+    """1.0 when the shadow picks a different class, else the confidence gap."""
+    if active.get("class") != shadow.get("class"):
+        return 1.0
+    return abs(active["confidence"] - shadow["confidence"])
+
+
+MODEL = model_registry.register("cnn", MODEL_STEM, ".keras", tf.keras.models.load_model, _validate, _divergence)
+MODEL.ensure_loaded()  # at import, as before: a preloading server shares it with its workers
+
+def _views(img, tta):
+    """The network input(s) for one image: the resized frame, plus crops and flips with tta."""
+    base = img.resize((INPUT_SIZE, INPUT_SIZE))
+    if not tta:
+        return [base]
+    big = img.resize((TTA_SIZE, TTA_SIZE))
+    m, c = TTA_SIZE - INPUT_SIZE, (TTA_SIZE - INPUT_SIZE) // 2
+    crops = [big.crop((x, y, x + INPUT_SIZE, y + INPUT_SIZE)) for x, y in ((c, c), (0, 0), (m, 0), (0, m), (m, m))]
+    flips = [v.transpose(Image.FLIP_LEFT_RIGHT) for v in (base, crops[0])]
+    return [base, *crops, *flips]
+
+
+def recognize(image_bytes, top_k=1, tta=False):
     """
-    Takes raw uploaded file bytes (from FastAPI UploadFile)
+    Takes raw uploaded file bytes (or a file object, e.g. UploadFile.file)
     and returns prediction.
+
+    top_k > 1 adds the k most likely classes. tta=True classifies 8 views
+    (flips and crops) in a single batched forward pass and averages their
+    logits.
     """
     try:
         # Load image directly from bytes
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img = img.resize((224, 224))
+        img, _ = open_image(image_bytes, min_side_for("tta" if tta else "single"))
+        views = _views(img, tta)
+
+        batch = np.stack([np.asarray(v) for v in views])
+        batch = preprocess_input(batch)
+
+        cnn = MODEL.get()
+        if cnn is None:
+            return {"error": "Model not loaded"}
+        result = _classify(cnn, batch, top_k)
+        MODEL.mirror(lambda shadow: _classify(shadow, batch, top_k, label="cnn_shadow"), result)
+        return result
+
+    except Exception as e:
+        return {"error": str(e)}
+
 
-        img_array = np.array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array = preprocess_input(img_array)
+def _classify(cnn, batch, top_k=1, label="cnn"):
+    with timed(INFERENCE_TIME, model=label):
+        preds = np.asarray(cnn.predict(batch, verbose=0))
+    if len(preds) > 1:
+        # the softmax outputs are logits shifted by a per-view constant, so the
+        # mean log-probability renormalised is the softmax of the mean logits
+        logp = np.log(np.clip(preds, 1e-7, 1.0)).mean(axis=0)
+        probs = np.exp(logp - logp.max())
+        probs /= probs.sum()
+    else:
+        probs = preds[0]
+    idx = int(np.argmax(probs))
+    class_name = CLASS_NAMES[idx]
+    confidence = float(probs[idx])
 
-        preds = model.predict(img_array)
-        idx = int(np.argmax(preds))
-        class_name = CLASS_NAMES[idx]
-        confidence = float(np.max(preds))
+    result = {"class": class_name, "confidence": confidence}
+    if top_k > 1:
+        order = np.argsort(probs)[::-1][:top_k]
+        result["top_k"] = [{"class": CLASS_NAMES[i], "confidence": float(probs[i])} for i in order]
+    if len(preds) > 1:
+        result["views"] = len(preds)
+    return result
 
-        return {"class": class_name, "confidence": confidence}
+
+# ==============================================================
+# MULTI-ITEM DETECTION (tiled, one batched forward pass)
+# ==============================================================
+CLASS_CATEGORIES = {
+    'apple': 'fruit', 'banana': 'fruit', 'grape': 'fruit', 'lemon': 'fruit',
+    'orange': 'fruit', 'peach': 'fruit', 'strawberry': 'fruit',
+    'bell_pepper_green': 'vegetable', 'bell_pepper_red': 'vegetable', 'carrot': 'vegetable',
+    'cucumber': 'vegetable', 'onion': 'vegetable', 'potato': 'vegetable', 'tomato': 'vegetable',
+}
+
+
+def _merge(boxes, scores, classes, overlap):
+    """
+    Greedy per-class suppression. Overlap is intersection over the smaller
+    box, so a small window nested inside a larger one of the same class
+    (the same item seen at two scales) is merged too.
+    """
+    keep = []
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    for cls in np.unique(classes):
+        idx = np.flatnonzero(classes == cls)
+        idx = idx[np.argsort(-scores[idx])]
+        while idx.size:
+            best, rest = idx[0], idx[1:]
+            keep.append(best)
+            x0 = np.maximum(boxes[best, 0], boxes[rest, 0])
+            y0 = np.maximum(boxes[best, 1], boxes[rest, 1])
+            x1 = np.minimum(boxes[best, 2], boxes[rest, 2])
+            y1 = np.minimum(boxes[best, 3], boxes[rest, 3])
+            inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+            smaller = np.minimum(areas[best], areas[rest])
+            idx = rest[inter / smaller < overlap]
+    return sorted(keep, key=lambda i: -scores[i])
+
+
+def detect(image_bytes, min_confidence=0.5, overlap=0.5, scales=DETECT_SCALES):
+    """
+    Find several items in one photo (fridge shelf, grocery haul).
+
+    Square windows at a few scales are cropped from the image, classified
+    together in a single predict() call, and overlapping windows of the same
+    class are merged. Returns detections with bbox in original-image pixels.
+    """
+    try:
+        # decode at the resolution where the smallest window is INPUT_SIZE px
+        img, (w, h) = open_image(image_bytes, min_side_for("detect", scales))
+        shrink = img.width / w
+        boxes = windows(*img.size, scales=scales)
+
+        batch = np.empty((len(boxes), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+        for i, box in enumerate(boxes):
+            batch[i] = np.asarray(img.crop(box).resize((INPUT_SIZE, INPUT_SIZE)))
+        batch = preprocess_input(batch)
+
+        cnn = MODEL.get()
+        if cnn is None:
+            return {"error": "Model not loaded"}
+        with timed(INFERENCE_TIME, model="cnn_detect"):
+            preds = np.asarray(cnn.predict(batch, verbose=0))
+
+        scores, classes = preds.max(axis=1), preds.argmax(axis=1)
+        hits = np.flatnonzero(scores >= min_confidence)
+        found = np.asarray(boxes, dtype=np.float64)[hits] / shrink
+        keep = _merge(found, scores[hits], classes[hits], overlap)
+
+        detections = [{
+            "class": CLASS_NAMES[classes[hits[i]]],
+            "category": CLASS_CATEGORIES.get(CLASS_NAMES[classes[hits[i]]]),
+            "confidence": float(scores[hits[i]]),
+            "bbox": [int(round(v)) for v in found[i]],
+        } for i in keep]
+        return {"detections": detections, "tiles": len(boxes), "image_size": [w, h]}
 
     except Exception as e:
         return {"error": str(e)}
+
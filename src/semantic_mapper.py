@@ -1,29 +1,92 @@
+import logging
 import os
-os.environ["USE_TF"] = "0"
+import threading
 
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
 
-# Load once globally
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from embedders import get_embedder
+from metrics import timed, record_cache, INFERENCE_TIME
+
+logger = logging.getLogger("smartfood.semantic_mapper")
+
+# Load once globally (backend chosen by SMARTFOOD_EMBEDDER, see embedders.py)
+model = get_embedder()
+
+TAXONOMY_DIR = os.environ.get("SMARTFOOD_TAXONOMY_DIR", os.path.join("models", "taxonomy"))
 
 CATEGORIES = ["fruit", "vegetable", "meat", "fish", "dairy", "snack", "grain", "prepared food"]
 
+# category embeddings never change, so encode them once
+_CAT_EMBS = None
+
+def _category_embeddings():
+    global _CAT_EMBS
+    if _CAT_EMBS is not None:
+        record_cache("category_embeddings", True)
+        return _CAT_EMBS
+    record_cache("category_embeddings", False)
+    with timed(INFERENCE_TIME, model=model.name):
+        _CAT_EMBS = model.encode(CATEGORIES)
+    return _CAT_EMBS
+
 def get_closest_category(food_name: str):
     """Return the closest known category for a food item, with similarity score."""
     try:
-        # Encode both input and category list
-        item_emb = model.encode([food_name], convert_to_tensor=True)
-        cat_embs = model.encode(CATEGORIES, convert_to_tensor=True)
+        # Encode the input; category embeddings are cached
+        with timed(INFERENCE_TIME, model=model.name):
+            item_emb = model.encode([food_name])
+        cat_embs = _category_embeddings()
 
-        # Compute cosine similarity
-        sims = util.cos_sim(item_emb, cat_embs)[0]
+        # Cosine similarity (embeddings are L2-normalised)
+        sims = cat_embs @ item_emb[0]
 
         # Safely get best match
-        best_idx = int(sims.argmax())
+        best_idx = int(np.argmax(sims))
         best_category = CATEGORIES[best_idx]
         best_score = float(sims[best_idx])
         return best_category, best_score
 
     except Exception as e:
-        print(f"Warning: semantic mapping failed ({e}). Falling back to manual input.")
+        logger.warning("semantic mapping failed (%s). Falling back to manual input.", e)
         return None, 0.0
+
+
+# ==============================================================
+# FINE-GRAINED TAXONOMY (see taxonomy.py)
+# ==============================================================
+_taxonomy = None
+_taxonomy_lock = threading.Lock()
+
+def get_taxonomy(create: bool = False):
+    """The LabelIndex at SMARTFOOD_TAXONOMY_DIR, opened on first use; None if it doesn't exist."""
+    global _taxonomy
+    if _taxonomy is None:
+        with _taxonomy_lock:
+            if _taxonomy is None:
+                import taxonomy
+                if os.path.exists(os.path.join(TAXONOMY_DIR, "meta.json")):
+                    _taxonomy = taxonomy.LabelIndex(TAXONOMY_DIR)
+                    if _taxonomy.meta.get("embedder") not in (None, model.name):
+                        logger.warning("taxonomy %s was built with %s, querying with %s",
+                                       TAXONOMY_DIR, _taxonomy.meta["embedder"], model.name)
+                elif create:
+                    _taxonomy = taxonomy.build(TAXONOMY_DIR, [], model)
+    return _taxonomy
+
+def match_labels(food_name: str, k: int = 5):
+    """Top-k (label, score) from the fine-grained taxonomy; [] when none is installed."""
+    index = get_taxonomy()
+    if index is None:
+        return []
+    try:
+        with timed(INFERENCE_TIME, model=model.name):
+            item_emb = model.encode([food_name])
+        with timed(INFERENCE_TIME, model="taxonomy_index"):
+            return index.search(item_emb[0], k=k)
+    except Exception as e:
+        logger.warning("taxonomy lookup failed (%s)", e)
+        return []
+
+def add_labels(labels) -> int:
+    """Add labels to the taxonomy (created on first use) without rebuilding it."""
+    return get_taxonomy(create=True).add(labels, model)
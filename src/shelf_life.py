@@ -0,0 +1,152 @@
+"""
+Shelf-life prediction: joblib regressor + baseline calibration.
+
+Shared by the /predict endpoint and the CLI's in-process (local) client.
+The model and pandas are loaded lazily on first use, so importing this
+module is cheap. Versions are managed by model_registry (slot "shelf_life").
+"""
+import logging
+import math
+
+import model_registry
+from metrics import timed, INFERENCE_TIME
+
+logger = logging.getLogger("smartfood.shelf_life")
+
+MODEL_STEM = "SmartFoodAI_ShelfLife_Model"
+
+# Use baseline realistic reference values
+BASELINE_RULES = {
+    "fruit": {"fridge": 7, "freezer": 180, "pantry": 3},
+    "meat": {"fridge": 5, "freezer": 270, "pantry": 0.5},
+    "snack": {"fridge": 60, "freezer": 120, "pantry": 180},
+    "vegetable": {"fridge": 10, "freezer": 180, "pantry": 4},
+    "dairy": {"fridge": 14, "freezer": 90, "pantry": 2},
+    "grain": {"fridge": 60, "freezer": 180, "pantry": 365},
+    "beverage": {"fridge": 120, "freezer": 180, "pantry": 180},
+    "unknown": {"fridge": 10, "freezer": 60, "pantry": 30},
+}
+
+def _load(path):
+    import joblib
+    return joblib.load(path)
+
+
+def _validate(model):
+    """A usable regressor returns one finite log-ratio for a known-good row."""
+    import pandas as pd
+    probe = pd.DataFrame({"category": ["fruit"], "location": ["fridge"], "packaging": ["sealed"],
+                          "state": ["raw"], "temperature": [4.0]})
+    out = list(model.predict(probe))
+    if len(out) != 1 or not math.isfinite(float(out[0])):
+        raise ValueError(f"shelf-life model returned {out!r} for the probe row")
+
+
+def _divergence(active: dict, shadow: dict) -> float:
+    """Relative difference in predicted days."""
+    a, b = active["predicted_shelf_life_days"], shadow["predicted_shelf_life_days"]
+    return abs(a - b) / max(a, 0.1)
+
+
+MODEL = model_registry.register("shelf_life", MODEL_STEM, ".pkl", _load, _validate, _divergence)
+
+
+def get_model():
+    """The active regressor (loaded once on first use); None if it can't be loaded."""
+    return MODEL.get()
+
+
+def set_model(model):
+    """Install an already-loaded model (used by benchmarks and tooling)."""
+    MODEL.set(model)
+
+
+def predict_shelf_life(category: str, location: str, packaging: str, state: str, temperature: float) -> dict:
+    """Return the /predict response body for one item."""
+    model = get_model()
+    if model is None:
+        return {"error": "Model not loaded"}
+    result = _predict(model, category, location, packaging, state, temperature)
+    MODEL.mirror(lambda shadow: _predict(shadow, category, location, packaging, state, temperature,
+                                         label="shelf_life_shadow"), result)
+    return result
+
+
+def predict_shelf_life_batch(inputs: list) -> list:
+    """
+    /predict response bodies for many items with one model.predict() call.
+    inputs: dicts with category, location, packaging, state and temperature.
+    """
+    model = get_model()
+    if model is None:
+        return [{"error": "Model not loaded"} for _ in inputs]
+    if not inputs:
+        return []
+    results = _predict_batch(model, inputs)
+    MODEL.mirror(lambda shadow: _predict_batch(shadow, inputs, label="shelf_life_shadow"), results, batch=True)
+    return results
+
+
+def _predict_batch(model, inputs, label="shelf_life") -> list:
+    import numpy as np
+    import pandas as pd
+
+    data = {
+        "category": [i["category"].lower() for i in inputs],
+        "location": [i["location"].lower() for i in inputs],
+        "packaging": [i["packaging"].lower() for i in inputs],
+        "state": [i["state"].lower() for i in inputs],
+        "temperature": [float(i["temperature"]) for i in inputs],
+    }
+    with timed(INFERENCE_TIME, model=label):
+        ratio_log_pred = np.asarray(model.predict(pd.DataFrame(data)), dtype=np.float64)
+
+    # same transform and calibration as _predict(), per row
+    ratios = np.clip(np.exp(ratio_log_pred) + 0.7, 0.3, 3.0).tolist()
+    out = []
+    for i, ratio in enumerate(ratios):
+        row = {k: [v[i]] for k, v in data.items()}
+        baseline = BASELINE_RULES.get(row["category"][0], BASELINE_RULES["unknown"]).get(row["location"][0], 7)
+        out.append({
+            "predicted_shelf_life_days": max(round(baseline * ratio, 1), 0.1),
+            "baseline_days": baseline,
+            "calibrated_ratio": ratio,
+            "input_data": row,
+            "status": "success",
+        })
+    return out
+
+
+def _predict(model, category, location, packaging, state, temperature, label="shelf_life") -> dict:
+    import numpy as np
+    import pandas as pd
+
+    # Prepare input for prediction
+    data = {
+        "category": [category.lower()],
+        "location": [location.lower()],
+        "packaging": [packaging.lower()],
+        "state": [state.lower()],
+        "temperature": [temperature],
+    }
+    df = pd.DataFrame(data)
+
+    # Predict log ratio (as trained)
+    with timed(INFERENCE_TIME, model=label):
+        ratio_log_pred = model.predict(df)[0]
+
+    # Reverse the log transform and calibrate
+    ratio = max(0.3, min(3.0, float(np.exp(ratio_log_pred) + 0.7)))
+
+    baseline = BASELINE_RULES.get(category.lower(), BASELINE_RULES["unknown"]).get(location.lower(), 7)
+
+    predicted_days = round(baseline * ratio, 1)
+    predicted_days = max(predicted_days, 0.1)  # Avoid negative or zero days
+
+    return {
+        "predicted_shelf_life_days": predicted_days,
+        "baseline_days": baseline,
+        "calibrated_ratio": ratio,
+        "input_data": data,
+        "status": "success"
+    }
@@ -0,0 +1,693 @@
+"""
+Storage backends for the SmartFoodAI inventory.
+
+Every backend exposes the same operations as `db_manager`
+(add_item, add_items, add_item_rows, list_items, get_item, update_item, delete_item, consume_item,
+upcoming_expiries, rollups, calibration_table, iter_item_batches, search_items,
+record_alert, recent_alerts)
+and returns rows in the same tuple shapes:
+  list_items -> (id, name, qty, unit, category, location, purchased_on, expiry_on)
+  list_items_with_days -> list_items row + days_left
+  search_items -> (list of list_items_with_days rows, fuzzy)
+  get_item   -> (id, name, category, qty, unit, location, purchased_on, expiry_on, source, notes)
+
+Backends:
+  - SQLiteStorage     sync, wraps db_manager (the CLI uses this)
+  - ThreadedStorage   async adapter that runs a sync backend in worker threads,
+                      so FastAPI handlers never block the event loop
+  - PostgresStorage   async, pooled asyncpg connections
+
+Select the API backend with SMARTFOOD_STORAGE=sqlite|postgres
+(postgres reads its DSN from SMARTFOOD_PG_DSN).
+"""
+import asyncio
+import datetime as dt
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import calibration
+import db_manager
+from utils import normalize_date
+
+logger = logging.getLogger("smartfood.storage")
+
+
+class Storage(ABC):
+    """Synchronous storage interface."""
+
+    def init(self):
+        pass
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def add_item(self, name, category=None, qty=1, unit="", location="Fridge",
+                 purchased_on=None, expiry_on=None, source=None, notes=None, model_shelf_life_days=None):
+        """model_shelf_life_days: /predict's uncorrected prediction, if the expiry came from it."""
+
+    @abstractmethod
+    def add_items(self, items) -> list:
+        """Insert dicts keyed like add_item's arguments in one transaction; returns ids."""
+
+    @abstractmethod
+    def add_item_rows(self, batches) -> int:
+        """Insert lists of normalised ITEM_FIELDS tuples in one transaction; returns the row count."""
+
+    @abstractmethod
+    def list_items(self):
+        ...
+
+    @abstractmethod
+    def list_items_with_days(self, within_days: Optional[int] = None, by_expiry: bool = False):
+        ...
+
+    @abstractmethod
+    def search_items(self, q: str, limit: int = 20) -> tuple[list, bool]:
+        ...
+
+    @abstractmethod
+    def get_item(self, item_id):
+        ...
+
+    @abstractmethod
+    def update_item(self, item_id, name, category, qty, unit, location, purchased_on, expiry_on,
+                    source=None, notes=None):
+        ...
+
+    @abstractmethod
+    def delete_item(self, item_id, reason: Optional[str] = "wasted"):
+        """Delete; remaining qty is logged as a "wasted"/"consumed" item event (None: no event)."""
+
+    @abstractmethod
+    def consume_item(self, item_id: int, amount: float) -> tuple[bool, Optional[float]]:
+        ...
+
+    @abstractmethod
+    def upcoming_expiries(self, from_day: int):
+        """(id, name, qty, location, expiry_on) of unconsumed items expiring on/after day number from_day."""
+
+    @abstractmethod
+    def rollups(self, from_day: int, to_day: int):
+        """Daily consumed/wasted totals (db_manager.ROLLUP_COLUMNS) for a range of day numbers."""
+
+    @abstractmethod
+    def calibration_table(self, household: str):
+        """(category, location, log_ratio, n) shelf-life calibration rows (see calibration.py)."""
+
+    @abstractmethod
+    def record_alert(self, item_id: int, threshold: int, expiry_day: int, alert: str) -> tuple[int, bool]:
+        """Log an expiry alert once per key: (id, True) for the first caller, (id, False) after."""
+
+    @abstractmethod
+    def recent_alerts(self, since: int = 0, limit: int = 500):
+        """(id, alert JSON) of the newest `limit` expiry alerts with id > since, oldest first."""
+
+    @abstractmethod
+    def iter_item_batches(self, batch_size: int = 65536):
+        """Lists of db_manager.EXPORT_COLUMNS rows in id order, for streaming exports."""
+
+
+class AsyncStorage(ABC):
+    """Asynchronous storage interface (same operations, awaitable)."""
+
+    async def init(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def add_item(self, name, category=None, qty=1, unit="", location="Fridge",
+                       purchased_on=None, expiry_on=None, source=None, notes=None, model_shelf_life_days=None):
+        ...
+
+    @abstractmethod
+    async def add_items(self, items) -> list:
+        ...
+
+    @abstractmethod
+    async def add_item_rows(self, batches) -> int:
+        ...
+
+    @abstractmethod
+    async def list_items(self):
+        ...
+
+    @abstractmethod
+    async def list_items_with_days(self, within_days: Optional[int] = None, by_expiry: bool = False):
+        ...
+
+    @abstractmethod
+    async def search_items(self, q: str, limit: int = 20) -> tuple[list, bool]:
+        ...
+
+    @abstractmethod
+    async def get_item(self, item_id):
+        ...
+
+    @abstractmethod
+    async def update_item(self, item_id, name, category, qty, unit, location, purchased_on, expiry_on,
+                          source=None, notes=None):
+        ...
+
+    @abstractmethod
+    async def delete_item(self, item_id, reason: Optional[str] = "wasted"):
+        ...
+
+    @abstractmethod
+    async def consume_item(self, item_id: int, amount: float) -> tuple[bool, Optional[float]]:
+        ...
+
+    @abstractmethod
+    async def upcoming_expiries(self, from_day: int):
+        ...
+
+    @abstractmethod
+    async def rollups(self, from_day: int, to_day: int):
+        ...
+
+    @abstractmethod
+    async def calibration_table(self, household: str):
+        ...
+
+    @abstractmethod
+    async def record_alert(self, item_id: int, threshold: int, expiry_day: int, alert: str) -> tuple[int, bool]:
+        ...
+
+    @abstractmethod
+    async def recent_alerts(self, since: int = 0, limit: int = 500):
+        ...
+
+    @abstractmethod
+    def iter_item_batches(self, batch_size: int = 65536):
+        """Async iterator over lists of db_manager.EXPORT_COLUMNS rows."""
+
+
+# ==============================================================
+# SQLITE (sync)
+# ==============================================================
+class SQLiteStorage(Storage):
+    """The existing db_manager functions behind the Storage interface."""
+
+    def init(self):
+        db_manager.init_db()
+
+    def add_item(self, name, category=None, qty=1, unit="", location="Fridge",
+                 purchased_on=None, expiry_on=None, source=None, notes=None, model_shelf_life_days=None):
+        return db_manager.add_item(name, category, qty, unit, location, purchased_on, expiry_on, source, notes,
+                                   model_shelf_life_days)
+
+    def add_items(self, items) -> list:
+        return db_manager.add_items(items)
+
+    def add_item_rows(self, batches) -> int:
+        return db_manager.add_item_rows(batches)
+
+    def list_items(self):
+        return db_manager.list_items()
+
+    def list_items_with_days(self, within_days: Optional[int] = None, by_expiry: bool = False):
+        return db_manager.list_items_with_days(within_days, by_expiry)
+
+    def search_items(self, q: str, limit: int = 20) -> tuple[list, bool]:
+        return db_manager.search_items(q, limit)
+
+    def get_item(self, item_id):
+        return db_manager.get_item(item_id)
+
+    def update_item(self, item_id, name, category, qty, unit, location, purchased_on, expiry_on,
+                    source=None, notes=None):
+        return db_manager.update_item(item_id, name, category, qty, unit, location, purchased_on, expiry_on,
+                                      source, notes)
+
+    def delete_item(self, item_id, reason: Optional[str] = "wasted"):
+        return db_manager.delete_item(item_id, reason)
+
+    def consume_item(self, item_id: int, amount: float) -> tuple[bool, Optional[float]]:
+        return db_manager.consume_item(item_id, amount)
+
+    def upcoming_expiries(self, from_day: int):
+        return db_manager.upcoming_expiries(from_day)
+
+    def rollups(self, from_day: int, to_day: int):
+        return db_manager.rollups(from_day, to_day)
+
+    def calibration_table(self, household: str):
+        return db_manager.calibration_table(household)
+
+    def record_alert(self, item_id: int, threshold: int, expiry_day: int, alert: str) -> tuple[int, bool]:
+        return db_manager.record_alert(item_id, threshold, expiry_day, alert)
+
+    def recent_alerts(self, since: int = 0, limit: int = 500):
+        return db_manager.recent_alerts(since, limit)
+
+    def iter_item_batches(self, batch_size: int = 65536):
+        return db_manager.iter_item_batches(batch_size)
+
+
+# ==============================================================
+# THREAD ADAPTER (sync backend -> async interface)
+# ==============================================================
+class ThreadedStorage(AsyncStorage):
+    """
+    Runs a synchronous backend in the default thread pool.
+    Wrapping SQLiteStorage gives the embedded stand-in used when no
+    Postgres server is available.
+    """
+
+    def __init__(self, backend: Storage):
+        self.backend = backend
+
+    async def init(self):
+        await asyncio.to_thread(self.backend.init)
+
+    async def close(self):
+        await asyncio.to_thread(self.backend.close)
+
+    async def add_item(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.add_item, *args, **kwargs)
+
+    async def add_items(self, items) -> list:
+        return await asyncio.to_thread(self.backend.add_items, items)
+
+    async def add_item_rows(self, batches) -> int:
+        return await asyncio.to_thread(self.backend.add_item_rows, batches)
+
+    async def list_items(self):
+        return await asyncio.to_thread(self.backend.list_items)
+
+    async def list_items_with_days(self, within_days: Optional[int] = None, by_expiry: bool = False):
+        return await asyncio.to_thread(self.backend.list_items_with_days, within_days, by_expiry)
+
+    async def search_items(self, q: str, limit: int = 20) -> tuple[list, bool]:
+        return await asyncio.to_thread(self.backend.search_items, q, limit)
+
+    async def get_item(self, item_id):
+        return await asyncio.to_thread(self.backend.get_item, item_id)
+
+    async def update_item(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.update_item, *args, **kwargs)
+
+    async def delete_item(self, item_id, reason: Optional[str] = "wasted"):
+        return await asyncio.to_thread(self.backend.delete_item, item_id, reason)
+
+    async def consume_item(self, item_id: int, amount: float):
+        return await asyncio.to_thread(self.backend.consume_item, item_id, amount)
+
+    async def upcoming_expiries(self, from_day: int):
+        return await asyncio.to_thread(self.backend.upcoming_expiries, from_day)
+
+    async def rollups(self, from_day: int, to_day: int):
+        return await asyncio.to_thread(self.backend.rollups, from_day, to_day)
+
+    async def calibration_table(self, household: str):
+        return await asyncio.to_thread(self.backend.calibration_table, household)
+
+    async def record_alert(self, item_id: int, threshold: int, expiry_day: int, alert: str) -> tuple[int, bool]:
+        return await asyncio.to_thread(self.backend.record_alert, item_id, threshold, expiry_day, alert)
+
+    async def recent_alerts(self, since: int = 0, limit: int = 500):
+        return await asyncio.to_thread(self.backend.recent_alerts, since, limit)
+
+    async def iter_item_batches(self, batch_size: int = 65536):
+        batches = self.backend.iter_item_batches(batch_size)
+        try:
+            while True:
+                rows = await asyncio.to_thread(next, batches, None)
+                if rows is None:
+                    return
+                yield rows
+        finally:
+            batches.close()
+
+
+# ==============================================================
+# POSTGRES (async, pooled)
+# ==============================================================
+PG_INSERT_ROWS = """
+INSERT INTO items(name, category, qty, unit, location, purchased_on, expiry_on, source, notes,
+                  model_shelf_life_days)
+SELECT * FROM unnest($1::text[], $2::text[], $3::float8[], $4::text[], $5::text[], $6::text[], $7::text[],
+                     $8::text[], $9::text[], $10::float8[])
+RETURNING id
+"""
+
+PG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+  id BIGSERIAL PRIMARY KEY,
+  name TEXT NOT NULL,
+  category TEXT,
+  qty DOUBLE PRECISION DEFAULT 1,
+  unit TEXT DEFAULT '',
+  location TEXT CHECK(location IN ('Fridge','Freezer','Pantry')) DEFAULT 'Fridge',
+  purchased_on TEXT,
+  expiry_on TEXT,
+  source TEXT,
+  notes TEXT,
+  model_shelf_life_days DOUBLE PRECISION  -- as in db_manager.SCHEMA
+);
+ALTER TABLE items ADD COLUMN IF NOT EXISTS model_shelf_life_days DOUBLE PRECISION;
+-- dates are normalised to ISO on write, so text order is date order
+CREATE INDEX IF NOT EXISTS idx_items_expiry_on ON items(expiry_on);
+-- consumption/disposal history and its daily rollups (see db_manager.SCHEMA)
+CREATE TABLE IF NOT EXISTS item_events (
+  id BIGSERIAL PRIMARY KEY,
+  item_id BIGINT NOT NULL,
+  ts TIMESTAMP NOT NULL DEFAULT now(),
+  day INTEGER NOT NULL,
+  kind TEXT NOT NULL CHECK(kind IN ('consumed','wasted')),
+  qty DOUBLE PRECISION NOT NULL,
+  unit TEXT,
+  name TEXT,
+  category TEXT,
+  location TEXT,
+  source TEXT,
+  purchased_day INTEGER,
+  expiry_day INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_item_events_day ON item_events(day);
+CREATE TABLE IF NOT EXISTS daily_rollups (
+  day INTEGER NOT NULL,
+  category TEXT NOT NULL,
+  location TEXT NOT NULL,
+  source TEXT NOT NULL,
+  consumed_qty DOUBLE PRECISION NOT NULL DEFAULT 0,
+  consumed_events INTEGER NOT NULL DEFAULT 0,
+  wasted_qty DOUBLE PRECISION NOT NULL DEFAULT 0,
+  wasted_events INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, category, location, source)
+);
+CREATE TABLE IF NOT EXISTS shelf_life_calibration (
+  household TEXT NOT NULL,
+  category TEXT NOT NULL,
+  location TEXT NOT NULL,
+  log_ratio DOUBLE PRECISION NOT NULL,
+  n INTEGER NOT NULL,
+  updated_day INTEGER NOT NULL,
+  PRIMARY KEY (household, category, location)
+);
+-- BIGSERIAL ids are never reused, so unlike SQLite deletes needn't clear item_id
+CREATE TABLE IF NOT EXISTS expiry_alerts (
+  id BIGSERIAL PRIMARY KEY,
+  item_id BIGINT NOT NULL,
+  threshold INTEGER NOT NULL,
+  expiry_day INTEGER NOT NULL,
+  alert TEXT NOT NULL,
+  UNIQUE (item_id, threshold, expiry_day)
+);
+"""
+
+# typo-tolerant search (see PostgresStorage.search_items); optional, as creating
+# the extension needs the contrib package and CREATE privilege on the database
+PG_TRGM = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_items_name_trgm
+  ON items USING gin ((lower(name || ' ' || coalesce(category, ''))) gin_trgm_ops);
+"""
+
+# day numbers match Python's date.toordinal() (and SQLite's *_day columns)
+PG_DAY = "({col}::date - DATE '0001-01-01' + 1)"
+
+PG_RECORD_EVENT = f"""
+WITH ev AS (
+  INSERT INTO item_events(item_id, day, kind, qty, unit, name, category, location, source, purchased_day, expiry_day)
+  SELECT id, $2, $3, $4, unit, name, category, location, source,
+         {PG_DAY.format(col="purchased_on")}, {PG_DAY.format(col="expiry_on")}
+  FROM items WHERE id = $1
+  RETURNING day, category, location, source, kind, qty
+)
+INSERT INTO daily_rollups AS r(day, category, location, source, consumed_qty, consumed_events, wasted_qty, wasted_events)
+SELECT day, COALESCE(category, ''), COALESCE(location, ''), COALESCE(source, ''),
+       CASE WHEN kind = 'consumed' THEN qty ELSE 0 END, (kind = 'consumed')::int,
+       CASE WHEN kind = 'wasted' THEN qty ELSE 0 END, (kind = 'wasted')::int
+FROM ev
+ON CONFLICT (day, category, location, source) DO UPDATE SET
+  consumed_qty = r.consumed_qty + excluded.consumed_qty,
+  consumed_events = r.consumed_events + excluded.consumed_events,
+  wasted_qty = r.wasted_qty + excluded.wasted_qty,
+  wasted_events = r.wasted_events + excluded.wasted_events
+"""
+
+PG_CALIBRATE = """
+INSERT INTO shelf_life_calibration AS c(household, category, location, log_ratio, n, updated_day)
+VALUES ($1, $2, $3, $4, 1, $5)
+ON CONFLICT (household, category, location) DO UPDATE SET
+  log_ratio = c.log_ratio + GREATEST($6::float8, 1.0 / (c.n + 1)) * (excluded.log_ratio - c.log_ratio),
+  n = c.n + 1,
+  updated_day = excluded.updated_day
+"""
+
+# the row an event is recorded from, locked for the rest of the transaction
+PG_LOCK_ITEM = f"""
+SELECT COALESCE(qty, 0) AS qty, category, location,
+       {PG_DAY.format(col="purchased_on")} AS purchased_day, model_shelf_life_days
+FROM items WHERE id = $1 FOR UPDATE
+"""
+
+
+class PostgresStorage(AsyncStorage):
+    """asyncpg backend. The pool is created lazily by init()."""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+        self.trgm = False
+
+    async def init(self):
+        if self.pool is not None:
+            return
+        import asyncpg  # optional dependency, only needed for this backend
+        # <% picks typo candidates by word similarity; the same cut-off as the SQLite typo pass
+        self.pool = await asyncpg.create_pool(
+            self.dsn, min_size=self.min_size, max_size=self.max_size,
+            server_settings={"pg_trgm.word_similarity_threshold": str(db_manager.SEARCH_FUZZY_MIN)})
+        async with self.pool.acquire() as con:
+            await con.execute(PG_SCHEMA)
+            try:
+                async with con.transaction():
+                    await con.execute(PG_TRGM)
+                self.trgm = True
+            except asyncpg.PostgresError as e:
+                logger.warning("pg_trgm unavailable (%s); search has no typo pass", e)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def add_item(self, name, category=None, qty=1, unit="", location="Fridge",
+                       purchased_on=None, expiry_on=None, source=None, notes=None, model_shelf_life_days=None):
+        purchased_on = normalize_date(purchased_on) or dt.date.today().isoformat()
+        expiry_on = normalize_date(expiry_on)
+        iid = await self.pool.fetchval(
+            """INSERT INTO items(name, category, qty, unit, location, purchased_on, expiry_on, source, notes,
+                                 model_shelf_life_days)
+               VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10) RETURNING id""",
+            name, category, qty, unit, location, purchased_on, expiry_on, source, notes, model_shelf_life_days
+        )
+        # same write listeners as the SQLite path (db_manager.add_write_listener)
+        db_manager.notify_write("add", iid, {"name": name, "category": category, "qty": qty, "location": location,
+                                             "purchased_on": purchased_on, "expiry_on": expiry_on})
+        return iid
+
+    async def add_items(self, items) -> list:
+        today = dt.date.today().isoformat()
+        rows = [(it["name"], it.get("category"), it.get("qty", 1), it.get("unit", ""), it.get("location", "Fridge"),
+                 normalize_date(it.get("purchased_on")) or today, normalize_date(it.get("expiry_on")),
+                 it.get("source"), it.get("notes"), it.get("model_shelf_life_days")) for it in items]
+        if not rows:
+            return []
+        # one statement, as in add_item_rows; a single INSERT is already atomic
+        ids = [r["id"] for r in await self.pool.fetch(PG_INSERT_ROWS, *map(list, zip(*rows)))]
+        for iid, row in zip(ids, rows):
+            db_manager.notify_write("add", iid, dict(zip(db_manager.ITEM_FIELDS, row)))
+        return ids
+
+    async def add_item_rows(self, batches) -> int:
+        added = []
+        async with self.pool.acquire() as con, con.transaction():
+            for rows in batches:
+                if rows:
+                    # one statement per batch: the columns as arrays, unnested server-side
+                    ids = await con.fetch(PG_INSERT_ROWS, *map(list, zip(*rows)))
+                    added.append(([r["id"] for r in ids], rows))
+        for ids, rows in added:
+            for iid, row in zip(ids, rows):
+                db_manager.notify_write("add", iid, dict(zip(db_manager.ITEM_FIELDS, row)))
+        return sum(len(ids) for ids, _ in added)
+
+    async def list_items(self):
+        rows = await self.pool.fetch("""SELECT id,name,qty,unit,category,location,purchased_on,expiry_on
+                                        FROM items ORDER BY id""")
+        return [tuple(r) for r in rows]
+
+    async def list_items_with_days(self, within_days: Optional[int] = None, by_expiry: bool = False):
+        today = dt.date.today()
+        sql = """SELECT id,name,qty,unit,category,location,purchased_on,expiry_on, expiry_on::date - $1::date
+                 FROM items"""
+        params = [today]
+        if within_days is not None:
+            sql += " WHERE expiry_on <= $2"
+            params.append((today + dt.timedelta(days=within_days)).isoformat())
+        sql += " ORDER BY expiry_on NULLS LAST" if by_expiry else " ORDER BY id"
+        rows = await self.pool.fetch(sql, *params)
+        return [tuple(r) for r in rows]
+
+    async def search_items(self, q: str, limit: int = 20) -> tuple[list, bool]:
+        """
+        Substring match of every word, name prefixes first. If nothing matches
+        and pg_trgm is installed, a typo pass like db_manager.search_items':
+        items whose name or category words are close to every query word.
+        """
+        text = " ".join(q.lower().split())
+        terms = text.split() or [""]
+        cols = "id,name,qty,unit,category,location,purchased_on,expiry_on, expiry_on::date - $1::date"
+        where = " AND ".join(f"strpos(lower(name || ' ' || coalesce(category, '') || ' ' || coalesce(notes, '')), "
+                             f"${i + 4}) > 0" for i in range(len(terms)))
+        rows = await self.pool.fetch(
+            f"""SELECT {cols} FROM items WHERE {where}
+                ORDER BY starts_with(lower(name), $2) DESC, name, id LIMIT $3""",
+            dt.date.today(), text, limit, *terms)
+        terms = [t for t in terms if len(t) >= 3]
+        if rows or not terms or not self.trgm:
+            return [tuple(r) for r in rows], False
+
+        # the expression matches idx_items_name_trgm, so each <% is an index scan
+        doc = "lower(name || ' ' || coalesce(category, ''))"
+        score = " + ".join(f"word_similarity(${i + 4}, {doc})" for i in range(len(terms)))
+        rows = await self.pool.fetch(
+            f"""SELECT {cols} FROM (
+                  SELECT *, ({score}) / {len(terms)} AS score FROM items
+                  WHERE {" OR ".join(f"${i + 4} <% {doc}" for i in range(len(terms)))}
+                ) c WHERE score >= $2 ORDER BY score DESC, id LIMIT $3""",
+            dt.date.today(), db_manager.SEARCH_FUZZY_MIN, limit, *terms)
+        return [tuple(r) for r in rows], True
+
+    async def get_item(self, item_id):
+        row = await self.pool.fetchrow("""SELECT id,name,category,qty,unit,location,purchased_on,expiry_on,source,notes
+                                          FROM items WHERE id = $1""", item_id)
+        return tuple(row) if row else None
+
+    async def update_item(self, item_id, name, category, qty, unit, location, purchased_on, expiry_on,
+                          source=None, notes=None):
+        purchased_on = normalize_date(purchased_on)
+        expiry_on = normalize_date(expiry_on)
+        await self.pool.execute(
+            """UPDATE items SET name=$1, category=$2, qty=$3, unit=$4, location=$5, purchased_on=$6,
+                               expiry_on=$7, source=$8, notes=$9
+               WHERE id = $10""",
+            name, category, qty, unit, location, purchased_on, expiry_on, source, notes, item_id
+        )
+        db_manager.notify_write("update", item_id, {"name": name, "category": category, "qty": qty,
+                                                    "location": location, "purchased_on": purchased_on,
+                                                    "expiry_on": expiry_on})
+
+    async def delete_item(self, item_id, reason: Optional[str] = "wasted"):
+        if reason is not None and reason not in db_manager.EVENT_KINDS:
+            raise ValueError(f"reason must be one of {db_manager.EVENT_KINDS} or None")
+        today = dt.date.today().toordinal()
+        async with self.pool.acquire() as con, con.transaction():
+            row = await con.fetchrow(PG_LOCK_ITEM, item_id)
+            if row and reason and row["qty"] > 0:
+                await con.execute(PG_RECORD_EVENT, item_id, today, reason, row["qty"])
+                await self._calibrate(con, row, reason, today)
+            status = await con.execute("DELETE FROM items WHERE id = $1", item_id)
+        if status.endswith(" 1"):
+            db_manager.notify_write("delete", item_id)
+            return True
+        return False
+
+    async def consume_item(self, item_id: int, amount: float) -> tuple[bool, Optional[float]]:
+        today = dt.date.today().toordinal()
+        async with self.pool.acquire() as con, con.transaction():
+            # row lock, so concurrent consumers can't lose an update
+            current = await con.fetchrow(PG_LOCK_ITEM, item_id)
+            if current is None:
+                return False, None
+            new_qty = max(0, current["qty"] - amount)
+            await con.execute("UPDATE items SET qty = $1 WHERE id = $2", new_qty, item_id)
+            if current["qty"] > new_qty:
+                await con.execute(PG_RECORD_EVENT, item_id, today, "consumed", current["qty"] - new_qty)
+                if new_qty == 0:
+                    await self._calibrate(con, current, "consumed", today)
+        db_manager.notify_write("consume", item_id, {"qty": new_qty})
+        return True, new_qty
+
+    @staticmethod
+    async def _calibrate(con, row, kind, today):
+        """Shelf-life calibration update for an item leaving the inventory (db_manager._record_event)."""
+        r = calibration.residual(kind, today, row["purchased_day"], row["model_shelf_life_days"])
+        if r is not None:
+            await con.execute(PG_CALIBRATE, calibration.HOUSEHOLD, *calibration.key(row["category"], row["location"]),
+                              r, today, calibration.ALPHA)
+
+    async def upcoming_expiries(self, from_day: int):
+        rows = await self.pool.fetch(
+            """SELECT id,name,qty,location,expiry_on FROM items
+               WHERE expiry_on >= $1 AND (qty IS NULL OR qty > 0)""",
+            dt.date.fromordinal(from_day).isoformat())
+        return [tuple(r) for r in rows]
+
+    async def rollups(self, from_day: int, to_day: int):
+        rows = await self.pool.fetch(
+            f"SELECT {', '.join(db_manager.ROLLUP_COLUMNS)} FROM daily_rollups WHERE day BETWEEN $1 AND $2",
+            from_day, to_day)
+        return [tuple(r) for r in rows]
+
+    async def calibration_table(self, household: str):
+        rows = await self.pool.fetch("""SELECT category, location, log_ratio, n FROM shelf_life_calibration
+                                        WHERE household = $1""", household)
+        return [tuple(r) for r in rows]
+
+    async def record_alert(self, item_id: int, threshold: int, expiry_day: int, alert: str) -> tuple[int, bool]:
+        async with self.pool.acquire() as con:
+            alert_id = await con.fetchval(
+                """INSERT INTO expiry_alerts(item_id, threshold, expiry_day, alert) VALUES ($1, $2, $3, $4)
+                   ON CONFLICT (item_id, threshold, expiry_day) DO NOTHING RETURNING id""",
+                item_id, threshold, expiry_day, alert)
+            if alert_id is None:
+                return await con.fetchval("""SELECT id FROM expiry_alerts
+                                             WHERE item_id = $1 AND threshold = $2 AND expiry_day = $3""",
+                                          item_id, threshold, expiry_day), False
+            if alert_id % 256 == 0:  # as db_manager's prune trigger
+                await con.execute("DELETE FROM expiry_alerts WHERE expiry_day < $1",
+                                  expiry_day - db_manager.ALERT_KEEP_DAYS)
+            return alert_id, True
+
+    async def recent_alerts(self, since: int = 0, limit: int = 500):
+        rows = await self.pool.fetch("""SELECT id, alert FROM (SELECT id, alert FROM expiry_alerts WHERE id > $1
+                                                              ORDER BY id DESC LIMIT $2) a ORDER BY id""",
+                                     since, limit)
+        return [tuple(r) for r in rows]
+
+    async def iter_item_batches(self, batch_size: int = 65536):
+        # keyset pages, as in db_manager.iter_item_batches
+        sql = f"SELECT {', '.join(db_manager.EXPORT_COLUMNS)} FROM items WHERE id > $1 ORDER BY id LIMIT $2"
+        last = 0
+        while True:
+            rows = [tuple(r) for r in await self.pool.fetch(sql, last, batch_size)]
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+
+
+# ==============================================================
+# FACTORY
+# ==============================================================
+def get_async_storage(kind: Optional[str] = None) -> AsyncStorage:
+    """Return the async backend selected by SMARTFOOD_STORAGE (default: sqlite)."""
+    kind = (kind or os.environ.get("SMARTFOOD_STORAGE", "sqlite")).lower()
+    if kind == "sqlite":
+        return ThreadedStorage(SQLiteStorage())
+    if kind in ("postgres", "postgresql", "pg"):
+        dsn = os.environ.get("SMARTFOOD_PG_DSN", "postgresql://localhost/smartfood")
+        max_size = int(os.environ.get("SMARTFOOD_PG_POOL", "10"))
+        return PostgresStorage(dsn, max_size=max_size)
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,268 @@
+"""
+File-backed label index for fine-grained category matching (thousands of
+OpenFoodFacts categories or product names) in semantic_mapper.
+
+A taxonomy is a directory:
+
+  labels.txt         one label per line, row i of the matrix
+  embeddings.f16     float16 (count, dim) matrix, L2-normalised, memory-mapped
+  meta.json          dim, count, embedder name, index parameters
+  ivf_centroids.npy  IVF coarse quantiser (float32, nlist x dim)
+  ivf_assign.i32     list number of every row
+  hnsw.bin           HNSW graph, only when hnswlib is installed
+
+Lookup is approximate nearest neighbour by inner product: HNSW through
+hnswlib if available, otherwise an IVF index in NumPy that scores the rows
+of the `nprobe` closest lists exactly. Label sets up to BRUTE_FORCE_MAX rows
+are simply scanned.
+
+add() appends rows to the matrix, assigns them to the existing IVF lists
+(or inserts them into the HNSW graph) and rewrites only the small files, so
+new labels never trigger a rebuild. IVF lists drift as labels are added to
+a set the quantiser wasn't trained on; `needs_retrain` turns true once the
+set has doubled (or a scanned set passes BRUTE_FORCE_MAX), and `build()`
+over labels.txt starts fresh.
+
+  python src/taxonomy.py build models/taxonomy labels.txt
+  python src/taxonomy.py add models/taxonomy more_labels.txt
+  python src/taxonomy.py query models/taxonomy "oat milk" -k 5
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("smartfood.taxonomy")
+
+BRUTE_FORCE_MAX = 4096
+ENCODE_BATCH = 256
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+
+try:
+    import hnswlib  # optional: faster, higher-recall index for large label sets
+except ImportError:
+    hnswlib = None
+
+
+def _normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+def _encode(embedder, labels):
+    if not labels:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.concatenate([_normalize(embedder.encode(labels[i:i + ENCODE_BATCH]))
+                           for i in range(0, len(labels), ENCODE_BATCH)])
+
+
+def _kmeans(x, k, iters=10, seed=0):
+    """Spherical k-means: centroids are unit vectors, assignment by inner product."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:  # re-seed empty lists
+                centroids[c] = x[rng.integers(len(x))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def _assign(rows, centroids, chunk=8192):
+    return np.concatenate([np.argmax(rows[i:i + chunk].astype(np.float32) @ centroids.T, axis=1)
+                           for i in range(0, len(rows), chunk)]).astype(np.int32)
+
+
+class LabelIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with open(self._file("meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(self._file("labels.txt"), encoding="utf-8") as f:
+            self.labels = f.read().splitlines()
+        if len(self.labels) != self.meta["count"]:
+            raise ValueError(f"{path}: labels.txt has {len(self.labels)} rows, meta.json says {self.meta['count']}")
+        self.rows = {label: i for i, label in enumerate(self.labels)}
+        self.dim = self.meta["dim"]
+        self._map()
+
+        self.centroids = None
+        if os.path.exists(self._file("ivf_centroids.npy")):
+            self.centroids = np.load(self._file("ivf_centroids.npy"))
+            self.assign = np.fromfile(self._file("ivf_assign.i32"), dtype=np.int32)
+            self._build_lists()
+
+        self.hnsw = None
+        if hnswlib is not None and os.path.exists(self._file("hnsw.bin")):
+            self.hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self.hnsw.load_index(self._file("hnsw.bin"), max_elements=len(self))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self):
+        n = len(self.labels)
+        self.embeddings = (np.memmap(self._file("embeddings.f16"), dtype=np.float16, mode="r", shape=(n, self.dim))
+                           if n else np.zeros((0, self.dim), dtype=np.float16))
+
+    def _build_lists(self):
+        # CSR-style inverted lists: rows of list c are order[offsets[c]:offsets[c + 1]]
+        self.order = np.argsort(self.assign, kind="stable").astype(np.int32)
+        self.offsets = np.searchsorted(self.assign[self.order], np.arange(len(self.centroids) + 1))
+
+    def _write_meta(self):
+        with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+
+    @property
+    def needs_retrain(self) -> bool:
+        if self.centroids is None:
+            return len(self) > BRUTE_FORCE_MAX
+        return len(self) > 2 * self.meta.get("trained_count", len(self))
+
+    # --------------------------------------------------------------
+    # lookup
+    # --------------------------------------------------------------
+    def search(self, query_emb, k: int = 5, nprobe: int = None):
+        """Top-k (label, score) by cosine similarity for one query embedding."""
+        q = _normalize(np.asarray(query_emb).reshape(-1))
+        if q.shape[0] != self.dim:
+            raise ValueError(f"query has dim {q.shape[0]}, taxonomy {self.path} has {self.dim}")
+        n = len(self)
+        k = min(k, n)
+        if k <= 0:
+            return []
+
+        if n <= BRUTE_FORCE_MAX or (self.hnsw is None and self.centroids is None):
+            candidates = None
+        elif self.hnsw is not None:
+            with self._lock:
+                self.hnsw.set_ef(max(50, 2 * k))
+                ids, _ = self.hnsw.knn_query(q, k=k)
+            candidates = np.sort(ids[0])
+        else:
+            nprobe = nprobe or self.meta.get("nprobe", 8)
+            sims = self.centroids @ q
+            lists = np.argpartition(-sims, min(nprobe, len(sims) - 1))[:nprobe]
+            candidates = np.sort(np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists]))
+
+        if candidates is None:
+            scores = np.concatenate([self.embeddings[i:i + 65536].astype(np.float32) @ q
+                                     for i in range(0, n, 65536)])
+            candidates = np.arange(n)
+        else:
+            # rescore from the matrix (sorted rows keep page faults sequential)
+            scores = self.embeddings[candidates].astype(np.float32) @ q
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.labels[candidates[i]], float(scores[i])) for i in top]
+
+    # --------------------------------------------------------------
+    # incremental additions
+    # --------------------------------------------------------------
+    def add(self, labels, embedder) -> int:
+        """Append labels not already present; returns how many were added."""
+        new = list(dict.fromkeys(l for l in (s.strip() for s in labels) if l and l not in self.rows))
+        if not new:
+            return 0
+        embs = _encode(embedder, new)
+        if embs.shape[1] != self.dim:
+            raise ValueError(f"embedder produces dim {embs.shape[1]}, taxonomy {self.path} has {self.dim}")
+        with self._lock:
+            start = len(self)
+            with open(self._file("embeddings.f16"), "ab") as f:
+                f.write(embs.astype(np.float16).tobytes())
+            with open(self._file("labels.txt"), "a", encoding="utf-8") as f:
+                f.write("".join(l + "\n" for l in new))
+            # publish rows before anything that can point at them, so concurrent searches stay in bounds
+            self.labels.extend(new)
+            self.rows.update((l, start + i) for i, l in enumerate(new))
+            self._map()
+            if self.centroids is not None:
+                added = _assign(embs, self.centroids)
+                with open(self._file("ivf_assign.i32"), "ab") as f:
+                    f.write(added.tobytes())
+                self.assign = np.concatenate([self.assign, added])
+                self._build_lists()
+            if self.hnsw is not None:
+                self.hnsw.resize_index(start + len(new))
+                self.hnsw.add_items(embs, np.arange(start, start + len(new)))
+                self.hnsw.save_index(self._file("hnsw.bin"))
+            self.meta["count"] = len(self.labels)
+            self._write_meta()
+        if self.needs_retrain:
+            logger.info("taxonomy %s has outgrown its index; rebuild it with taxonomy.build()", self.path)
+        return len(new)
+
+
+def build(path: str, labels, embedder, nlist: int = None, nprobe: int = 8) -> LabelIndex:
+    """Encode labels and write a fresh taxonomy directory (overwrites an existing one)."""
+    labels = list(dict.fromkeys(l for l in (s.strip() for s in labels) if l))
+    os.makedirs(path, exist_ok=True)
+    embs = _encode(embedder, labels)
+    dim = embs.shape[1] if len(labels) else len(_encode(embedder, ["x"])[0])
+    embs.astype(np.float16).tofile(os.path.join(path, "embeddings.f16"))
+    with open(os.path.join(path, "labels.txt"), "w", encoding="utf-8") as f:
+        f.write("".join(l + "\n" for l in labels))
+    for stale in ("ivf_centroids.npy", "ivf_assign.i32", "hnsw.bin"):
+        if os.path.exists(os.path.join(path, stale)):
+            os.remove(os.path.join(path, stale))
+
+    meta = {"dim": dim, "count": len(labels), "embedder": getattr(embedder, "name", "unknown")}
+    if len(labels) > BRUTE_FORCE_MAX:
+        nlist = nlist or int(np.sqrt(len(labels)))
+        sample = embs[np.random.default_rng(0).permutation(len(embs))[:max(50 * nlist, 20000)]]
+        centroids = _kmeans(sample, nlist)
+        np.save(os.path.join(path, "ivf_centroids.npy"), centroids)
+        _assign(embs, centroids).tofile(os.path.join(path, "ivf_assign.i32"))
+        meta.update(nlist=nlist, nprobe=nprobe, trained_count=len(labels))
+        if hnswlib is not None:
+            index = hnswlib.Index(space="ip", dim=dim)
+            index.init_index(max_elements=len(labels), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+            index.add_items(embs, np.arange(len(labels)))
+            index.save_index(os.path.join(path, "hnsw.bin"))
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return LabelIndex(path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from embedders import get_embedder
+
+    ap = argparse.ArgumentParser(description="Build or extend a semantic_mapper taxonomy")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for cmd in ("build", "add"):
+        p = sub.add_parser(cmd)
+        p.add_argument("path")
+        p.add_argument("labels", help="text file, one label per line")
+    p = sub.add_parser("query")
+    p.add_argument("path")
+    p.add_argument("text")
+    p.add_argument("-k", type=int, default=5)
+    args = ap.parse_args()
+
+    embedder = get_embedder()
+    if args.cmd == "query":
+        for label, score in LabelIndex(args.path).search(embedder.encode([args.text])[0], k=args.k):
+            print(f"{score:.3f}  {label}")
+    else:
+        with open(args.labels, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        if args.cmd == "build":
+            print(f"{len(build(args.path, lines, embedder))} labels in {args.path}")
+        else:
+            print(f"added {LabelIndex(args.path).add(lines, embedder)} labels to {args.path}")
@@ -0,0 +1,207 @@
+"""
+Streaming export and import of the items table as Apache Arrow IPC,
+Parquet or NDJSON.
+
+Export encodes the table batch by batch as it is read (iter_item_batches,
+keyset pages), so memory is one batch whatever the table size. Import
+decodes batch by batch into the bulk-insert path (add_items), one
+transaction per batch; a failure keeps the batches already committed.
+Ids are not imported: rows get fresh ids, so an export can be loaded into a
+database that already holds items.
+
+Arrow and Parquet need pyarrow; NDJSON (one JSON object per line) does not.
+
+  python src/app.py export inventory.parquet
+  python src/app.py import inventory.parquet
+"""
+import contextlib
+import json
+import os
+import sys
+
+from db_manager import EXPORT_COLUMNS, ITEM_FIELDS
+
+try:
+    import pyarrow as pa  # optional: Arrow IPC and Parquet formats
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = ("arrow", "parquet", "ndjson")
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "ndjson": "application/x-ndjson",
+}
+EXTENSIONS = {".arrow": "arrow", ".arrows": "arrow", ".ipc": "arrow",
+              ".parquet": "parquet", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+BATCH_SIZE = 65536
+
+_DATE_FIELDS = ("purchased_on", "expiry_on")
+
+
+def format_for(path: str, fmt: str = None) -> str:
+    """fmt if given, else the format implied by path's extension."""
+    fmt = fmt or EXTENSIONS.get(os.path.splitext(path or "")[1].lower())
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS} (or use a .arrow/.parquet/.ndjson file name)")
+    if fmt != "ndjson" and pa is None:
+        raise RuntimeError(f"{fmt} needs pyarrow (pip install pyarrow); ndjson works without it")
+    return fmt
+
+
+def schema():
+    return pa.schema([
+        ("id", pa.int64()), ("name", pa.string()), ("category", pa.string()), ("qty", pa.float64()),
+        ("unit", pa.string()), ("location", pa.string()), ("purchased_on", pa.date32()),
+        ("expiry_on", pa.date32()), ("source", pa.string()), ("notes", pa.string()),
+        ("model_shelf_life_days", pa.float64()),
+    ])
+
+
+class _Sink:
+    """Write-only file object the pyarrow writers encode into; take() drains it."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts = []
+        return out
+
+
+class Encoder:
+    """Turns batches of EXPORT_COLUMNS rows into consecutive chunks of one file."""
+
+    def __init__(self, fmt: str):
+        self.fmt = format_for(None, fmt)
+        self.rows = 0
+        if self.fmt == "ndjson":
+            return
+        self.schema = schema()
+        self.sink = _Sink()
+        self.writer = (pa.ipc.new_stream(self.sink, self.schema) if self.fmt == "arrow"
+                       else pq.ParquetWriter(self.sink, self.schema))
+
+    def _batch(self, rows):
+        arrays = []
+        for field, values in zip(self.schema, zip(*rows)):
+            if field.name in _DATE_FIELDS:  # stored as ISO text
+                arrays.append(pa.array(values, type=pa.string()).cast(pa.date32()))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def write(self, rows) -> bytes:
+        self.rows += len(rows)
+        if self.fmt == "ndjson":
+            return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, r)), ensure_ascii=False) + "\n"
+                           for r in rows).encode()
+        if rows:
+            self.writer.write_batch(self._batch(rows))  # one Parquet row group per batch
+        return self.sink.take()
+
+    def close(self) -> bytes:
+        if self.fmt == "ndjson":
+            return b""
+        self.writer.close()
+        return self.sink.take()
+
+
+def _items(records):
+    """add_items() dicts; nulls are dropped so the insert defaults apply."""
+    return [{k: v for k, v in r.items() if k in ITEM_FIELDS and v is not None} for r in records]
+
+
+def _batch_items(batch):
+    """_items() for a RecordBatch, converted column by column (dates as ISO text, not date objects)."""
+    columns = {}
+    for name, column in zip(batch.schema.names, batch.columns):
+        if name in ITEM_FIELDS:
+            if pa.types.is_date(column.type) or pa.types.is_timestamp(column.type):
+                column = column.cast(pa.string())
+            columns[name] = column.to_pylist()
+    names = list(columns)
+    return [{k: v for k, v in zip(names, row) if v is not None} for row in zip(*columns.values())]
+
+
+def decode(f, fmt: str, batch_size: int = BATCH_SIZE):
+    """
+    Yield lists of at most batch_size add_items() dicts read from binary file f.
+    Parquet needs a seekable file (its index is in the footer); Arrow IPC
+    streams and NDJSON are read front to back.
+    """
+    fmt = format_for(None, fmt)
+    if fmt == "ndjson":
+        batch = []
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"line {lineno}: {e}") from None
+            if not isinstance(record, dict) or not record.get("name"):
+                raise ValueError(f"line {lineno}: expected a JSON object with a name")
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield _items(batch)
+                batch = []
+        if batch:
+            yield _items(batch)
+        return
+
+    if fmt == "arrow":
+        reader = pa.ipc.open_stream(f)
+        names = reader.schema.names
+        batches = (b.slice(i, batch_size) for b in reader for i in range(0, b.num_rows, batch_size))
+    else:
+        parquet = pq.ParquetFile(f)
+        names = parquet.schema_arrow.names
+        batches = parquet.iter_batches(batch_size=batch_size, columns=[n for n in names if n in ITEM_FIELDS])
+    if "name" not in names:
+        raise ValueError("import needs a 'name' column")
+    for batch in batches:
+        if batch.column(batch.schema.get_field_index("name")).null_count:
+            raise ValueError("import rows need a name")
+        yield _batch_items(batch)
+
+
+def export_to(path: str, batches, fmt: str = None) -> int:
+    """Write an export file (path "-" for stdout); returns the number of rows."""
+    fmt = format_for(path, fmt)
+    encoder = Encoder(fmt)
+    target = contextlib.nullcontext(sys.stdout.buffer) if path == "-" else open(path, "wb")
+    with target as out:
+        for rows in batches:
+            out.write(encoder.write(rows))
+        out.write(encoder.close())
+    return encoder.rows
+
+
+def import_from(path: str, add_items, fmt: str = None, batch_size: int = BATCH_SIZE) -> int:
+    """Load an export file through add_items(list_of_dicts); returns the number of rows added."""
+    fmt = format_for(path, fmt)
+    added = 0
+    with open(path, "rb") as f:
+        for items in decode(f, fmt, batch_size):
+            added += len(add_items(items))
+    return added
@@ -0,0 +1,128 @@
+"""
+Admission control for image uploads (/predict-image, /detect-items).
+
+  - UploadLimitMiddleware rejects bodies over SMARTFOOD_MAX_UPLOAD_MB with 413,
+    from Content-Length before anything is read, or mid-stream for chunked
+    uploads. Accepted bodies are spooled to disk by Starlette beyond 1 MB, so
+    the raw upload never needs to sit in memory.
+  - ImageBudget bounds image work: at most SMARTFOOD_IMAGE_CONCURRENCY
+    requests in flight and SMARTFOOD_IMAGE_MEMORY_MB of estimated decode and
+    batch memory (imaging.estimate_bytes) across them. A request that can't
+    be admitted within SMARTFOOD_IMAGE_QUEUE_MS gets 429 with Retry-After.
+"""
+import asyncio
+import contextlib
+import os
+
+from fastapi import HTTPException
+
+from metrics import REGISTRY
+
+MB = 1 << 20
+MAX_UPLOAD_BYTES = int(float(os.environ.get("SMARTFOOD_MAX_UPLOAD_MB", "20")) * MB)
+MAX_PIXELS = int(float(os.environ.get("SMARTFOOD_MAX_IMAGE_MP", "50")) * 1_000_000)
+IMAGE_CONCURRENCY = int(os.environ.get("SMARTFOOD_IMAGE_CONCURRENCY", "4"))
+IMAGE_MEMORY_BYTES = int(float(os.environ.get("SMARTFOOD_IMAGE_MEMORY_MB", "256")) * MB)
+QUEUE_TIMEOUT = float(os.environ.get("SMARTFOOD_IMAGE_QUEUE_MS", "250")) / 1000
+
+UPLOAD_REJECTIONS = REGISTRY.counter(
+    "smartfood_upload_rejections_total", "Image requests refused by admission control", ("reason",))
+
+
+class ImageBudget:
+    def __init__(self, slots: int = IMAGE_CONCURRENCY, memory: int = IMAGE_MEMORY_BYTES,
+                 timeout: float = QUEUE_TIMEOUT):
+        self.slots = slots
+        self.memory = memory
+        self.timeout = timeout
+        self.in_flight = 0
+        self.reserved = 0
+        self._cond = None  # created on first use, inside the server's event loop
+
+    def _fits(self, nbytes):
+        return self.in_flight < self.slots and self.reserved + nbytes <= self.memory
+
+    @contextlib.asynccontextmanager
+    async def admit(self, nbytes: int):
+        """Hold a slot and `nbytes` of the memory budget for the duration of the block."""
+        if nbytes > self.memory:
+            UPLOAD_REJECTIONS.inc(reason="too_large")
+            raise HTTPException(413, "Image needs more memory than the server allows for one request")
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            try:
+                await asyncio.wait_for(self._cond.wait_for(lambda: self._fits(nbytes)), self.timeout)
+            except asyncio.TimeoutError:
+                UPLOAD_REJECTIONS.inc(reason="busy")
+                raise HTTPException(429, "Too many images in flight, retry shortly",
+                                    headers={"Retry-After": "1"}) from None
+            self.in_flight += 1
+            self.reserved += nbytes
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self.reserved -= nbytes
+                self._cond.notify_all()
+
+
+class _TooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """Pure ASGI, so it can see the body stream before form parsing spools it."""
+
+    def __init__(self, app, paths, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                UPLOAD_REJECTIONS.inc(reason="upload_size")
+                return await self._send_413(send)
+
+        seen, overflow, replaced = 0, False, False
+
+        async def limited_receive():
+            nonlocal seen, overflow
+            message = await receive()
+            if message["type"] == "http.request":
+                seen += len(message.get("body", b""))
+                if seen > self.max_bytes:
+                    overflow = True
+                    raise _TooLarge()
+            return message
+
+        async def checked_send(message):
+            # body parsing turns the exception into a generic 400; answer 413 instead
+            nonlocal replaced
+            if overflow:
+                if not replaced:
+                    replaced = True
+                    await self._send_413(send)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, checked_send)
+        except _TooLarge:
+            pass
+        if overflow:
+            UPLOAD_REJECTIONS.inc(reason="upload_size")
+            if not replaced:
+                await self._send_413(send)
+
+    async def _send_413(self, send):
+        body = f'{{"detail":"Upload exceeds {self.max_bytes // MB} MB"}}'.encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                                (b"connection", b"close")]})
+        await send({"type": "http.response.body", "body": body})
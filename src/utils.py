@@ -4,6 +4,8 @@ import re
 import datetime as dt
 from typing import Optional
 
+from metrics import record_cache
+
 # try to use rapidfuzz for fuzzy name matching (optional)
 try:
     from rapidfuzz import process, fuzz
@@ -19,7 +21,9 @@ _SHELF = None
 def _load_shelf():
     global _SHELF
     if _SHELF is not None:
+        record_cache("shelf_life_table", True)
         return _SHELF
+    record_cache("shelf_life_table", False)
     _SHELF = {}
     try:
         with open(DATA_PATH, newline='', encoding='utf-8') as f:
@@ -82,6 +86,27 @@ def estimated_expiry(purchased_iso: str, days: int) -> str:
         purchased = dt.date.fromisoformat(purchased_iso)
     return (purchased + dt.timedelta(days=days)).isoformat()
 
+def detections_to_items(detections, location: str = "Fridge", source: str = "Detection") -> list:
+    """
+    Turn recognizer.detect() output into add_items() rows: one row per
+    detected class (qty = count), expiry from the shelf-life table.
+    """
+    today = dt.date.today().isoformat()
+    by_class = {}
+    for d in detections:
+        by_class.setdefault(d["class"], []).append(d)
+    items = []
+    for cls, found in by_class.items():
+        name = cls.replace("_", " ")
+        days = shelf_life_days(name, location)
+        items.append({
+            "name": name, "category": found[0].get("category"), "qty": len(found), "unit": "pcs",
+            "location": location, "purchased_on": today,
+            "expiry_on": estimated_expiry(today, days) if days else None,
+            "source": source, "notes": f"detected, confidence {max(d['confidence'] for d in found):.2f}",
+        })
+    return items
+
 def days_left(expiry_iso: Optional[str]) -> Optional[int]:
     """
     Return number of days until expiry (int). If expiry_iso is None or invalid -> None.
@@ -95,6 +120,51 @@ def days_left(expiry_iso: Optional[str]) -> Optional[int]:
         return None
     return (exp - dt.date.today()).days
 
+# formats seen in OpenFoodFacts `expiration_date` and receipts, tried in order
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%y", "%d.%m.%y",
+                 "%d %b %Y", "%d %B %Y", "%b %d %Y", "%B %d %Y")
+# month-only best-before dates ("12/2025") -> last day of that month
+_MONTH_FORMATS = ("%m/%Y", "%m-%Y", "%m.%Y", "%Y-%m", "%b %Y", "%B %Y")
+
+def normalize_date(value) -> Optional[str]:
+    """
+    Normalise a stored/imported date into ISO YYYY-MM-DD.
+    Accepts date/datetime objects, ISO dates (optionally with a time part),
+    day-first numeric dates and month-only best-before dates.
+    Returns None for empty input; raises ValueError if it can't be parsed.
+    """
+    if value is None:
+        return None
+    if isinstance(value, dt.datetime):
+        return value.date().isoformat()
+    if isinstance(value, dt.date):
+        return value.isoformat()
+    s = str(value).strip()
+    if s == "":
+        return None
+
+    # fast path: already ISO (what every write path should send)
+    if len(s) == 10 or (len(s) > 10 and s[10] in "T "):
+        try:
+            return dt.date.fromisoformat(s[:10]).isoformat()
+        except ValueError:
+            pass
+
+    s = re.sub(r"\s+", " ", s.replace(",", " ")).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return dt.datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            continue
+    for fmt in _MONTH_FORMATS:
+        try:
+            d = dt.datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+        nxt = dt.date(d.year + d.month // 12, d.month % 12 + 1, 1)
+        return (nxt - dt.timedelta(days=1)).isoformat()
+    raise ValueError(f"Unrecognised date: {value!r}")
+
 def parse_date_input(s: Optional[str]) -> Optional[str]:
     """
     Parse a user-entered date string into ISO YYYY-MM-DD.